@@ -0,0 +1,385 @@
+"""
+Keystroke analytics state and persistence.
+
+KeyboardAnalytics has no Qt dependency, so the GUI (kviz.py) and the
+headless daemon (kvizd.py) share it and the same on-disk format.
+"""
+
+import os
+import json
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, PERSISTENT_CODE_COUNT, id_to_code, intern_code
+from eventlog import EventLog
+from sqlitelog import SQLiteEventLog
+from rates import RateEngine
+from ranking import KeyRanking
+from persistence import BackgroundWriter, write_file_atomic
+from timings import DWELL, INTERVAL, TimingSketches
+from rollups import Bucket, RollupStore
+from applog import LOG
+
+try:
+    from digraphs import DigraphMatrix
+except ImportError:
+    DigraphMatrix = None  # numpy not installed: digraph analytics are disabled
+
+DIGRAPHS_NAME = "digraphs.npz"
+TIMINGS_NAME = "timings.json"
+STORAGE_BACKENDS = ("log", "sqlite")
+SQLITE_DIRECTORY = "sqlite"  # Under the log directory, apart from the segment log and its side files
+
+
+class KeyboardAnalytics:
+    """Analytics data tracking system"""
+    
+    def __init__(self, filename: str = "key_analytics.json", log_directory: str = "key_events",
+                 rollup_retention_days: Tuple[Optional[float], ...] = (7, 92, None), storage: str = "log"):
+        """rollup_retention_days: days to keep minute, hour and day buckets (None = forever)
+        
+        storage: "log" keeps events in segment files and counts in the JSON
+        file, "sqlite" keeps both in one database in the "sqlite" subdirectory
+        of log_directory (the JSON file is then only read, to carry over counts
+        from before the switch). Saved log positions only mean something to the
+        log they came from, so each backend keeps its side files (digraphs,
+        timings, rollups) in its own directory.
+        """
+        if storage not in STORAGE_BACKENDS:
+            raise ValueError(f"Unknown storage backend: {storage}")
+        # Bumped on every change; saves are skipped while nothing is newer than the last one
+        self.generation = 0
+        self.change_listeners: List = []
+        self.key_frequency = KeyRanking(watch=5)  # Indexed by code id, kept in rank order
+        # Flight times between consecutive keys, indexed by (previous, next) code id
+        self.digraphs = DigraphMatrix() if DigraphMatrix is not None else None
+        if self.digraphs is None:
+            LOG.warning("numpy not installed - digraph analytics disabled (pip install numpy)")
+        # Lifetime dwell and interval percentiles, overall and per key
+        self.timings = TimingSketches()
+        self.rollups: Optional[RollupStore] = None  # Created next to the event log below
+        self.reset()
+        self.filename = filename
+        self.storage = storage
+        if storage == "log":
+            self.event_log = EventLog(log_directory)
+        else:
+            self.event_log = SQLiteEventLog(os.path.join(log_directory, SQLITE_DIRECTORY))
+        # Typing per minute, hour and day, for questions about a time range
+        self.rollups = RollupStore(os.path.join(self.event_log.directory, "rollups"), *rollup_retention_days)
+        self.writer = BackgroundWriter(max_jobs=64)
+        self.compact_interval = 60.0  # Seconds between rewrites of the aggregate snapshot
+        self.last_compaction = time.time()
+        self.load_from_json()  # Load existing data on startup
+        self.saved_generation = self.generation
+        self.compacted_generation = self.generation
+        
+    def add_change_listener(self, callback):
+        """Call callback (no arguments) after every change to the analytics"""
+        self.change_listeners.append(callback)
+    
+    def mark_changed(self):
+        self.generation += 1
+        for callback in self.change_listeners:
+            callback()
+    
+    def reset(self):
+        self.total_keystrokes = 0
+        self.key_frequency.clear()
+        if self.digraphs is not None:
+            self.digraphs.clear()
+        self.timings.clear()
+        if self.rollups is not None:
+            self.rollups.reset()
+        self.dwell_times = deque(maxlen=100)
+        self.key_down_times: Dict[int, float] = {}
+        self.rhythm_data = deque(maxlen=50)
+        self.hand_balance = {'left': 0, 'right': 0}
+        self.rates = RateEngine()  # Sliding-window KPS/WPM
+        self.last_press_time: Optional[float] = None
+        
+        
+        # Left hand keys (QWERTY layout)
+        left_hand_keys = {
+            'KeyQ', 'KeyW', 'KeyE', 'KeyR', 'KeyT',
+            'KeyA', 'KeyS', 'KeyD', 'KeyF', 'KeyG', 
+            'KeyZ', 'KeyX', 'KeyC', 'KeyV', 'KeyB',
+            'Digit1', 'Digit2', 'Digit3', 'Digit4', 'Digit5',
+            'Tab', 'CapsLock', 'ShiftLeft', 'ControlLeft', 'AltLeft', 'MetaLeft',
+            'Backquote', 'Escape'
+        }
+        # Hand lookup table indexed by code id (1 = left hand)
+        self.left_hand = bytearray(PERSISTENT_CODE_COUNT)
+        for code in left_hand_keys:
+            self.left_hand[intern_code(code)] = 1
+        
+        self.mark_changed()
+    
+    def load_from_json(self):
+        """Load lifetime counts from the last checkpoint and replay newer log records"""
+        counts, position = self.event_log.load_checkpoint()
+        if counts is None:
+            # No checkpoint yet - start from the aggregate snapshot
+            counts = {}
+            try:
+                if os.path.exists(self.filename):
+                    with open(self.filename, 'r') as f:
+                        data = json.load(f)
+                        # Convert loaded data to our format
+                        for entry in data:
+                            counts[entry['key']] = entry['count']
+            except Exception as e:
+                LOG.error("Error loading analytics: %s", e)
+        
+        self.key_frequency.update_from_dict(counts)
+        self.total_keystrokes += sum(counts.values())
+        
+        def count(code_id: int, _timestamp: float):
+            if 0 < code_id < PERSISTENT_CODE_COUNT:
+                self.key_frequency.add(code_id)
+                self.total_keystrokes += 1
+        
+        # Events logged after the checkpoint were never compacted, and each
+        # saved file has its own position; one pass over the log catches up all
+        consumers = [(position, count, None)]
+        if self.digraphs is not None:
+            consumers.append(self.load_digraphs())
+        consumers.append(self.load_timings())
+        consumers.append(self.load_rollups())
+        self.replay_log(consumers)
+        
+        # Days finished while the app was not running are written now rather than at the next compaction
+        if self.rollups.frozen_before > self.rollups.closed_before:
+            self.rollups.write(self.rollups.snapshot())
+    
+    def replay_log(self, consumers: List[Tuple[Tuple[int, int], Optional[Callable], Optional[Callable]]]):
+        """Feed logged events to (position, press, release) consumers, reading the log once
+        
+        press/release(code_id, timestamp) see every event after their own
+        position. The log is read from the earliest position, in spans between
+        consecutive positions, each span going to the consumers it is past.
+        """
+        consumers = sorted(consumers, key=lambda consumer: consumer[0])
+        for index, (position, _, _) in enumerate(consumers):
+            end = consumers[index + 1][0] if index + 1 < len(consumers) else None
+            if end == position:
+                continue
+            presses = [press for _, press, _ in consumers[:index + 1] if press is not None]
+            releases = [release for _, _, release in consumers[:index + 1] if release is not None]
+            for event_type, code_id, timestamp in self.event_log.read_from(position, end=end):
+                if event_type == EVENT_PRESS:
+                    for press in presses:
+                        press(code_id, timestamp)
+                elif event_type == EVENT_RELEASE:
+                    for release in releases:
+                        release(code_id, timestamp)
+    
+    def load_digraphs(self):
+        """Load the saved digraph matrices and return their replay consumer
+        
+        Without a saved file the whole log is replayed, which also covers
+        history recorded before digraphs existed.
+        """
+        position = (0, 0)
+        path = os.path.join(self.event_log.directory, DIGRAPHS_NAME)
+        if os.path.exists(path):
+            try:
+                position = self.digraphs.load(path)
+            except Exception as e:
+                LOG.error("Error loading digraphs: %s", e)
+                self.digraphs.clear()
+        return position, self.digraphs.press, self.digraphs.release
+    
+    def load_timings(self):
+        """Load the saved timing sketches and return their replay consumer (all of the log without a file)"""
+        position = (0, 0)
+        path = os.path.join(self.event_log.directory, TIMINGS_NAME)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                self.timings.load_dict(data["timings"])
+                position = (data["segment"], data["offset"])
+            except Exception as e:
+                LOG.error("Error loading timing sketches: %s", e)
+                self.timings.clear()
+        return position, self.timings.press, self.timings.release
+    
+    def load_rollups(self, flush_every: int = 100000):
+        """Load the open days of the rollups and return their replay consumer
+        
+        The first run replays the whole log; finished days are written out
+        along the way so only the open days stay in memory.
+        """
+        rollups = self.rollups
+        position = rollups.load()
+        replayed = 0
+        
+        def press(code_id: int, timestamp: float):
+            nonlocal replayed
+            rollups.press(code_id, timestamp)
+            replayed += 1
+            if replayed % flush_every == 0 and len(rollups.minutes) > 2 * 24 * 60:
+                rollups.write(rollups.snapshot())
+        
+        return position, press, rollups.release
+    
+    def record_key_press(self, code_id: int, timestamp: float):
+        if code_id < PERSISTENT_CODE_COUNT:
+            self.event_log.append(EVENT_PRESS, code_id, timestamp)
+            if self.event_log.pending >= self.event_log.max_buffered:
+                self.save()
+        
+        self.total_keystrokes += 1
+        self.key_frequency.add(code_id)
+        self.rates.record(timestamp)
+        
+        # Record keystroke timing for rhythm
+        if self.last_press_time is not None:
+            interval = timestamp - self.last_press_time
+            self.rhythm_data.append(interval)
+        self.last_press_time = timestamp
+        
+        self.key_down_times[code_id] = timestamp
+        if self.digraphs is not None:
+            self.digraphs.press(code_id, timestamp)
+        self.timings.press(code_id, timestamp)
+        self.rollups.press(code_id, timestamp)
+        
+        # Track hand balance
+        if code_id < len(self.left_hand) and self.left_hand[code_id]:
+            self.hand_balance['left'] += 1
+        else:
+            self.hand_balance['right'] += 1
+        
+        self.mark_changed()
+    
+    def record_key_release(self, code_id: int, timestamp: float):
+        if code_id < PERSISTENT_CODE_COUNT:
+            self.event_log.append(EVENT_RELEASE, code_id, timestamp)
+        
+        if self.digraphs is not None:
+            self.digraphs.release(code_id, timestamp)
+        self.timings.release(code_id, timestamp)
+        self.rollups.release(code_id, timestamp)
+        down_time = self.key_down_times.pop(code_id, None)
+        if down_time is not None:
+            self.dwell_times.append(timestamp - down_time)
+        
+        self.mark_changed()
+    
+    def get_average_dwell(self) -> float:
+        return sum(self.dwell_times) / len(self.dwell_times) if self.dwell_times else 0
+    
+    def get_dwell_percentiles(self, code_id: Optional[int] = None) -> Tuple[int, List[float]]:
+        """(count, [p50, p90, p99] in ms) of lifetime dwell times, overall or for one key"""
+        return self.timings.summary(DWELL, code_id)
+    
+    def get_interval_percentiles(self, code_id: Optional[int] = None) -> Tuple[int, List[float]]:
+        """(count, [p50, p90, p99] in ms) of lifetime press-to-press intervals, overall or ending at one key"""
+        return self.timings.summary(INTERVAL, code_id)
+    
+    def get_typing_between(self, start_ms: float, end_ms: float) -> Bucket:
+        """Keystrokes, per-key presses and dwell sums typed in [start_ms, end_ms)"""
+        return self.rollups.summary(start_ms, end_ms)
+    
+    def get_kps(self, window_ms: Optional[float] = 1000) -> float:
+        """Keys per second over a sliding window (None for the whole session)"""
+        return self.rates.kps(window_ms)
+    
+    def get_wpm(self, window_ms: Optional[float] = 10000) -> float:
+        """Words per minute over a sliding window (None for the whole session)"""
+        return self.rates.wpm(window_ms)
+    
+    def get_top_keys(self, n: int = 5) -> List[Tuple[str, int]]:
+        return [(id_to_code(code_id), count) for code_id, count in self.key_frequency.top(n)]
+    
+    def get_slowest_digraphs(self, n: int = 10, min_count: int = 5) -> List[Tuple[str, str, float, int]]:
+        """(previous code, next code, mean press-to-press ms, count) for the slowest transitions"""
+        return self.digraphs.slowest(n, min_count) if self.digraphs is not None else []
+    
+    def get_frequent_digraphs(self, n: int = 10) -> List[Tuple[str, str, float, int]]:
+        """(previous code, next code, mean press-to-press ms, count) for the most common transitions"""
+        return self.digraphs.most_frequent(n) if self.digraphs is not None else []
+    
+    def save(self, compact: bool = False):
+        """Hand new events to the writer thread; compact into the JSON snapshot periodically
+        
+        Only cheap snapshots are taken here. Serialization and disk I/O happen on
+        the background writer so the GUI thread never waits on the disk. If the
+        writer has fallen behind, a routine save queues nothing: new events
+        stay buffered and go out as one larger batch on a later save. An
+        explicit compaction (reset, close) is queued regardless, waiting for
+        room if it has to, since nothing would replace it.
+        """
+        if self.writer.full() and not compact:
+            return
+        if self.generation != self.saved_generation:
+            self.saved_generation = self.generation
+            self.writer.submit(self.event_log.write, self.event_log.take_pending())
+        
+        due = time.time() - self.last_compaction >= self.compact_interval
+        if self.generation != self.compacted_generation and (compact or due):
+            self.compacted_generation = self.generation
+            self.last_compaction = time.time()
+            digraphs = self.digraphs.snapshot() if self.digraphs is not None else None
+            self.writer.submit(self.compact, self.key_frequency.to_dict(), digraphs, self.timings.to_dict(),
+                               self.rollups.snapshot())
+    
+    def compact(self, counts: Dict[str, int], digraphs: Optional[tuple] = None, timings: Optional[Dict] = None,
+                rollups: Optional[Dict] = None):
+        """Fold everything logged so far into the checkpoint and the aggregate snapshot
+        
+        counts must be in rank order, as produced by key_frequency.to_dict().
+        digraphs, timings and rollups are DigraphMatrix, TimingSketches and
+        RollupStore snapshots taken at the same moment.
+        """
+        try:
+            self.event_log.write_checkpoint(counts)
+        except Exception as e:
+            LOG.error("Error writing event log checkpoint: %s", e)
+            return
+        if digraphs is not None:
+            try:
+                data = DigraphMatrix.to_bytes(digraphs, self.event_log.position())
+                write_file_atomic(os.path.join(self.event_log.directory, DIGRAPHS_NAME), data)
+            except Exception as e:
+                LOG.error("Error saving digraphs: %s", e)
+        if timings is not None:
+            try:
+                segment, offset = self.event_log.position()
+                data = {"segment": segment, "offset": offset, "timings": timings}
+                write_file_atomic(os.path.join(self.event_log.directory, TIMINGS_NAME), json.dumps(data).encode())
+            except Exception as e:
+                LOG.error("Error saving timing sketches: %s", e)
+        if rollups is not None:
+            try:
+                self.rollups.write(rollups, self.event_log.position())
+            except Exception as e:
+                LOG.error("Error saving rollups: %s", e)
+        if self.storage == "log":
+            self.save_to_json(counts)
+    
+    def close(self):
+        """Finish pending writes and close the event log"""
+        self.writer.close()
+        self.event_log.close()
+    
+    def save_to_json(self, ranked_counts: Optional[Dict[str, int]] = None):
+        try:
+            # Ranking already keeps keys ordered by count
+            if ranked_counts is None:
+                ranked_counts = self.key_frequency.to_dict()
+            
+            # Format data for JSON output
+            analytics_data = [
+                {"key": key, "count": count} 
+                for key, count in ranked_counts.items()
+            ]
+            
+            # Write to JSON file
+            write_file_atomic(self.filename, json.dumps(analytics_data, indent=4).encode())
+                
+        except Exception as e:
+            LOG.error("Error saving analytics: %s", e)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Leveled in-memory application log.
+
+Records at or above LOG.level are kept in a fixed-size ring buffer as
+(time, level, thread ident, message, args) tuples. Messages are only %-formatted
+when the ring is dumped, and records below LOG.level are dropped after a
+single comparison, so debug logging on the keystroke path costs almost
+nothing while it is off (the default). Records at or above LOG.echo_level
+are also printed as they happen, which keeps the app's existing console
+status messages.
+
+The ring is dumped with LOG.dump(): on demand (SIGUSR1 where available)
+and automatically on an uncaught exception once install_dump_handlers()
+has been called.
+
+Run this file directly for a comparison against print() per keystroke.
+"""
+
+import sys
+import time
+import signal
+import threading
+from collections import deque
+from typing import List, Optional, TextIO
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS_BY_NAME = {name.lower(): level for level, name in LEVEL_NAMES.items()}
+
+
+class RingLog:
+    """Leveled log kept in a ring buffer, formatted lazily"""
+
+    def __init__(self, capacity: int = 4096, level: int = INFO, echo_level: int = INFO):
+        self.records: deque = deque(maxlen=capacity)
+        self.level = level
+        self.echo_level = echo_level
+
+    def log(self, level: int, message: str, *args):
+        if level < self.level:
+            return
+        # deque.append is atomic, so listener threads can log without a lock
+        self.records.append((time.time(), level, threading.get_ident(), message, args))
+        if level >= self.echo_level:
+            print(message % args if args else message)
+
+    def debug(self, message: str, *args):
+        # Inlined: this is the level used on the keystroke path
+        if DEBUG >= self.level:
+            self.records.append((time.time(), DEBUG, threading.get_ident(), message, args))
+            if DEBUG >= self.echo_level:
+                print(message % args if args else message)
+
+    def info(self, message: str, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message: str, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message: str, *args):
+        self.log(ERROR, message, *args)
+
+    def set_level(self, name: str):
+        """Set the recording level by name ('debug', 'info', ...)"""
+        self.level = LEVELS_BY_NAME[name.lower()]
+
+    @staticmethod
+    def format_record(record, thread_names=None) -> str:
+        timestamp, level, thread_id, message, args = record
+        thread = (thread_names or {}).get(thread_id, thread_id)
+        try:
+            text = message % args if args else message
+        except (TypeError, ValueError):
+            text = f"{message} {args!r}"
+        clock = time.strftime('%H:%M:%S', time.localtime(timestamp))
+        return f"{clock}.{int(timestamp * 1000) % 1000:03d} {LEVEL_NAMES.get(level, level):<7} [{thread}] {text}"
+
+    def lines(self) -> List[str]:
+        # Threads are recorded by ident (cheap) and named here, while still alive
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        return [self.format_record(record, thread_names) for record in list(self.records)]
+
+    def dump(self, stream: Optional[TextIO] = None):
+        """Write every buffered record, oldest first"""
+        stream = stream or sys.stderr
+        lines = self.lines()
+        stream.write(f"--- last {len(lines)} log records ---\n")
+        for line in lines:
+            stream.write(line + "\n")
+        stream.flush()
+
+    def clear(self):
+        self.records.clear()
+
+
+LOG = RingLog()
+
+
+def install_dump_handlers(log: RingLog = LOG):
+    """Dump the ring on an uncaught exception and on SIGUSR1"""
+    previous_hook = sys.excepthook
+
+    def excepthook(exc_type, exc, tb):
+        log.error("Uncaught %s: %s", exc_type.__name__, exc)
+        log.dump()
+        previous_hook(exc_type, exc, tb)
+
+    sys.excepthook = excepthook
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: log.dump())
+
+
+def _benchmark(events: int = 200000):
+    """Print per-keystroke cost of print() versus the ring log"""
+    import os
+    import tempfile
+
+    code = "KeyA"
+    devnull = open(os.devnull, 'w')
+    real_stdout = sys.stdout
+
+    def per_call_ns(fn) -> float:
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(events):
+                fn()
+            best = min(best, time.perf_counter() - start)
+        return best / events * 1e9
+
+    def old_print():
+        print(f"MainWindow.on_key_press called with code: {code}")
+
+    off = RingLog(level=INFO)
+    on = RingLog(level=DEBUG, echo_level=ERROR)
+
+    cases = []
+    try:
+        sys.stdout = devnull
+        cases.append(("print() to /dev/null (old)", per_call_ns(old_print)))
+        # A terminal is line buffered: one write() per keystroke
+        with tempfile.TemporaryFile('w', buffering=1) as line_buffered:
+            sys.stdout = line_buffered
+            cases.append(("print() line buffered, like a tty (old)", per_call_ns(old_print)))
+    finally:
+        sys.stdout = real_stdout
+    cases.append(("LOG.debug, debug off (default)",
+                  per_call_ns(lambda: off.debug("MainWindow.on_key_press called with code: %s", code))))
+    cases.append(("LOG.debug, debug on (ring only)",
+                  per_call_ns(lambda: on.debug("MainWindow.on_key_press called with code: %s", code))))
+    devnull.close()
+
+    print(f"{'per keystroke':<40}{'ns/call':>10}")
+    for name, ns in cases:
+        print(f"{name:<40}{ns:>10.1f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Global key capture helper process.
+
+Runs a pynput listener and writes one fixed-size binary record per key event
+to stdout: event type, key code id and capture timestamp in milliseconds.
+Human-readable messages go to stderr so the record stream stays framed.
+
+With --ring NAME the records are published into a shared-memory ring
+(shmring.py) instead, which any number of readers can follow; publishing
+never blocks, however far behind they are. --wake also writes a byte to
+stdout after each publish, so the process that started the helper can sleep
+until there is something to read. If another helper already writes the
+ring, the helper exits with status EXIT_RING_IN_USE.
+
+Usage: capture_helper.py [--ring NAME [--wake]] [--ring-capacity RECORDS]
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, EVENT_RECORD
+from keytranslate import pynput_key_to_id
+
+
+# Exit status when --ring names a ring another live helper writes; the caller can follow that one instead
+EXIT_RING_IN_USE = 3
+
+
+def write_event(fd: int, event_type: int, key) -> None:
+    code_id = pynput_key_to_id(str(key))
+    if code_id:
+        os.write(fd, EVENT_RECORD.pack(event_type, code_id, time.time() * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture global key events")
+    parser.add_argument("--ring", metavar="NAME", help="publish into this shared-memory ring instead of stdout")
+    parser.add_argument("--wake", action="store_true", help="with --ring, post a wakeup byte to stdout per event")
+    parser.add_argument("--ring-capacity", type=int, default=1 << 16, help="ring size in records (default: %(default)s)")
+    args = parser.parse_args()
+
+    from pynput import keyboard
+
+    ring = None
+    if args.ring:
+        from shmring import EventRing
+        try:
+            ring = EventRing(args.ring, args.ring_capacity, sys.stdout.fileno() if args.wake else None)
+        except FileExistsError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(EXIT_RING_IN_USE)
+        # Terminated by the GUI: leave through the finally block so the segment is removed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+        def emit(event_type: int, key):
+            code_id = pynput_key_to_id(str(key))
+            if code_id:
+                ring.publish(event_type, code_id, time.time() * 1000)
+    else:
+        fd = sys.stdout.fileno()
+
+        def emit(event_type: int, key):
+            write_event(fd, event_type, key)
+
+    print("🚀 DIRECT CAPTURE STARTING!", file=sys.stderr)
+
+    def on_press(key):
+        try:
+            emit(EVENT_PRESS, key)
+        except OSError:
+            listener.stop()
+
+    def on_release(key):
+        try:
+            emit(EVENT_RELEASE, key)
+        except OSError:
+            listener.stop()
+
+    listener = keyboard.Listener(on_press=on_press, on_release=on_release)
+    listener.start()
+
+    try:
+        listener.join()
+    except KeyboardInterrupt:
+        listener.stop()
+    finally:
+        if ring is not None:
+            listener.stop()
+            ring.close()
+
+
+if __name__ == "__main__":
+    main()
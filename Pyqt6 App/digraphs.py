@@ -0,0 +1,209 @@
+"""
+Digraph (key pair) flight-time matrix.
+
+For every ordered pair of persistent key ids (previous key, next key) this
+keeps dense NumPy matrices of:
+- how often the transition happened
+- total press-to-press time
+- total release-to-press time (negative when the next key went down
+  before the previous one came up, i.e. rollover)
+
+Each keystroke updates a handful of matrix cells, so recording is O(1).
+Updates go through flat memoryviews of the matrices, which index like a
+list (NumPy scalar indexing costs several times more per keystroke);
+queries over all pairs are vectorized. Pauses longer than max_gap_ms are
+not transitions and are skipped. The matrices are saved as an .npz file
+together with the event log position they cover, so the log after that
+position can be replayed on startup like the count checkpoint.
+"""
+
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from keycodes import PERSISTENT_CODE_COUNT, id_to_code
+
+
+Transition = Tuple[str, str, float, int]  # (previous code, next code, mean ms, count)
+
+
+class DigraphMatrix:
+    """Counts and flight times for every (previous key, next key) pair"""
+
+    def __init__(self, size: int = PERSISTENT_CODE_COUNT, max_gap_ms: float = 2000.0):
+        self.size = size
+        self.max_gap_ms = max_gap_ms
+        self.count = np.zeros((size, size), dtype=np.uint32)
+        self.press_sum = np.zeros((size, size), dtype=np.float64)    # Press-to-press ms
+        self.release_count = np.zeros((size, size), dtype=np.uint32)
+        self.release_sum = np.zeros((size, size), dtype=np.float64)  # Release-to-press ms
+        # Views sharing the matrices' memory, indexed by previous * size + next
+        self._count = memoryview(self.count.reshape(-1))
+        self._press_sum = memoryview(self.press_sum.reshape(-1))
+        self._release_count = memoryview(self.release_count.reshape(-1))
+        self._release_sum = memoryview(self.release_sum.reshape(-1))
+        self.reset_sequence()
+
+    def reset_sequence(self):
+        """Forget the previous keystroke (the next press starts a new sequence)"""
+        self.last_key = 0
+        self.last_press = 0.0
+        self.last_release: Optional[float] = None
+        # Transitions still waiting for their previous key's release, keyed by that key: (cell, press time).
+        # Fast rollover (A down, B down, C down, A up) leaves several waiting at once.
+        self.pending: Dict[int, Tuple[int, float]] = {}
+
+    def press(self, code_id: int, timestamp: float):
+        if not 0 < code_id < self.size:
+            self.reset_sequence()
+            return
+
+        previous = self.last_key
+        if previous:
+            gap = timestamp - self.last_press
+            if 0 <= gap <= self.max_gap_ms:
+                cell = previous * self.size + code_id
+                self._count[cell] += 1
+                self._press_sum[cell] += gap
+                if self.last_release is not None:
+                    self._release_count[cell] += 1
+                    self._release_sum[cell] += timestamp - self.last_release
+                else:
+                    # Rollover: finish the release-to-press time when previous comes up
+                    self.pending[previous] = (cell, timestamp)
+
+        self.last_key = code_id
+        self.last_press = timestamp
+        self.last_release = None
+
+    def release(self, code_id: int, timestamp: float):
+        pending = self.pending.pop(code_id, None) if self.pending else None
+        if pending is not None:
+            cell, press_time = pending
+            self._release_count[cell] += 1
+            self._release_sum[cell] += press_time - timestamp
+        if code_id == self.last_key:
+            self.last_release = timestamp
+
+    def _transitions(self, order: np.ndarray, means: np.ndarray, counts: np.ndarray, n: int) -> List[Transition]:
+        rows, cols = np.unravel_index(order[:n], counts.shape)
+        return [(id_to_code(int(a)), id_to_code(int(b)), float(means[a, b]), int(counts[a, b]))
+                for a, b in zip(rows, cols)]
+
+    def _top(self, scores: np.ndarray, n: int) -> np.ndarray:
+        """Flat indexes of the n highest finite scores, highest first"""
+        flat = scores.ravel()
+        valid = np.flatnonzero(np.isfinite(flat))
+        if valid.size > n:
+            valid = valid[np.argpartition(flat[valid], -n)[-n:]]
+        return valid[np.argsort(flat[valid])[::-1]]
+
+    def mean_press_times(self) -> np.ndarray:
+        """Mean press-to-press ms per pair, NaN where never seen"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.press_sum / self.count
+
+    def mean_release_times(self) -> np.ndarray:
+        """Mean release-to-press ms per pair, NaN where never seen"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.release_sum / self.release_count
+
+    def slowest(self, n: int = 10, min_count: int = 5, release_to_press: bool = False) -> List[Transition]:
+        """Transitions with the highest mean flight time among pairs seen at least min_count times"""
+        if release_to_press:
+            means, counts = self.mean_release_times(), self.release_count
+        else:
+            means, counts = self.mean_press_times(), self.count
+        scores = np.where(counts >= max(1, min_count), means, np.nan)
+        return self._transitions(self._top(scores, n), means, counts, n)
+
+    def most_frequent(self, n: int = 10) -> List[Transition]:
+        """Most common transitions with their mean press-to-press time"""
+        scores = np.where(self.count > 0, self.count.astype(np.float64), np.nan)
+        return self._transitions(self._top(scores, n), self.mean_press_times(), self.count, n)
+
+    def clear(self):
+        for matrix in (self.count, self.press_sum, self.release_count, self.release_sum):
+            matrix.fill(0)
+        self.reset_sequence()
+
+    def sequence_state(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The previous keystroke (NaN release while it is down) and the rollovers in progress as (cell, press time) rows"""
+        last_release = np.nan if self.last_release is None else self.last_release
+        pending = np.array(list(self.pending.values()), dtype=np.float64).reshape(-1, 2)
+        return np.array([self.last_key, self.last_press, last_release]), pending
+
+    def snapshot(self) -> Tuple[np.ndarray, ...]:
+        """Copies of the matrices and sequence state, safe to serialize on another thread"""
+        return (self.count.copy(), self.press_sum.copy(), self.release_count.copy(),
+                self.release_sum.copy(), *self.sequence_state())
+
+    @staticmethod
+    def to_bytes(snapshot: Tuple[np.ndarray, ...], position: Tuple[int, int]) -> bytes:
+        count, press_sum, release_count, release_sum, sequence, pending = snapshot
+        buffer = io.BytesIO()
+        np.savez(buffer, count=count, press_sum=press_sum, release_count=release_count,
+                 release_sum=release_sum, sequence=sequence, pending=pending,
+                 position=np.array(position, dtype=np.int64))
+        return buffer.getvalue()
+
+    def load(self, path: str) -> Tuple[int, int]:
+        """Load saved matrices and return the log position they cover"""
+        with np.load(path) as data:
+            size = min(self.size, data['count'].shape[0])
+            for name in ('count', 'press_sum', 'release_count', 'release_sum'):
+                getattr(self, name)[:size, :size] = data[name][:size, :size]
+            segment, offset = (int(value) for value in data['position'])
+            saved_size = data['count'].shape[0]
+            sequence = data['sequence'].tolist()
+            if 'pending' in data.files:
+                pending = data['pending'].tolist()
+            else:
+                # Files from before several rollovers were tracked hold at most one, NaN when absent
+                pending = [] if np.isnan(sequence[4]) else [sequence[3:5]]
+        # Transitions that straddle the save point continue where they left off
+        last_key, last_press, last_release = sequence[:3]
+        self.last_key = int(last_key) if int(last_key) < self.size else 0
+        self.last_press = last_press
+        self.last_release = None if np.isnan(last_release) else last_release
+        self.pending = {}
+        for cell, press_time in pending:
+            previous, next_key = divmod(int(cell), saved_size)
+            if max(previous, next_key) < self.size:
+                self.pending[previous] = (previous * self.size + next_key, press_time)
+        return segment, offset
+
+
+def _benchmark(events: int = 200000):
+    """Print the per-keystroke update cost and the cost of each query"""
+    import time
+    from keycodes import EVENT_PRESS
+    from tracegen import generate_trace
+
+    trace = generate_trace(events, seed=1)
+    matrix = DigraphMatrix()
+    press, release = matrix.press, matrix.release
+    start = time.perf_counter()
+    for event_type, code_id, timestamp in trace:
+        if event_type == EVENT_PRESS:
+            press(code_id, timestamp)
+        else:
+            release(code_id, timestamp)
+    update_ns = (time.perf_counter() - start) / len(trace) * 1e9
+
+    def query_us(fn, repeat: int = 200) -> float:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    print(f"{matrix.size}x{matrix.size} pairs, {int(matrix.count.sum())} transitions from {len(trace)} events")
+    print(f"update:              {update_ns:8.0f} ns/event")
+    print(f"slowest(10):         {query_us(matrix.slowest):8.1f} us")
+    print(f"most_frequent(10):   {query_us(matrix.most_frequent):8.1f} us")
+    print(f"snapshot():          {query_us(matrix.snapshot):8.1f} us")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Linux key capture straight from evdev devices.
+
+Keyboards are read from /dev/input/event* (readable by root or members of
+the 'input' group), with no pynput, no 'keyboard' hooks and no Python
+callback per event. Every read() drains up to a block of kernel
+struct input_event records into one reused buffer, and the block is
+unpacked in bulk with a precompiled struct.Struct over a memoryview.
+Evdev key codes name physical keys, so they map straight to code ids
+through keytranslate.EVDEV_KEY_IDS. The result is the same
+[(event_type, code_id, timestamp_ms), ...] batches the other listeners
+deliver.
+
+When a reader falls behind, the kernel drops the events in its buffer and
+reports SYN_DROPPED. The releases lost with them would leave keys held
+forever in the dwell pairing and the overlay, so every key still held is
+released at that point and the partial report after it is discarded.
+
+The reader takes any path, so a byte stream recorded from a device
+(cat /dev/input/eventN > keys.bin) replays through exactly the same code:
+
+    evdevcapture.py --replay keys.bin             print the events
+    evdevcapture.py --replay keys.bin --records   EVENT_RECORDs for kvizd --source -
+
+Usage: evdevcapture.py [--replay FILE] [--records] [--benchmark EVENTS] [DEVICE ...]
+"""
+
+import os
+import sys
+import stat
+import errno
+import struct
+import select
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, EVENT_RECORD, id_to_code
+from keytranslate import EVDEV_KEY_IDS
+
+
+# struct input_event: struct timeval (two native longs), u16 type, u16 code, s32 value
+INPUT_EVENT = struct.Struct('@llHHi')
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_REP = 0x14
+SYN_REPORT, SYN_DROPPED = 0, 3
+KEY_RELEASE, KEY_PRESS, KEY_REPEAT = 0, 1, 2
+
+Event = Tuple[int, int, float]  # (event_type, code_id, timestamp_ms)
+
+
+class KeyStream:
+    """Translates one device's input_event records, keeping track of the keys held down"""
+
+    def __init__(self):
+        self.held: Set[int] = set()
+        self.dropping = False  # Between SYN_DROPPED and the next SYN_REPORT
+
+    def translate(self, data) -> List[Event]:
+        """Key presses and releases among the whole input_event records in data
+
+        Autorepeats are dropped: a held key is one press, as with the other
+        listeners' dwell pairing. The kernel stamps events with the wall clock,
+        the same clock as time.time() in the pynput helper.
+        """
+        ids = EVDEV_KEY_IDS
+        known = len(ids)
+        held = self.held
+        events = []
+        for seconds, microseconds, ev_type, code, value in INPUT_EVENT.iter_unpack(data):
+            if ev_type == EV_SYN:
+                if code == SYN_DROPPED:
+                    self.dropping = True
+                    timestamp = seconds * 1000 + microseconds / 1000
+                    events.extend((EVENT_RELEASE, code_id, timestamp) for code_id in sorted(held))
+                    held.clear()
+                elif code == SYN_REPORT:
+                    self.dropping = False
+            elif ev_type == EV_KEY and value != KEY_REPEAT and code < known and not self.dropping:
+                code_id = ids[code]
+                if code_id:
+                    if value:
+                        held.add(code_id)
+                    else:
+                        held.discard(code_id)
+                    events.append((EVENT_PRESS if value else EVENT_RELEASE, code_id, seconds * 1000 + microseconds / 1000))
+        return events
+
+
+def translate(data) -> List[Event]:
+    """Key events among the whole input_event records in data, read from the start of a stream"""
+    return KeyStream().translate(data)
+
+
+def find_keyboards(devices_path: str = "/proc/bus/input/devices") -> List[str]:
+    """/dev/input/event* paths of every keyboard this process can read
+
+    Keyboards are the devices with a 'kbd' handler that report both key and
+    autorepeat events, which leaves out power buttons and mice with keys.
+    """
+    try:
+        with open(devices_path, 'r') as f:
+            blocks = f.read().split("\n\n")
+    except OSError:
+        return []
+
+    paths = []
+    for block in blocks:
+        handlers: List[str] = []
+        ev_bits = 0
+        for line in block.splitlines():
+            if line.startswith("H: Handlers="):
+                handlers = line.split("=", 1)[1].split()
+            elif line.startswith("B: EV="):
+                ev_bits = int(line.split("=", 1)[1], 16)
+        if "kbd" not in handlers or not (ev_bits >> EV_KEY) & 1 or not (ev_bits >> EV_REP) & 1:
+            continue
+        for handler in handlers:
+            path = os.path.join("/dev/input", handler)
+            if handler.startswith("event") and os.access(path, os.R_OK):
+                paths.append(path)
+    return paths
+
+
+class EvdevReader:
+    """Non-blocking bulk reader over one or more evdev devices (or recorded files)"""
+
+    def __init__(self, paths: Iterable[str], block_events: int = 256):
+        self.paths: Dict[int, str] = {}
+        self.streams: Dict[int, KeyStream] = {}
+        self._files = set()  # fds of recordings, which are always readable until their end
+        # Whole records only: devices never return a partial one, and files are read in step
+        self._buffer = bytearray(block_events * INPUT_EVENT.size)
+        self._view = memoryview(self._buffer)
+        for path in paths:
+            fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            self.paths[fd] = path
+            self.streams[fd] = KeyStream()
+            if stat.S_ISREG(os.fstat(fd).st_mode):
+                self._files.add(fd)
+
+    def fds(self) -> List[int]:
+        return list(self.paths)
+
+    def read(self, fd: int) -> Optional[List[Event]]:
+        """All key events waiting on fd, or None once it is exhausted (end of file, device unplugged)"""
+        events: List[Event] = []
+        buffer, view = self._buffer, self._view
+        stream = self.streams[fd]
+        while True:
+            try:
+                size = os.readv(fd, [buffer])
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.ENODEV:
+                    return events or None
+                raise
+            if not size:
+                return events or None
+            events.extend(stream.translate(view[:size - size % INPUT_EVENT.size]))
+            if fd in self._files:
+                # One block per call, so a long recording replays in batches like a device
+                return events
+
+    def close_fd(self, fd: int):
+        os.close(fd)
+        del self.paths[fd]
+        del self.streams[fd]
+        self._files.discard(fd)
+
+    def close(self):
+        for fd in self.fds():
+            self.close_fd(fd)
+
+
+def follow(reader: EvdevReader) -> Iterator[List[Event]]:
+    """Yield batches of events from every fd until all are exhausted (never, for live devices)"""
+    while reader.paths:
+        readable, _, _ = select.select(reader.fds(), [], [])
+        for fd in readable:
+            events = reader.read(fd)
+            if events is None:
+                reader.close_fd(fd)
+            elif events:
+                yield events
+
+
+def _write_recording(path: str, presses: int):
+    """Write a device-like byte stream: each key event followed by EV_MSC scan and EV_SYN reports, plus repeats"""
+    import random
+
+    rng = random.Random(1)
+    codes = [code for code in range(len(EVDEV_KEY_IDS)) if EVDEV_KEY_IDS[code]]
+    pack = INPUT_EVENT.pack
+    microseconds = 1_700_000_000 * 1_000_000
+    with open(path, 'wb') as f:
+        for index in range(presses):
+            code = rng.choice(codes)
+            records = []
+            for value in (KEY_PRESS, KEY_REPEAT, KEY_RELEASE) if index % 50 == 0 else (KEY_PRESS, KEY_RELEASE):
+                microseconds += rng.randint(20_000, 150_000)
+                seconds, fraction = divmod(microseconds, 1_000_000)
+                records.append(pack(seconds, fraction, 0x04, 0x04, code))  # EV_MSC MSC_SCAN
+                records.append(pack(seconds, fraction, EV_KEY, code, value))
+                records.append(pack(seconds, fraction, 0x00, 0x00, 0))     # EV_SYN SYN_REPORT
+            f.write(b''.join(records))
+
+
+def _benchmark(presses: int = 200000):
+    """Replay a synthetic recording and report throughput and what was kept"""
+    import time
+    import tempfile
+
+    with tempfile.TemporaryDirectory(prefix="kviz-evdev-") as directory:
+        path = os.path.join(directory, "keys.bin")
+        _write_recording(path, presses)
+        records = os.path.getsize(path) // INPUT_EVENT.size
+        reader = EvdevReader([path])
+        start = time.perf_counter()
+        events = [event for batch in follow(reader) for event in batch]
+        elapsed = time.perf_counter() - start
+
+    kept_presses = sum(1 for event_type, _, _ in events if event_type == EVENT_PRESS)
+    print(f"{records} input_event records -> {len(events)} key events "
+          f"({kept_presses} presses, expected {presses}) in {elapsed * 1000:.1f}ms")
+    print(f"{elapsed / records * 1e9:.0f} ns per input_event")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture key events from Linux evdev devices")
+    parser.add_argument("devices", nargs="*", help="event devices (default: every readable keyboard)")
+    parser.add_argument("--replay", metavar="FILE", help="read a recorded input_event byte stream instead")
+    parser.add_argument("--records", action="store_true", help="write EVENT_RECORDs to stdout instead of text")
+    parser.add_argument("--benchmark", type=int, metavar="PRESSES", help="time a synthetic recording instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    paths = [args.replay] if args.replay else args.devices or find_keyboards()
+    if not paths:
+        print("No readable keyboards under /dev/input (root or the 'input' group is needed)", file=sys.stderr)
+        sys.exit(1)
+    reader = EvdevReader(paths)
+    out = sys.stdout.fileno()
+    try:
+        for events in follow(reader):
+            if args.records:
+                os.write(out, b''.join(EVENT_RECORD.pack(*event) for event in events))
+            else:
+                for event_type, code_id, timestamp in events:
+                    print(f"{timestamp:.3f} {'down' if event_type == EVENT_PRESS else 'up':<4} {id_to_code(code_id)}")
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Append-only, segmented key event log.
+
+Every press/release is appended as a fixed-size EVENT_RECORD to the newest
+segment file. Appends only touch an in-memory buffer; take_pending() hands
+the buffered records to whoever writes them (KeyboardAnalytics does so on its
+background writer thread), so the cost of a save is proportional to the
+number of new events. Aggregate counts are folded into a checkpoint that
+remembers the log position it covers, and the log after that position is
+replayed on startup, so nothing typed before a crash is lost.
+"""
+
+import os
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from keycodes import EVENT_RECORD
+from persistence import lock_directory, write_file_atomic
+from applog import LOG
+
+
+SEGMENT_SUFFIX = ".seg"
+CHECKPOINT_NAME = "checkpoint.json"
+
+
+def segment_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"{index:08d}{SEGMENT_SUFFIX}")
+
+
+def segment_indexes(directory: str) -> List[int]:
+    """Return the indexes of all segments in directory, oldest first"""
+    indexes = []
+    for name in os.listdir(directory):
+        if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+            indexes.append(int(name[:-len(SEGMENT_SUFFIX)]))
+    return sorted(indexes)
+
+
+class EventLog:
+    """Segmented append-only log of key event records"""
+
+    def __init__(self, directory: str, segment_size: int = 4 * 1024 * 1024, max_buffered: int = 4096):
+        self.directory = directory
+        # Round segments to whole records so a record never straddles two files
+        self.segment_size = max(1, segment_size // EVENT_RECORD.size) * EVENT_RECORD.size
+        self.max_buffered = max_buffered
+        self._buffer = bytearray()
+        self._fd = None
+
+        os.makedirs(directory, exist_ok=True)
+        # One writing process per log; a second one fails here
+        self._lock_fd = lock_directory(directory)
+        segments = self.segment_indexes()
+        self.segment = segments[-1] if segments else 1
+        self.offset = self._recover_segment(self.segment)
+
+    def segment_path(self, index: int) -> str:
+        return segment_path(self.directory, index)
+
+    def segment_indexes(self) -> List[int]:
+        """Return the indexes of all segments on disk, oldest first"""
+        return segment_indexes(self.directory)
+
+    def _recover_segment(self, index: int) -> int:
+        """Drop a torn trailing record left by a crash and return the segment size"""
+        path = self.segment_path(index)
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        valid = size - size % EVENT_RECORD.size
+        if valid != size:
+            with open(path, 'r+b') as f:
+                f.truncate(valid)
+        return valid
+
+    def position(self) -> Tuple[int, int]:
+        """Log position (segment, offset) just past the last flushed record"""
+        return self.segment, self.offset
+
+    @property
+    def pending(self) -> int:
+        """Number of appended records not yet handed off for writing"""
+        return len(self._buffer) // EVENT_RECORD.size
+
+    def append(self, event_type: int, code_id: int, timestamp: float):
+        """Buffer one record"""
+        self._buffer += EVENT_RECORD.pack(event_type, code_id, timestamp)
+
+    def take_pending(self) -> bytes:
+        """Detach the buffered records so they can be written elsewhere"""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def write(self, data: bytes):
+        """Write whole records to the current segment, rotating full segments"""
+        pos = 0
+        while pos < len(data):
+            if self.offset >= self.segment_size:
+                self._rotate()
+            fd = self._open_segment()
+            written = os.write(fd, data[pos:pos + self.segment_size - self.offset])
+            self.offset += written
+            pos += written
+
+    def flush(self):
+        """Write buffered records in the calling thread"""
+        self.write(self.take_pending())
+
+    def sync(self):
+        """Flush and force the current segment to stable storage"""
+        self.flush()
+        if self._fd is not None:
+            os.fsync(self._fd)
+
+    def _open_segment(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.segment_path(self.segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        return self._fd
+
+    def _rotate(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.segment += 1
+        self.offset = 0
+
+    def close(self):
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def read_from(self, position: Tuple[int, int] = (0, 0), chunk_records: int = 8192,
+                  end: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, int, float]]:
+        """Yield flushed (event_type, code_id, timestamp) records after a log position, up to end if given"""
+        start_segment, start_offset = position
+        chunk_size = chunk_records * EVENT_RECORD.size
+        for index in self.segment_indexes():
+            if index < start_segment:
+                continue
+            if end is not None and index > end[0]:
+                break
+            with open(self.segment_path(index), 'rb') as f:
+                if index == start_segment:
+                    f.seek(start_offset)
+                remaining = end[1] - f.tell() if end is not None and index == end[0] else None
+                while remaining is None or remaining > 0:
+                    data = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                    usable = len(data) - len(data) % EVENT_RECORD.size
+                    if not usable:
+                        break
+                    if remaining is not None:
+                        remaining -= len(data)
+                    yield from EVENT_RECORD.iter_unpack(memoryview(data)[:usable])
+
+    def load_checkpoint(self) -> Tuple[Optional[Dict[str, int]], Tuple[int, int]]:
+        """Return (counts, position) of the last checkpoint, or (None, start of log)"""
+        path = os.path.join(self.directory, CHECKPOINT_NAME)
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            return data['counts'], (data['segment'], data['offset'])
+        except FileNotFoundError:
+            return None, (0, 0)
+        except Exception as e:
+            LOG.error("Error loading event log checkpoint: %s", e)
+            return None, (0, 0)
+
+    def write_checkpoint(self, counts: Dict[str, int]):
+        """Record aggregate counts covering every record written so far"""
+        segment, offset = self.position()
+        data = {"segment": segment, "offset": offset, "counts": counts}
+        write_file_atomic(os.path.join(self.directory, CHECKPOINT_NAME), json.dumps(data).encode())
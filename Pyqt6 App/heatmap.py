@@ -0,0 +1,64 @@
+"""
+Key frequency heatmap colouring.
+
+Counts for every key of a layout are normalized in one vectorized pass
+(linear, log or percentile scale) and quantized into HEAT_BUCKETS colour
+buckets, looked up in a LUT that is built once. A view only repaints the
+keys whose bucket changed, so a live heatmap costs a handful of key
+repaints per frame rather than a full keyboard redraw.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+
+HEAT_BUCKETS = 32
+HEAT_SCALES = ("linear", "log", "percentile")
+
+# Colour ramp from the unpressed keycap grey through blue to the accent orange
+_RAMP_STOPS = np.array([0.0, 0.35, 0.75, 1.0])
+_RAMP_COLORS = np.array([
+    (74, 74, 74),
+    (70, 110, 190),
+    (255, 126, 95),
+    (255, 214, 120),
+], dtype=np.float64)
+
+# HEAT_LUT[bucket] -> (r, g, b)
+HEAT_LUT = np.stack([
+    np.interp(np.linspace(0.0, 1.0, HEAT_BUCKETS), _RAMP_STOPS, _RAMP_COLORS[:, channel])
+    for channel in range(3)
+], axis=1).round().astype(np.uint8)
+
+
+def key_counts(counts: Sequence[int], key_ids: np.ndarray) -> np.ndarray:
+    """Counts for key_ids out of a count list indexed by code id (ids past its end count 0)"""
+    counts = np.asarray(counts, dtype=np.float64)
+    values = np.zeros(len(key_ids), dtype=np.float64)
+    known = key_ids < len(counts)
+    values[known] = counts[key_ids[known]]
+    return values
+
+
+def normalize(values: np.ndarray, scale: str = "linear") -> np.ndarray:
+    """Map counts onto [0, 1]; keys never pressed are always 0"""
+    peak = values.max(initial=0.0)
+    if peak <= 0:
+        return np.zeros_like(values)
+    if scale == "linear":
+        return values / peak
+    if scale == "log":
+        return np.log1p(values) / np.log1p(peak)
+    if scale == "percentile":
+        # Fraction of pressed keys with a count at or below this one
+        pressed = np.sort(values[values > 0])
+        ranks = np.searchsorted(pressed, values, side='right') / len(pressed)
+        return np.where(values > 0, ranks, 0.0)
+    raise ValueError(f"Unknown heatmap scale: {scale}")
+
+
+def heat_buckets(counts: Sequence[int], key_ids: np.ndarray, scale: str = "linear") -> np.ndarray:
+    """Colour bucket (index into HEAT_LUT) for every key in key_ids"""
+    levels = normalize(key_counts(counts, key_ids), scale)
+    return np.minimum((levels * HEAT_BUCKETS).astype(np.intp), HEAT_BUCKETS - 1)
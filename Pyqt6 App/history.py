@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Historical queries over the raw event log.
+
+The log segments are streamed in fixed-size blocks straight into NumPy
+structured arrays (EVENT_DTYPE has the same packed layout as EVENT_RECORD),
+and every query is a vectorized pass per block that folds into a small
+accumulator. Memory stays constant however long the history is; only the
+per-hour series returned by kps_per_hour grows, with the hours covered.
+
+The reader never opens the log for writing, so it can run next to the GUI
+or kvizd; records not yet flushed by them are simply not seen.
+
+Usage: history.py [--log-dir DIR] [--days N] [--benchmark EVENTS]
+"""
+
+import os
+import time
+import argparse
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, EVENT_RECORD, PERSISTENT_CODE_COUNT, id_to_code
+from eventlog import segment_indexes, segment_path
+
+
+EVENT_DTYPE = np.dtype([('type', 'u1'), ('code', '<u2'), ('timestamp', '<f8')])
+assert EVENT_DTYPE.itemsize == EVENT_RECORD.size
+
+HOUR_MS = 3600 * 1000.0
+
+
+def iter_chunks(directory: str, start_ms: Optional[float] = None, end_ms: Optional[float] = None,
+                chunk_records: int = 1 << 16) -> Iterator[np.ndarray]:
+    """Yield the logged events in [start_ms, end_ms) as EVENT_DTYPE arrays of at most chunk_records
+
+    Unfiltered chunks are views of one reused read buffer, so a consumer must
+    copy anything it keeps past the next iteration. The default block (720KB)
+    keeps each pass within the CPU caches.
+    """
+    buffer = bytearray(chunk_records * EVENT_DTYPE.itemsize)
+    for index in segment_indexes(directory):
+        with open(segment_path(directory, index), 'rb') as f:
+            while True:
+                size = f.readinto(buffer)
+                records = size // EVENT_DTYPE.itemsize
+                if not records:
+                    break
+                chunk = np.frombuffer(buffer, dtype=EVENT_DTYPE, count=records)
+                if start_ms is not None or end_ms is not None:
+                    timestamps = chunk['timestamp']
+                    keep = np.ones(records, dtype=bool)
+                    if start_ms is not None:
+                        keep &= timestamps >= start_ms
+                    if end_ms is not None:
+                        keep &= timestamps < end_ms
+                    chunk = chunk[keep]
+                    if not len(chunk):
+                        continue
+                yield chunk
+
+
+def _runs(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(value, length) of every run of equal consecutive values; like np.unique for sorted input, without the sort"""
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    return values[starts], np.diff(np.append(starts, len(values)))
+
+
+def kps_per_hour(directory: str, start_ms: Optional[float] = None,
+                 end_ms: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """(hour start timestamps in ms, average keys per second in that hour) for every hour with presses"""
+    hours: List[np.ndarray] = []
+    counts: List[np.ndarray] = []
+    for chunk in iter_chunks(directory, start_ms, end_ms):
+        presses = chunk['timestamp'][chunk['type'] == EVENT_PRESS]
+        if not len(presses):
+            continue
+        chunk_hours, chunk_counts = _runs((presses // HOUR_MS).astype(np.int64))
+        hours.append(chunk_hours)
+        counts.append(chunk_counts)
+    if not hours:
+        return np.zeros(0), np.zeros(0)
+
+    # Hours split across chunks (or runs, if the clock stepped back) are added together here
+    all_hours, inverse = np.unique(np.concatenate(hours), return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate(counts))
+    return all_hours * HOUR_MS, totals / 3600.0
+
+
+def dwell_percentiles(directory: str, percentiles: Sequence[float] = (50, 90, 99),
+                      start_ms: Optional[float] = None, end_ms: Optional[float] = None,
+                      max_dwell_ms: int = 2000) -> Dict[str, Tuple[int, List[float]]]:
+    """Per key (and under 'all' for every key) the number of presses and dwell time percentiles in ms
+
+    Dwell times are kept in 1ms histogram bins per key; anything held longer
+    than max_dwell_ms (a stuck or held key) lands in the last bin.
+    """
+    size = PERSISTENT_CODE_COUNT
+    bins = max_dwell_ms + 1
+    histogram = np.zeros(size * bins, dtype=np.int64)
+    held = np.zeros(0, dtype=EVENT_DTYPE)  # Presses whose release is in a later chunk
+
+    for chunk in iter_chunks(directory, start_ms, end_ms):
+        events = np.concatenate([held, chunk]) if len(held) else chunk
+        # Group by key, keeping time order within a key, so a press is followed by its release.
+        # Fields of the packed records are unaligned, so gather from contiguous copies.
+        codes = np.ascontiguousarray(events['code'])
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        types = np.ascontiguousarray(events['type'])[order]
+        timestamps = np.ascontiguousarray(events['timestamp'])[order]
+
+        same_key = codes[1:] == codes[:-1]
+        paired = same_key & (types[:-1] == EVENT_PRESS) & (types[1:] == EVENT_RELEASE)
+        keys = codes[1:][paired].astype(np.intp)
+        dwell = np.diff(timestamps)[paired]
+        np.clip(dwell, 0, max_dwell_ms, out=dwell)
+        known = keys < size
+        histogram += np.bincount(keys[known] * bins + dwell[known].astype(np.intp), minlength=size * bins)
+
+        last_of_key = np.ones(len(codes), dtype=bool)
+        last_of_key[:-1] = ~same_key
+        held = events[order[last_of_key & (types == EVENT_PRESS)]]
+
+    per_key = histogram.reshape(size, bins)
+    rows = np.vstack([per_key, per_key.sum(axis=0)])
+    totals = rows.sum(axis=1)
+    cumulative = np.cumsum(rows, axis=1)
+    # First bin at which the cumulative count reaches each percentile's rank
+    targets = np.outer(totals, np.asarray(percentiles, dtype=np.float64) / 100.0)
+    values = (cumulative[:, None, :] < targets[:, :, None]).sum(axis=2)
+
+    result = {}
+    for code_id in np.flatnonzero(totals):
+        code = 'all' if code_id == size else id_to_code(int(code_id))
+        result[code] = (int(totals[code_id]), values[code_id].astype(float).tolist())
+    return result
+
+
+def busiest_periods(directory: str, period_ms: float = HOUR_MS, n: int = 10,
+                    start_ms: Optional[float] = None, end_ms: Optional[float] = None) -> List[Tuple[float, int]]:
+    """The n periods of period_ms with the most presses, as (period start ms, presses), busiest first
+
+    Events are logged in time order, so only the last period of a chunk can
+    continue into the next one; every other period is final and competes for
+    the running top n straight away. (A period interrupted by the system
+    clock stepping back is counted as two.)
+    """
+    top_periods = np.zeros(0, dtype=np.int64)
+    top_counts = np.zeros(0, dtype=np.int64)
+    open_period, open_count = None, 0
+
+    def keep_top(periods: np.ndarray, counts: np.ndarray):
+        nonlocal top_periods, top_counts
+        top_periods = np.concatenate([top_periods, periods])
+        top_counts = np.concatenate([top_counts, counts])
+        if len(top_counts) > n:
+            best = np.argpartition(top_counts, -n)[-n:]
+            top_periods, top_counts = top_periods[best], top_counts[best]
+
+    for chunk in iter_chunks(directory, start_ms, end_ms):
+        presses = chunk['timestamp'][chunk['type'] == EVENT_PRESS]
+        if not len(presses):
+            continue
+        periods, counts = _runs((presses // period_ms).astype(np.int64))
+        if open_period is not None:
+            if periods[0] == open_period:
+                counts[0] += open_count
+            else:
+                keep_top(np.array([open_period]), np.array([open_count]))
+        keep_top(periods[:-1], counts[:-1])
+        open_period, open_count = int(periods[-1]), int(counts[-1])
+
+    if open_period is not None:
+        keep_top(np.array([open_period]), np.array([open_count]))
+    order = np.argsort(top_counts, kind='stable')[::-1]
+    return [(float(top_periods[i] * period_ms), int(top_counts[i])) for i in order]
+
+
+def _write_synthetic_log(directory: str, events: int, chunk_records: int = 1 << 20):
+    """Write a log of events press/release pairs, spread over about a year, for benchmarking"""
+    rng = np.random.default_rng(1)
+    os.makedirs(directory, exist_ok=True)
+    timestamp = time.time() * 1000 - 365 * 24 * HOUR_MS
+    with open(segment_path(directory, 1), 'wb') as f:
+        for start in range(0, events, chunk_records):
+            pairs = min(chunk_records, events - start) // 2
+            gaps = rng.exponential(150.0, pairs)
+            gaps[rng.random(pairs) < 0.001] += 8 * HOUR_MS * rng.random()  # Breaks between sessions
+            presses = timestamp + np.cumsum(gaps)
+            timestamp = presses[-1] + 200
+            records = np.empty(pairs * 2, dtype=EVENT_DTYPE)
+            records['type'][0::2] = EVENT_PRESS
+            records['type'][1::2] = EVENT_RELEASE
+            records['code'][0::2] = records['code'][1::2] = rng.integers(1, PERSISTENT_CODE_COUNT, pairs)
+            records['timestamp'][0::2] = presses
+            records['timestamp'][1::2] = presses + rng.gamma(4.0, 22.0, pairs)
+            f.write(records.tobytes())
+
+
+def _benchmark(events: int = 20_000_000):
+    """Time every query over a synthetic log of the given size"""
+    import tempfile
+    import resource
+
+    with tempfile.TemporaryDirectory(prefix="kviz-history-") as directory:
+        _write_synthetic_log(directory, events)
+        megabytes = events * EVENT_DTYPE.itemsize / 1e6
+        print(f"{events} events ({megabytes:.0f}MB of log)")
+        for name, query in (("kps_per_hour", lambda: kps_per_hour(directory)),
+                            ("dwell_percentiles", lambda: dwell_percentiles(directory)),
+                            ("busiest_periods", lambda: busiest_periods(directory))):
+            start = time.perf_counter()
+            query()
+            print(f"{name:<20}{time.perf_counter() - start:8.3f}s")
+        print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on the recorded keystroke history")
+    parser.add_argument("--log-dir", default="key_events", help="event log directory (default: %(default)s)")
+    parser.add_argument("--days", type=float, help="only look at the last N days")
+    parser.add_argument("--top", type=int, default=10, help="keys and periods to list (default: %(default)s)")
+    parser.add_argument("--benchmark", type=int, metavar="EVENTS",
+                        help="time the queries over a synthetic log of EVENTS events instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    start_ms = time.time() * 1000 - args.days * 24 * HOUR_MS if args.days else None
+    hours, kps = kps_per_hour(args.log_dir, start_ms)
+    print(f"{len(hours)} active hours, mean {kps.mean() if len(kps) else 0:.3f} KPS, "
+          f"peak {kps.max(initial=0):.3f} KPS")
+
+    print(f"\n{'busiest hour':<20}{'presses':>10}")
+    for period_start, presses in busiest_periods(args.log_dir, n=args.top, start_ms=start_ms):
+        print(f"{time.strftime('%Y-%m-%d %H:00', time.localtime(period_start / 1000)):<20}{presses:>10}")
+
+    dwell = dwell_percentiles(args.log_dir, start_ms=start_ms)
+    print(f"\n{'dwell ms':<20}{'presses':>10}{'p50':>8}{'p90':>8}{'p99':>8}")
+    ranked = sorted(dwell.items(), key=lambda item: item[1][0], reverse=True)
+    for code, (presses, (p50, p90, p99)) in ranked[:args.top + 1]:
+        print(f"{code:<20}{presses:>10}{p50:>8.0f}{p90:>8.0f}{p99:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Key code table and event record format shared by the capture helper, the GUI
+and the on-disk event log.
+
+Key identity travels between processes and to disk as a small integer id
+instead of the web KeyboardEvent.code string. Id 0 is reserved for "unknown
+key". Ids are persisted, so WEB_CODES must only ever be appended to.
+"""
+
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+EVENT_PRESS = 1
+EVENT_RELEASE = 2
+
+# <event type: u8><code id: u16><timestamp ms: f64>
+EVENT_RECORD = struct.Struct('<BHd')
+
+
+WEB_CODES = (
+    None,
+    # Letters
+    'KeyA', 'KeyB', 'KeyC', 'KeyD', 'KeyE', 'KeyF', 'KeyG', 'KeyH', 'KeyI',
+    'KeyJ', 'KeyK', 'KeyL', 'KeyM', 'KeyN', 'KeyO', 'KeyP', 'KeyQ', 'KeyR',
+    'KeyS', 'KeyT', 'KeyU', 'KeyV', 'KeyW', 'KeyX', 'KeyY', 'KeyZ',
+
+    # Numbers
+    'Digit1', 'Digit2', 'Digit3', 'Digit4', 'Digit5',
+    'Digit6', 'Digit7', 'Digit8', 'Digit9', 'Digit0',
+
+    # Function keys
+    'F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'F9', 'F10', 'F11', 'F12',
+
+    # Special keys
+    'Space', 'Enter', 'Backspace', 'Delete', 'Tab', 'Escape', 'CapsLock',
+    'ShiftLeft', 'ShiftRight', 'ControlLeft', 'ControlRight',
+    'AltLeft', 'AltRight', 'MetaLeft', 'MetaRight', 'ContextMenu',
+
+    # Punctuation
+    'Semicolon', 'Quote', 'Comma', 'Period', 'Slash', 'Backslash',
+    'BracketLeft', 'BracketRight', 'Minus', 'Equal', 'Backquote',
+
+    # Arrows
+    'ArrowLeft', 'ArrowRight', 'ArrowUp', 'ArrowDown',
+
+    # Navigation
+    'Home', 'End', 'PageUp', 'PageDown', 'Insert',
+    'PrintScreen', 'ScrollLock', 'Pause',
+
+    # Additions - append only, ids above are persisted
+    'NumLock', 'F13', 'F14', 'F15', 'F16', 'F17', 'F18', 'F19', 'F20',
+)
+
+# Ids below this are stable across runs and may be written to disk
+PERSISTENT_CODE_COUNT = len(WEB_CODES)
+
+
+class KeyRegistry:
+    """Interns web codes to small dense integer ids
+    
+    The fixed WEB_CODES table comes first so its ids are the same in every
+    process. Codes outside it (layout-only codes such as 'N/A') get ids past
+    PERSISTENT_CODE_COUNT that are only valid for the current process.
+    """
+    
+    def __init__(self, codes=WEB_CODES):
+        self.codes: List[Optional[str]] = list(codes)
+        self.ids: Dict[str, int] = {code: code_id for code_id, code in enumerate(self.codes) if code}
+    
+    def __len__(self) -> int:
+        return len(self.codes)
+    
+    def intern(self, code: str) -> int:
+        """Return the id for a code, assigning a new one if needed"""
+        code_id = self.ids.get(code)
+        if code_id is None:
+            code_id = len(self.codes)
+            self.codes.append(code)
+            self.ids[code] = code_id
+        return code_id
+    
+    def lookup(self, code: Optional[str]) -> int:
+        """Return the id for a code, 0 if it was never interned"""
+        return self.ids.get(code, 0)
+    
+    def code(self, code_id: int) -> Optional[str]:
+        """Return the code for an id, None for unknown ids"""
+        if 0 < code_id < len(self.codes):
+            return self.codes[code_id]
+        return None
+
+
+REGISTRY = KeyRegistry()
+
+
+def code_to_id(code: Optional[str]) -> int:
+    """Return the id for a web code, 0 if the code is unknown"""
+    return REGISTRY.ids.get(code, 0)
+
+
+def id_to_code(code_id: int) -> Optional[str]:
+    """Return the web code for an id, None for unknown ids"""
+    return REGISTRY.code(code_id)
+
+
+def intern_code(code: str) -> int:
+    """Return the id for a web code, registering it if needed"""
+    return REGISTRY.intern(code)
+
+
+class KeyCounter:
+    """Dense per-key counter backed by a list indexed by key id"""
+    
+    __slots__ = ('counts',)
+    
+    def __init__(self):
+        self.counts: List[int] = [0] * len(REGISTRY)
+    
+    def add(self, code_id: int, amount: int = 1) -> int:
+        """Add to a key's count and return the new value"""
+        counts = self.counts
+        if code_id >= len(counts):
+            counts.extend([0] * (code_id + 1 - len(counts)))
+        counts[code_id] += amount
+        return counts[code_id]
+    
+    def get(self, code_id: int) -> int:
+        counts = self.counts
+        return counts[code_id] if code_id < len(counts) else 0
+    
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Yield (code, count) for every key with a non-zero count"""
+        for code_id, count in enumerate(self.counts):
+            if count:
+                yield REGISTRY.codes[code_id], count
+    
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self.items())
+    
+    def update_from_dict(self, counts: Dict[str, int]):
+        """Add counts keyed by web code, as loaded from JSON"""
+        for code, count in counts.items():
+            self.add(intern_code(code), count)
+    
+    def total(self) -> int:
+        return sum(self.counts)
+    
+    def clear(self):
+        self.counts = [0] * len(REGISTRY)
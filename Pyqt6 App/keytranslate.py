@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Key translation tables for every capture source.
+
+All tables are built once at import time, so translating an event is a
+single dict lookup. Sources covered:
+- Qt key values (QKeyEvent.key()), stored as plain ints so this module does
+  not need Qt
+- str() of pynput keys, as produced by the capture helper
+- 'keyboard' library event names
+- Linux evdev key codes (KEY_* from linux/input-event-codes.h)
+- display names for the analytics panel
+
+Run this file directly for a per-event translation microbenchmark.
+"""
+
+from typing import Dict, List, Optional
+
+from keycodes import WEB_CODES, code_to_id
+
+
+# Printable characters (unshifted and shifted) to the physical key's web code
+CHAR_CODES: Dict[str, str] = {' ': 'Space'}
+for _letter in 'abcdefghijklmnopqrstuvwxyz':
+    CHAR_CODES[_letter] = f'Key{_letter.upper()}'
+    CHAR_CODES[_letter.upper()] = f'Key{_letter.upper()}'
+for _digit, _shifted in zip('1234567890', '!@#$%^&*()'):
+    CHAR_CODES[_digit] = f'Digit{_digit}'
+    CHAR_CODES[_shifted] = f'Digit{_digit}'
+for _chars, _code in (
+    (';:', 'Semicolon'), ('\'"', 'Quote'), (',<', 'Comma'), ('.>', 'Period'),
+    ('/?', 'Slash'), ('\\|', 'Backslash'), ('[{', 'BracketLeft'),
+    (']}', 'BracketRight'), ('-_', 'Minus'), ('=+', 'Equal'), ('`~', 'Backquote'),
+):
+    for _char in _chars:
+        CHAR_CODES[_char] = _code
+
+
+# Qt::Key values for non-printable keys
+_QT_SPECIAL_KEYS = {
+    0x01000000: 'Escape',
+    0x01000001: 'Tab',
+    0x01000002: 'Tab',          # Backtab (Shift+Tab)
+    0x01000003: 'Backspace',
+    0x01000004: 'Enter',        # Return
+    0x01000005: 'Enter',        # Keypad Enter
+    0x01000006: 'Insert',
+    0x01000007: 'Delete',
+    0x01000008: 'Pause',
+    0x01000009: 'PrintScreen',
+    0x01000010: 'Home',
+    0x01000011: 'End',
+    0x01000012: 'ArrowLeft',
+    0x01000013: 'ArrowUp',
+    0x01000014: 'ArrowRight',
+    0x01000015: 'ArrowDown',
+    0x01000016: 'PageUp',
+    0x01000017: 'PageDown',
+    0x01000020: 'ShiftLeft',
+    0x01000021: 'ControlLeft',
+    0x01000022: 'MetaLeft',
+    0x01000023: 'AltLeft',
+    0x01001103: 'AltRight',     # AltGr
+    0x01000024: 'CapsLock',
+    0x01000025: 'NumLock',
+    0x01000026: 'ScrollLock',
+    0x01000053: 'MetaLeft',     # Super_L
+    0x01000054: 'MetaRight',    # Super_R
+    0x01000055: 'ContextMenu',
+}
+
+# Qt::Key -> web code. Printable Qt keys use the upper-case character value.
+QT_KEY_CODES: Dict[int, str] = {ord(char.upper()): code for char, code in CHAR_CODES.items()}
+QT_KEY_CODES.update(_QT_SPECIAL_KEYS)
+QT_KEY_CODES.update({0x01000030 + i: f'F{i + 1}' for i in range(20)})
+
+
+_PYNPUT_SPECIAL_KEYS = {
+    'space': 'Space', 'enter': 'Enter', 'backspace': 'Backspace', 'delete': 'Delete',
+    'tab': 'Tab', 'esc': 'Escape', 'caps_lock': 'CapsLock',
+    'shift': 'ShiftLeft', 'shift_l': 'ShiftLeft', 'shift_r': 'ShiftRight',
+    'ctrl': 'ControlLeft', 'ctrl_l': 'ControlLeft', 'ctrl_r': 'ControlRight',
+    'alt': 'AltLeft', 'alt_l': 'AltLeft', 'alt_r': 'AltRight', 'alt_gr': 'AltRight',
+    'cmd': 'MetaLeft', 'cmd_l': 'MetaLeft', 'cmd_r': 'MetaRight',
+    'up': 'ArrowUp', 'down': 'ArrowDown', 'left': 'ArrowLeft', 'right': 'ArrowRight',
+    'home': 'Home', 'end': 'End', 'page_up': 'PageUp', 'page_down': 'PageDown',
+    'insert': 'Insert', 'menu': 'ContextMenu', 'num_lock': 'NumLock',
+    'print_screen': 'PrintScreen', 'scroll_lock': 'ScrollLock', 'pause': 'Pause',
+}
+
+# str(pynput key) -> web code. KeyCode prints as repr(char), Key as 'Key.<name>'.
+PYNPUT_KEY_CODES: Dict[str, str] = {repr(char): code for char, code in CHAR_CODES.items()}
+PYNPUT_KEY_CODES.update({f'Key.{name}': code for name, code in _PYNPUT_SPECIAL_KEYS.items()})
+PYNPUT_KEY_CODES.update({f'Key.f{i}': f'F{i}' for i in range(1, 21)})
+
+
+# 'keyboard' library event.name -> web code
+KEYBOARD_NAME_CODES: Dict[str, str] = dict(CHAR_CODES)
+KEYBOARD_NAME_CODES.update({
+    'space': 'Space', 'enter': 'Enter', 'backspace': 'Backspace', 'delete': 'Delete',
+    'tab': 'Tab', 'esc': 'Escape', 'caps lock': 'CapsLock',
+    'shift': 'ShiftLeft', 'left shift': 'ShiftLeft', 'right shift': 'ShiftRight',
+    'ctrl': 'ControlLeft', 'left ctrl': 'ControlLeft', 'right ctrl': 'ControlRight',
+    'alt': 'AltLeft', 'left alt': 'AltLeft', 'right alt': 'AltRight', 'alt gr': 'AltRight',
+    'windows': 'MetaLeft', 'left windows': 'MetaLeft', 'right windows': 'MetaRight',
+    'command': 'MetaLeft', 'left command': 'MetaLeft', 'right command': 'MetaRight',
+    'up': 'ArrowUp', 'down': 'ArrowDown', 'left': 'ArrowLeft', 'right': 'ArrowRight',
+    'home': 'Home', 'end': 'End', 'page up': 'PageUp', 'page down': 'PageDown',
+    'insert': 'Insert', 'menu': 'ContextMenu', 'num lock': 'NumLock',
+    'print screen': 'PrintScreen', 'scroll lock': 'ScrollLock', 'pause': 'Pause',
+})
+KEYBOARD_NAME_CODES.update({f'f{i}': f'F{i}' for i in range(1, 21)})
+
+
+# Linux evdev KEY_* code -> web code. Evdev codes name physical keys, like web codes.
+EVDEV_KEY_CODES: Dict[int, str] = {
+    1: 'Escape', 14: 'Backspace', 15: 'Tab', 28: 'Enter', 57: 'Space',
+    12: 'Minus', 13: 'Equal', 26: 'BracketLeft', 27: 'BracketRight', 39: 'Semicolon',
+    40: 'Quote', 41: 'Backquote', 43: 'Backslash', 51: 'Comma', 52: 'Period', 53: 'Slash',
+    29: 'ControlLeft', 97: 'ControlRight', 42: 'ShiftLeft', 54: 'ShiftRight',
+    56: 'AltLeft', 100: 'AltRight', 125: 'MetaLeft', 126: 'MetaRight', 127: 'ContextMenu',
+    58: 'CapsLock', 69: 'NumLock', 70: 'ScrollLock', 99: 'PrintScreen', 119: 'Pause',
+    96: 'Enter',                # Keypad Enter, as for Qt
+    102: 'Home', 103: 'ArrowUp', 104: 'PageUp', 105: 'ArrowLeft', 106: 'ArrowRight',
+    107: 'End', 108: 'ArrowDown', 109: 'PageDown', 110: 'Insert', 111: 'Delete',
+    87: 'F11', 88: 'F12',
+}
+# Letter rows in scancode order
+for _first, _letters in ((16, 'QWERTYUIOP'), (30, 'ASDFGHJKL'), (44, 'ZXCVBNM')):
+    for _offset, _letter in enumerate(_letters):
+        EVDEV_KEY_CODES[_first + _offset] = f'Key{_letter}'
+EVDEV_KEY_CODES.update({2 + i: f'Digit{digit}' for i, digit in enumerate('1234567890')})
+EVDEV_KEY_CODES.update({59 + i: f'F{i + 1}' for i in range(10)})
+EVDEV_KEY_CODES.update({183 + i: f'F{i + 13}' for i in range(8)})
+
+
+# Short names for the analytics panel
+_DISPLAY_OVERRIDES = {
+    'Space': 'Space',
+    'Enter': 'Enter',
+    'Backspace': 'Backsp',
+    'ShiftLeft': 'LShift',
+    'ShiftRight': 'RShift',
+    'ControlLeft': 'LCtrl',
+    'ControlRight': 'RCtrl',
+    'AltLeft': 'LAlt',
+    'AltRight': 'RAlt',
+    'MetaLeft': 'LCmd',
+    'MetaRight': 'RCmd',
+    'Tab': 'Tab',
+    'CapsLock': 'Caps',
+    'Escape': 'Esc'
+}
+
+
+def _derive_display_name(code: str) -> str:
+    if code in _DISPLAY_OVERRIDES:
+        return _DISPLAY_OVERRIDES[code]
+    elif code.startswith('Key'):
+        return code[3:]
+    elif code.startswith('Digit'):
+        return code[5:]
+    elif code.startswith('Arrow'):
+        return code[5:]
+    return code
+
+
+DISPLAY_NAMES: Dict[str, str] = {code: _derive_display_name(code) for code in WEB_CODES if code}
+
+# Direct source -> code id tables for the hot path
+QT_KEY_IDS: Dict[int, int] = {key: code_to_id(code) for key, code in QT_KEY_CODES.items()}
+PYNPUT_KEY_IDS: Dict[str, int] = {key: code_to_id(code) for key, code in PYNPUT_KEY_CODES.items()}
+# Indexed by evdev code (0 = unmapped), so a bulk reader can translate without hashing
+EVDEV_KEY_IDS: List[int] = [0] * (max(EVDEV_KEY_CODES) + 1)
+for _evdev_code, _code in EVDEV_KEY_CODES.items():
+    EVDEV_KEY_IDS[_evdev_code] = code_to_id(_code)
+
+
+def qt_key_to_code(qt_key: int) -> Optional[str]:
+    """Convert a Qt key value to a web code"""
+    return QT_KEY_CODES.get(qt_key)
+
+
+def qt_key_to_id(qt_key: int) -> int:
+    """Convert a Qt key value to a code id, 0 if unmapped"""
+    return QT_KEY_IDS.get(qt_key, 0)
+
+
+def pynput_key_to_code(key_str: str) -> Optional[str]:
+    """Convert the str() of a pynput key to a web code"""
+    return PYNPUT_KEY_CODES.get(key_str)
+
+
+def pynput_key_to_id(key_str: str) -> int:
+    """Convert the str() of a pynput key to a code id, 0 if unmapped"""
+    return PYNPUT_KEY_IDS.get(key_str, 0)
+
+
+def evdev_key_to_id(evdev_code: int) -> int:
+    """Convert a Linux evdev key code to a code id, 0 if unmapped"""
+    return EVDEV_KEY_IDS[evdev_code] if 0 <= evdev_code < len(EVDEV_KEY_IDS) else 0
+
+
+def keyboard_name_to_code(name: str) -> Optional[str]:
+    """Convert a 'keyboard' library event name to a web code"""
+    code = KEYBOARD_NAME_CODES.get(name)
+    if code is None:
+        code = KEYBOARD_NAME_CODES.get(name.lower())
+    return code
+
+
+def display_name(code: str) -> str:
+    """Short label for a web code"""
+    name = DISPLAY_NAMES.get(code)
+    if name is None:
+        name = DISPLAY_NAMES[code] = _derive_display_name(code)
+    return name
+
+
+def _benchmark(rounds: int = 2000):
+    """Print per-event translation cost for each table"""
+    import time
+
+    qt_keys = list(QT_KEY_CODES)
+    pynput_keys = list(PYNPUT_KEY_CODES)
+    keyboard_names = list(KEYBOARD_NAME_CODES)
+    codes = [code for code in WEB_CODES if code]
+
+    # Old behaviour: the whole table rebuilt on every call
+    def rebuild_per_call(qt_key):
+        return dict(QT_KEY_CODES).get(qt_key)
+
+    def per_event_ns(fn, inputs):
+        best = float('inf')
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for value in inputs:
+                    fn(value)
+            best = min(best, time.perf_counter() - start)
+        return best / (rounds * len(inputs)) * 1e9
+
+    cases = [
+        ("qt_key_to_code (table rebuilt per call, old)", rebuild_per_call, qt_keys),
+        ("qt_key_to_code", qt_key_to_code, qt_keys),
+        ("qt_key_to_id", qt_key_to_id, qt_keys),
+        ("pynput_key_to_id", pynput_key_to_id, pynput_keys),
+        ("evdev_key_to_id", evdev_key_to_id, list(EVDEV_KEY_CODES)),
+        ("keyboard_name_to_code", keyboard_name_to_code, keyboard_names),
+        ("display_name", display_name, codes),
+    ]
+
+    print(f"{'translator':<48}{'ns/event':>10}")
+    for name, fn, inputs in cases:
+        print(f"{name:<48}{per_event_ns(fn, inputs):>10.1f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
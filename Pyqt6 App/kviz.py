@@ -6,17 +6,20 @@ A real-time keyboard visualization and analytics application for macOS
 
 import sys
 import time
+import importlib.util
+
+_startup_time = time.perf_counter()  # Start of the import phase for --profile-startup
+
 import os
 import math
 import json
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager, nullcontext
 from typing import Dict, List, Set, Optional, Tuple
-from dataclasses import dataclass
-from pynput import keyboard as global_keyboard
 from PyQt6.QtWidgets import QCheckBox, QSystemTrayIcon
 from PyQt6.QtCore import QThread, pyqtSignal
 from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import QTimer, Qt, pyqtSignal, QRect, QSize, QObject
+from PyQt6.QtCore import QTimer, Qt, pyqtSignal, QRect, QSize, QObject, QSocketNotifier
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -26,164 +29,376 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import QTimer, Qt, pyqtSignal, QRect, QSize
 from PyQt6.QtGui import (
     QPainter, QPen, QBrush, QColor, QFont, QFontMetrics, 
-    QPalette, QLinearGradient, QKeyEvent
+    QPalette, QLinearGradient, QKeyEvent, QPixmap
+)
+
+from keycodes import (
+    EVENT_PRESS, EVENT_RELEASE, EVENT_RECORD,
+    code_to_id, id_to_code, intern_code
+)
+from keytranslate import display_name, keyboard_name_to_code, qt_key_to_code, qt_key_to_id
+from analytics import KeyboardAnalytics
+from persistence import DirectoryLockedError
+from applog import LOG, install_dump_handlers
+from latency import (
+    LATENCY, STAGE_PIPE_READ, STAGE_SIGNAL, STAGE_RECORD, STAGE_UPDATE,
+    STAGE_OVERLAY_PAINT, STAGE_KEYBOARD_PAINT
 )
+from layouts import KeyDef, layout_exists, load_layout
+
+try:
+    import numpy as np
+    from heatmap import HEAT_LUT, HEAT_SCALES, heat_buckets
+except ImportError:
+    np = None  # numpy not installed: heatmap mode is unavailable
+    HEAT_LUT, HEAT_SCALES = (), ()
+
+_import_seconds = time.perf_counter() - _startup_time
+
+
+class StartupProfile:
+    """Phase timings collected while the app starts (--profile-startup)"""
+    
+    def __init__(self, start: float):
+        self.start = start
+        self.phases: List[List] = []  # [name, seconds, depth]
+        self.depth = 0
+        self.last_end = start
+    
+    def add(self, name: str, seconds: float):
+        self.phases.append([name, seconds, self.depth])
+        self.last_end = time.perf_counter()
+    
+    @contextmanager
+    def phase(self, name: str):
+        entry = [name, 0.0, self.depth]
+        self.phases.append(entry)
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.last_end = time.perf_counter()
+            entry[1] = self.last_end - start
+            self.depth -= 1
+    
+    def report(self):
+        total = time.perf_counter() - self.start
+        print(f"{'startup phase':<40}{'ms':>10}")
+        for name, seconds, depth in self.phases:
+            print(f"{'  ' * depth + name:<40}{seconds * 1000:>10.1f}")
+        print(f"{'total to first paint':<40}{total * 1000:>10.1f}")
+
+
+_startup_profile: Optional[StartupProfile] = None
 
+# Shared-memory ring the capture helper publishes into (--ring[=NAME]); None uses the pipe
+_capture_ring: Optional[str] = None
+
+
+def startup_phase(name: str):
+    """Time a block as a startup phase when --profile-startup is active"""
+    if _startup_profile is None:
+        return nullcontext()
+    return _startup_profile.phase(name)
+
+
+def finish_startup_profile():
+    """Record the first paint and print the breakdown, once"""
+    global _startup_profile
+    profile, _startup_profile = _startup_profile, None
+    if profile is not None:
+        profile.add("first paint", time.perf_counter() - profile.last_end)
+        profile.report()
 
-@dataclass
-class KeyDef:
-    """Key definition matching the HTML structure"""
-    row: int
-    col: int
-    x: float
-    y: float
-    width: float
-    height: float
-    label: str
-    code: str
-    key: str
-    rotation: float = 0.0
-    is_special: bool = False
-    is_knob: bool = False
-    space_side: Optional[str] = None
 
 class PynputGlobalKeyListener(QObject):
     """Global keyboard listener - DIRECT APPROACH"""
-    key_pressed = pyqtSignal(str)
-    key_released = pyqtSignal(str)
+    key_events = pyqtSignal(list)  # [(event_type, code_id, timestamp_ms), ...]
+    # Polling a ring another process writes: milliseconds between reads, and seconds without events before backing off
+    RING_POLL_MS = 5
+    RING_IDLE_POLL_MS = 500
+    RING_IDLE_AFTER = 2.0
     
-    def __init__(self):
+    def __init__(self, ring: Optional[str] = None):
+        """ring: read events from this shared-memory ring (shmring.py) instead of the helper's stdout
+        
+        Other processes (kvizd --ring, shmring.py) can then read the same
+        stream. The helper's stdout then only carries wakeup bytes, so
+        nothing runs while nothing is typed. If another process's helper
+        already writes the ring, ours exits and that ring is polled instead.
+        """
         super().__init__()
         self.running = False
+        self.process = None
+        self.notifier = None
+        self._pending = b''
+        self.ring = ring
+        self.reader = None
+        self.poll_timer = None
+        self.last_ring_event = 0.0
         
     def start_listening(self):
         """Start global keyboard capture using direct pynput"""
-        print("🎯 Starting DIRECT pynput capture...")
+        LOG.info("🎯 Starting DIRECT pynput capture...")
         
         if not self.running:
             try:
                 import subprocess
-                import sys
                 
-                # Use the EXACT same code that worked in your test script
-                script = f'''
-import sys
-sys.path.insert(0, "{os.path.dirname(sys.executable)}")
-
-from pynput import keyboard
-import time
-
-print("🚀 DIRECT CAPTURE STARTING!")
-
-def on_press(key):
-    try:
-        print(f"KEY_PRESS:{{key}}")
-        sys.stdout.flush()
-    except:
-        pass
-
-def on_release(key):
-    try:
-        print(f"KEY_RELEASE:{{key}}")
-        sys.stdout.flush()
-    except:
-        pass
-
-listener = keyboard.Listener(on_press=on_press, on_release=on_release)
-listener.start()
-
-try:
-    while True:
-        time.sleep(0.1)
-except KeyboardInterrupt:
-    listener.stop()
-'''
-                
-                # Write and run the script
-                script_path = "/tmp/direct_keylogger.py"
-                with open(script_path, 'w') as f:
-                    f.write(script)
-                
-                # Start subprocess with real-time output
-                self.process = subprocess.Popen([
-                    sys.executable, script_path
-                ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                   bufsize=1, universal_newlines=True)
+                script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture_helper.py")
+                if self.ring:
+                    # Records go through the ring, wakeup bytes through the pipe
+                    command = [sys.executable, script_path, "--ring", self.ring, "--wake"]
+                else:
+                    # Helper writes fixed-size binary records to its stdout
+                    command = [sys.executable, script_path]
+                self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
                 
                 self.running = True
+                self._pending = b''
                 
-                # Start reading output
-                self.read_timer = QTimer()
-                self.read_timer.timeout.connect(self.read_process_output)
-                self.read_timer.start(50)  # Check every 50ms
+                # Drain the pipe whenever it becomes readable
+                fd = self.process.stdout.fileno()
+                os.set_blocking(fd, False)
+                self.notifier = QSocketNotifier(fd, QSocketNotifier.Type.Read)
+                self.notifier.activated.connect(self.read_ring if self.ring else self.read_process_output)
                 
-                print("✅ DIRECT CAPTURE IS LIVE!")
+                LOG.info("✅ DIRECT CAPTURE IS LIVE!")
                 return True
                 
             except Exception as e:
-                print(f"❌ Failed to start direct capture: {e}")
+                LOG.error("❌ Failed to start direct capture: %s", e)
                 return False
         
         return False
     
     def read_process_output(self):
-        """Read subprocess output in real-time"""
-        if self.process and self.process.poll() is None:
+        """Drain all pending records and emit them as one batch"""
+        if not self.process:
+            return
+        
+        fd = self.process.stdout.fileno()
+        chunks = [self._pending]
+        eof = False
+        while True:
             try:
-                # Read available output
-                import select
-                if select.select([self.process.stdout], [], [], 0)[0]:
-                    line = self.process.stdout.readline()
-                    if line:
-                        line = line.strip()
-                        if line.startswith("KEY_PRESS:"):
-                            key_str = line[10:]
-                            code = self.convert_key_string(key_str)
-                            if code:
-                                print(f"🌍 DIRECT PRESS: {code}")
-                                self.key_pressed.emit(code)
-                        elif line.startswith("KEY_RELEASE:"):
-                            key_str = line[12:]
-                            code = self.convert_key_string(key_str)
-                            if code:
-                                self.key_released.emit(code)
-            except:
-                pass
-    
-    def convert_key_string(self, key_str):
-        """Convert string representation to code"""
-        # Handle character keys
-        if len(key_str) == 3 and key_str.startswith("'") and key_str.endswith("'"):
-            char = key_str[1].lower()
-            if char.isalpha():
-                return f'Key{char.upper()}'
-            elif char.isdigit():
-                return f'Digit{char}'
-        
-        # Handle special keys
-        if "Key.space" in key_str:
-            return 'Space'
-        elif "Key.enter" in key_str:
-            return 'Enter'
-        elif "Key.backspace" in key_str:
-            return 'Backspace'
-        elif "Key.cmd" in key_str:
-            return 'MetaLeft'
-        
-        return None
+                chunk = os.read(fd, 65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                eof = True
+                break
+            if not chunk:
+                eof = True
+                break
+            chunks.append(chunk)
+        
+        data = b''.join(chunks)
+        usable = len(data) - len(data) % EVENT_RECORD.size
+        self._pending = data[usable:]
+        
+        batch = [record for record in EVENT_RECORD.iter_unpack(memoryview(data)[:usable]) if record[1]]
+        if LATENCY.enabled:
+            # Presses are timed from the helper's capture timestamp
+            for event_type, code_id, timestamp in batch:
+                if event_type == EVENT_PRESS:
+                    LATENCY.begin(code_id, timestamp)
+                    LATENCY.mark(STAGE_PIPE_READ, code_id)
+        if batch:
+            self.key_events.emit(batch)
+        
+        if eof:
+            LOG.warning("⚠️  Capture helper exited")
+            self.stop_listening()
+    
+    def read_ring(self):
+        """Woken by the helper: emit every record published to the ring since the last wakeup as one batch"""
+        if not self.process:
+            return
+        
+        fd = self.process.stdout.fileno()
+        eof = False
+        while True:
+            try:
+                if not os.read(fd, 65536):
+                    eof = True
+                    break
+            except BlockingIOError:
+                break
+            except OSError:
+                eof = True
+                break
+        
+        if self.reader is None and not eof:
+            from shmring import RingReader
+            # The helper creates the ring before its first wakeup; everything in it was typed since capture started
+            self.reader = RingReader(self.ring, from_start=True)
+        
+        if self.reader:
+            self.emit_ring_records()
+        
+        if eof:
+            if self.reader is None and self.follow_existing_ring():
+                return
+            LOG.warning("⚠️  Capture helper exited")
+            self.stop_listening()
+    
+    def emit_ring_records(self) -> int:
+        """Emit every record published since the last read as one batch; returns the batch size"""
+        batch = [record for record in self.reader.read() if record[1]]
+        if LATENCY.enabled:
+            for event_type, code_id, timestamp in batch:
+                if event_type == EVENT_PRESS:
+                    LATENCY.begin(code_id, timestamp)
+                    LATENCY.mark(STAGE_PIPE_READ, code_id)
+        if batch:
+            self.key_events.emit(batch)
+        return len(batch)
+    
+    def follow_existing_ring(self) -> bool:
+        """Our helper found the ring written by another process's helper (kvizd): poll that ring instead"""
+        from capture_helper import EXIT_RING_IN_USE
+        from shmring import RingReader
+        
+        try:
+            status = self.process.wait(timeout=1.0)
+        except Exception:
+            return False
+        if status != EXIT_RING_IN_USE:
+            return False
+        try:
+            # Only what is typed from now on: the rest was recorded by the ring's owner
+            self.reader = RingReader(self.ring)
+        except (FileNotFoundError, ValueError):
+            return False
+        
+        self.notifier.setEnabled(False)
+        self.notifier.deleteLater()
+        self.notifier = None
+        self.process.stdout.close()
+        self.process = None
+        
+        self.last_ring_event = time.monotonic()
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll_ring)
+        self.poll_timer.start(self.RING_POLL_MS)
+        LOG.info("Capture ring %s is written by another process; following it", self.ring)
+        return True
+    
+    def poll_ring(self):
+        now = time.monotonic()
+        if self.emit_ring_records():
+            self.last_ring_event = now
+            interval = self.RING_POLL_MS
+        elif now - self.last_ring_event >= self.RING_IDLE_AFTER:
+            if self.reader.reattach():
+                LOG.info("Capture ring %s was recreated; following the new one", self.ring)
+            interval = self.RING_IDLE_POLL_MS
+        else:
+            interval = self.RING_POLL_MS
+        if self.poll_timer.interval() != interval:
+            self.poll_timer.setInterval(interval)
     
     def stop_listening(self):
         """Stop capture"""
         self.running = False
-        if hasattr(self, 'read_timer'):
-            self.read_timer.stop()
-        if hasattr(self, 'process') and self.process:
+        if self.notifier:
+            self.notifier.setEnabled(False)
+            self.notifier.deleteLater()
+            self.notifier = None
+        if self.poll_timer:
+            self.poll_timer.stop()
+            self.poll_timer.deleteLater()
+            self.poll_timer = None
+        if self.reader:
+            stats = self.reader.stats()
+            LOG.info("Capture ring: %d read, %d overwritten", stats["read"], stats["overwritten"])
+            self.reader.close()
+            self.reader = None
+        if self.process:
             self.process.terminate()
+            self.process.stdout.close()
+            self.process = None
+
+class EvdevKeyListener(QObject):
+    """Global keyboard listener reading Linux evdev devices in the GUI process
+    
+    No helper process and no per-event callback: each readable device is
+    drained in bulk (see evdevcapture.py) and delivered as one batch through
+    the same key_events signal as PynputGlobalKeyListener.
+    """
+    key_events = pyqtSignal(list)  # [(event_type, code_id, timestamp_ms), ...]
+    
+    def __init__(self, paths: Optional[List[str]] = None):
+        """paths: event devices or recordings to read (default: every readable keyboard)"""
+        super().__init__()
+        self.running = False
+        self.paths = paths
+        self.reader = None
+        self.notifiers = {}
+    
+    def start_listening(self):
+        """Start reading the keyboards"""
+        if self.running:
+            return False
+        from evdevcapture import EvdevReader, find_keyboards
+        
+        paths = self.paths or find_keyboards()
+        if not paths:
+            LOG.error("❌ No readable keyboards under /dev/input (root or the 'input' group is needed)")
+            return False
+        try:
+            self.reader = EvdevReader(paths)
+        except OSError as e:
+            LOG.error("❌ Failed to open input devices: %s", e)
+            return False
+        for fd in self.reader.fds():
+            notifier = QSocketNotifier(fd, QSocketNotifier.Type.Read)
+            notifier.activated.connect(lambda *_, fd=fd: self.read_device(fd))
+            self.notifiers[fd] = notifier
+        self.running = True
+        LOG.info("✅ EVDEV CAPTURE IS LIVE: %s", ", ".join(paths))
+        return True
+    
+    def read_device(self, fd: int):
+        """Drain one device and emit its key events as one batch"""
+        if not self.reader:
+            return
+        batch = self.reader.read(fd)
+        if batch is None:
+            LOG.warning("⚠️  Input device gone: %s", self.reader.paths[fd])
+            notifier = self.notifiers.pop(fd)
+            notifier.setEnabled(False)
+            notifier.deleteLater()
+            self.reader.close_fd(fd)
+            if not self.notifiers:
+                self.stop_listening()
+            return
+        if LATENCY.enabled:
+            # Presses are timed from the kernel's event timestamp
+            for event_type, code_id, timestamp in batch:
+                if event_type == EVENT_PRESS:
+                    LATENCY.begin(code_id, timestamp)
+                    LATENCY.mark(STAGE_PIPE_READ, code_id)
+        if batch:
+            self.key_events.emit(batch)
+    
+    def stop_listening(self):
+        """Stop capture"""
+        self.running = False
+        for notifier in self.notifiers.values():
+            notifier.setEnabled(False)
+            notifier.deleteLater()
+        self.notifiers.clear()
+        if self.reader:
+            self.reader.close()
+            self.reader = None
 
 class KeyboardLibraryListener(QThread):
     """Global keyboard listener using 'keyboard' library - ACTUALLY WORKS"""
-    key_pressed = pyqtSignal(str)
-    key_released = pyqtSignal(str)
+    key_pressed = pyqtSignal(int)  # code id
+    key_released = pyqtSignal(int)  # code id
     
     def __init__(self):
         super().__init__()
@@ -191,7 +406,7 @@ class KeyboardLibraryListener(QThread):
         
     def start_listening(self):
         """Start keyboard library capture"""
-        print("🎯 Starting keyboard library global capture...")
+        LOG.info("🎯 Starting keyboard library global capture...")
         if not self.running:
             self.running = True
             self.start()
@@ -213,40 +428,40 @@ class KeyboardLibraryListener(QThread):
         """Use keyboard library for global capture"""
         try:
             import keyboard
-            print("🚀 keyboard library detected!")
+            LOG.info("🚀 keyboard library detected!")
             
             def on_key_event(event):
                 if not self.running:
                     return
                 code = self.convert_keyboard_event(event)
-                if code:
+                code_id = code_to_id(code)
+                if code_id:
                     if event.event_type == keyboard.KEY_DOWN:
-                        print(f"🌍 GLOBAL KEY: {code}")
-                        self.key_pressed.emit(code)
+                        LOG.debug("🌍 GLOBAL KEY: %s", code)
+                        self.key_pressed.emit(code_id)
                     elif event.event_type == keyboard.KEY_UP:
-                        self.key_released.emit(code)
+                        self.key_released.emit(code_id)
             
             keyboard.hook(on_key_event)
-            print("✅ GLOBAL CAPTURE IS LIVE! Type ANYWHERE!")
+            LOG.info("✅ GLOBAL CAPTURE IS LIVE! Type ANYWHERE!")
             
             while self.running:
                 import time
                 time.sleep(0.1)
                 
         except ImportError:
-            print("❌ Install keyboard library: pip install keyboard")
+            LOG.error("❌ Install keyboard library: pip install keyboard")
         except Exception as e:
-            print(f"❌ keyboard library failed: {e}")
+            LOG.error("❌ keyboard library failed: %s", e)
     
     def convert_keyboard_event(self, event):
         """Convert keyboard event to web code"""
-        # Implementation here...
-        return f"Key{event.name.upper()}" if event.name.isalpha() else None
+        return keyboard_name_to_code(event.name) if event.name else None
 
 class GlobalKeyListener(QThread):
     """Global keyboard listener using keyboard library"""
-    key_pressed = pyqtSignal(str)
-    key_released = pyqtSignal(str)
+    key_pressed = pyqtSignal(int)  # code id
+    key_released = pyqtSignal(int)  # code id
     
     def __init__(self):
         super().__init__()
@@ -259,18 +474,18 @@ class GlobalKeyListener(QThread):
         try:
             import keyboard
             self._keyboard_available = True
-            print("keyboard library available")
+            LOG.info("keyboard library available")
         except ImportError:
-            print("keyboard library not installed - run: pip install keyboard")
+            LOG.warning("keyboard library not installed - run: pip install keyboard")
             self._keyboard_available = False
         except Exception as e:
-            print(f"keyboard library error: {e}")
+            LOG.error("keyboard library error: %s", e)
             self._keyboard_available = False
     
     def start_listening(self):
         """Start global keyboard capture"""
         if not self._keyboard_available:
-            print("Cannot start: keyboard library not available")
+            LOG.warning("Cannot start: keyboard library not available")
             return False
             
         if not self.running:
@@ -297,7 +512,7 @@ class GlobalKeyListener(QThread):
             
         try:
             import keyboard
-            print("🎯 Starting keyboard library global capture...")
+            LOG.info("🎯 Starting keyboard library global capture...")
             
             def on_key_event(event):
                 if not self.running:
@@ -305,18 +520,19 @@ class GlobalKeyListener(QThread):
                     
                 try:
                     code = self.keyboard_event_to_web_code(event)
-                    if code:
+                    code_id = code_to_id(code)
+                    if code_id:
                         if event.event_type == keyboard.KEY_DOWN:
-                            print(f"🌍 GLOBAL KEY DOWN: {code}")
-                            self.key_pressed.emit(code)
+                            LOG.debug("🌍 GLOBAL KEY DOWN: %s", code)
+                            self.key_pressed.emit(code_id)
                         elif event.event_type == keyboard.KEY_UP:
-                            self.key_released.emit(code)
+                            self.key_released.emit(code_id)
                 except Exception as e:
-                    print(f"Error processing key event: {e}")
+                    LOG.error("Error processing key event: %s", e)
             
             # Hook all keyboard events
             keyboard.hook(on_key_event)
-            print("🚀 keyboard library capture is LIVE! Type ANYWHERE!")
+            LOG.info("🚀 keyboard library capture is LIVE! Type ANYWHERE!")
             
             # Keep the hook alive
             while self.running:
@@ -324,68 +540,15 @@ class GlobalKeyListener(QThread):
                 time.sleep(0.1)
                 
         except Exception as e:
-            print(f"💥 keyboard library failed: {e}")
-            print("This might need different permissions or sudo")
+            LOG.error("💥 keyboard library failed: %s", e)
+            LOG.warning("This might need different permissions or sudo")
     
     def keyboard_event_to_web_code(self, event) -> Optional[str]:
         """Convert keyboard library event to web code"""
         try:
-            name = event.name.lower()
-            
-            # Handle letters
-            if len(name) == 1 and name.isalpha():
-                return f'Key{name.upper()}'
-            
-            # Handle numbers
-            elif len(name) == 1 and name.isdigit():
-                return f'Digit{name}'
-            
-            # Handle special keys
-            special_map = {
-                'space': 'Space',
-                'enter': 'Enter',
-                'backspace': 'Backspace',
-                'delete': 'Delete',
-                'tab': 'Tab',
-                'left shift': 'ShiftLeft',
-                'right shift': 'ShiftRight',
-                'left ctrl': 'ControlLeft',
-                'right ctrl': 'ControlRight',
-                'left alt': 'AltLeft',
-                'right alt': 'AltRight',
-                'left windows': 'MetaLeft',
-                'right windows': 'MetaRight',
-                'caps lock': 'CapsLock',
-                'esc': 'Escape',
-                'up': 'ArrowUp',
-                'down': 'ArrowDown',
-                'left': 'ArrowLeft',
-                'right': 'ArrowRight',
-                'home': 'Home',
-                'end': 'End',
-                'page up': 'PageUp',
-                'page down': 'PageDown',
-                'insert': 'Insert',
-                'f1': 'F1', 'f2': 'F2', 'f3': 'F3', 'f4': 'F4',
-                'f5': 'F5', 'f6': 'F6', 'f7': 'F7', 'f8': 'F8',
-                'f9': 'F9', 'f10': 'F10', 'f11': 'F11', 'f12': 'F12',
-                ';': 'Semicolon',
-                "'": 'Quote',
-                ',': 'Comma',
-                '.': 'Period',
-                '/': 'Slash',
-                '\\': 'Backslash',
-                '[': 'BracketLeft',
-                ']': 'BracketRight',
-                '-': 'Minus',
-                '=': 'Equal',
-                '`': 'Backquote'
-            }
-            
-            return special_map.get(name)
-            
+            return keyboard_name_to_code(event.name)
         except Exception as e:
-            print(f"Error converting keyboard event: {e}")
+            LOG.error("Error converting keyboard event: %s", e)
             return None
 
 
@@ -395,6 +558,7 @@ class MiniKeyWidget(QWidget):
     def __init__(self, key_def: KeyDef, scale_factor: float = 0.15):
         super().__init__()
         self.key_def = key_def
+        self.code_id = intern_code(key_def.code)
         self.scale_factor = scale_factor
         self.is_pressed = False
         self.update_geometry()
@@ -414,6 +578,9 @@ class MiniKeyWidget(QWidget):
             self.update()
             
     def paintEvent(self, event):
+        if self.is_pressed and LATENCY.enabled:
+            LATENCY.mark(STAGE_OVERLAY_PAINT, self.code_id)
+        
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)  # Disable antialiasing for performance
         
@@ -435,10 +602,10 @@ class MiniKeyWidget(QWidget):
 class MiniOverlay(QWidget):
     """Miniature floating overlay window"""
     
-    def __init__(self, analytics: 'KeyboardAnalytics', parent=None):
+    def __init__(self, analytics: 'KeyboardAnalytics', scheduler: 'RefreshScheduler', parent=None):
         super().__init__(parent)
         self.analytics = analytics
-        self.keys = {}
+        self.keys: Dict[int, List[MiniKeyWidget]] = {}
         self.pressed_keys = set()
         
         # macOS-optimized window flags
@@ -469,21 +636,19 @@ class MiniOverlay(QWidget):
         self.update_keys_timer.setSingleShot(True)
         self.update_keys_timer.timeout.connect(self.update_key_states)
         
-        # Update timer - less frequent for analytics
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_analytics)
-        self.update_timer.start(250)  # Update every 250ms
+        # Refresh analytics only when they change
+        scheduler.refresh.connect(self.update_analytics)
     
-    def handle_key_press(self, code: str):
+    def handle_key_press(self, code_id: int):
         """Queue key press for processing"""
-        if code not in self.active_keys:
-            self.active_keys.add(code)
+        if code_id not in self.active_keys:
+            self.active_keys.add(code_id)
             self.schedule_key_update()
     
-    def handle_key_release(self, code: str):
+    def handle_key_release(self, code_id: int):
         """Queue key release for processing"""
-        if code in self.active_keys:
-            self.active_keys.discard(code)
+        if code_id in self.active_keys:
+            self.active_keys.discard(code_id)
             self.schedule_key_update()
     
     def schedule_key_update(self):
@@ -495,9 +660,9 @@ class MiniOverlay(QWidget):
         """Update all key states at once for efficiency"""
         # Create a set of all key widgets that should be pressed
         keys_to_press = set()
-        for code in self.active_keys:
-            if code in self.keys:
-                for key_widget in self.keys[code]:
+        for code_id in self.active_keys:
+            if code_id in self.keys:
+                for key_widget in self.keys[code_id]:
                     keys_to_press.add(key_widget)
         
         # Update all key widgets
@@ -513,6 +678,7 @@ class MiniOverlay(QWidget):
     def showEvent(self, event):
         """Ensure overlay stays on top when shown"""
         super().showEvent(event)
+        self.update_analytics()
         self.raise_()  # Remove the activateWindow() call
         
     def setup_ui(self):
@@ -541,11 +707,16 @@ class MiniOverlay(QWidget):
         self.kps_label = QLabel("0.0 KPS")
         self.kps_label.setStyleSheet("font-size: 11px; color: #ff7e5f; font-weight: bold;")
         
+        self.wpm_label = QLabel("0")
+        self.wpm_label.setStyleSheet("font-size: 11px; color: #ff7e5f; font-weight: bold;")
+        
         self.total_label = QLabel("0")
         self.total_label.setStyleSheet("font-size: 11px; color: #ff7e5f; font-weight: bold;")
         
         analytics_layout.addWidget(QLabel("KPS:"))
         analytics_layout.addWidget(self.kps_label)
+        analytics_layout.addWidget(QLabel("WPM:"))
+        analytics_layout.addWidget(self.wpm_label)
         analytics_layout.addWidget(QLabel("Total:"))
         analytics_layout.addWidget(self.total_label)
         
@@ -555,93 +726,37 @@ class MiniOverlay(QWidget):
         
     def setup_mini_keyboard(self):
         # Simple compact layout that fits in the container
-        layout_keys = [
-            # Row 1 (Numbers)
-            KeyDef(1, 1, 5, 5, 15, 8, '1', 'Digit1', '1'),
-            KeyDef(1, 2, 22, 5, 15, 8, '2', 'Digit2', '2'),
-            KeyDef(1, 3, 39, 5, 15, 8, '3', 'Digit3', '3'),
-            KeyDef(1, 4, 56, 5, 15, 8, '4', 'Digit4', '4'),
-            KeyDef(1, 5, 73, 5, 15, 8, '5', 'Digit5', '5'),
-            KeyDef(1, 6, 90, 5, 15, 8, '6', 'Digit6', '6'),
-            KeyDef(1, 7, 107, 5, 15, 8, '7', 'Digit7', '7'),
-            KeyDef(1, 8, 124, 5, 15, 8, '8', 'Digit8', '8'),
-            KeyDef(1, 9, 141, 5, 15, 8, '9', 'Digit9', '9'),
-            KeyDef(1, 10, 158, 5, 15, 8, '0', 'Digit0', '0'),
-            KeyDef(1, 11, 175, 5, 25, 8, 'Bksp', 'Backspace', 'Backspace'),
-            
-            # Row 2 (QWERTY)
-            KeyDef(2, 1, 5, 15, 20, 8, 'Tab', 'Tab', 'Tab'),
-            KeyDef(2, 2, 27, 15, 15, 8, 'Q', 'KeyQ', 'q'),
-            KeyDef(2, 3, 44, 15, 15, 8, 'W', 'KeyW', 'w'),
-            KeyDef(2, 4, 61, 15, 15, 8, 'E', 'KeyE', 'e'),
-            KeyDef(2, 5, 78, 15, 15, 8, 'R', 'KeyR', 'r'),
-            KeyDef(2, 6, 95, 15, 15, 8, 'T', 'KeyT', 't'),
-            KeyDef(2, 7, 112, 15, 15, 8, 'Y', 'KeyY', 'y'),
-            KeyDef(2, 8, 129, 15, 15, 8, 'U', 'KeyU', 'u'),
-            KeyDef(2, 9, 146, 15, 15, 8, 'I', 'KeyI', 'i'),
-            KeyDef(2, 10, 163, 15, 15, 8, 'O', 'KeyO', 'o'),
-            KeyDef(2, 11, 180, 15, 20, 8, 'P', 'KeyP', 'p'),
-            
-            # Row 3 (ASDF)
-            KeyDef(3, 1, 5, 25, 25, 8, 'Caps', 'CapsLock', 'CapsLock'),
-            KeyDef(3, 2, 32, 25, 15, 8, 'A', 'KeyA', 'a'),
-            KeyDef(3, 3, 49, 25, 15, 8, 'S', 'KeyS', 's'),
-            KeyDef(3, 4, 66, 25, 15, 8, 'D', 'KeyD', 'd'),
-            KeyDef(3, 5, 83, 25, 15, 8, 'F', 'KeyF', 'f'),
-            KeyDef(3, 6, 100, 25, 15, 8, 'G', 'KeyG', 'g'),
-            KeyDef(3, 7, 117, 25, 15, 8, 'H', 'KeyH', 'h'),
-            KeyDef(3, 8, 134, 25, 15, 8, 'J', 'KeyJ', 'j'),
-            KeyDef(3, 9, 151, 25, 15, 8, 'K', 'KeyK', 'k'),
-            KeyDef(3, 10, 168, 25, 15, 8, 'L', 'KeyL', 'l'),
-            KeyDef(3, 11, 185, 25, 15, 8, 'Ent', 'Enter', 'Enter'),
-            
-            # Row 4 (ZXCV)
-            KeyDef(4, 1, 5, 35, 30, 8, 'Shift', 'ShiftLeft', 'Shift'),
-            KeyDef(4, 2, 37, 35, 15, 8, 'Z', 'KeyZ', 'z'),
-            KeyDef(4, 3, 54, 35, 15, 8, 'X', 'KeyX', 'x'),
-            KeyDef(4, 4, 71, 35, 15, 8, 'C', 'KeyC', 'c'),
-            KeyDef(4, 5, 88, 35, 15, 8, 'V', 'KeyV', 'v'),
-            KeyDef(4, 6, 105, 35, 15, 8, 'B', 'KeyB', 'b'),
-            KeyDef(4, 7, 122, 35, 15, 8, 'N', 'KeyN', 'n'),
-            KeyDef(4, 8, 139, 35, 15, 8, 'M', 'KeyM', 'm'),
-            KeyDef(4, 9, 156, 35, 22, 8, ',', 'Comma', ','),
-            KeyDef(4, 10, 180, 35, 20, 8, 'Sft', 'ShiftRight', 'Shift'),
-            
-            # Row 5 (Bottom)
-            KeyDef(5, 1, 5, 45, 20, 8, 'Ctrl', 'ControlLeft', 'Control'),
-            KeyDef(5, 2, 27, 45, 20, 8, 'Alt', 'AltLeft', 'Alt'),
-            KeyDef(5, 3, 49, 45, 80, 8, 'Space', 'Space', ' '),
-            KeyDef(5, 4, 131, 45, 20, 8, 'Alt', 'AltRight', 'Alt'),
-            KeyDef(5, 5, 153, 45, 20, 8, 'Cmd', 'MetaRight', 'Meta'),
-            KeyDef(5, 6, 175, 45, 25, 8, 'Ctrl', 'ControlRight', 'Control'),
-        ]
+        layout_keys = load_layout('mini')
         
         for key_def in layout_keys:
             key_widget = MiniKeyWidget(key_def, 1.0)  # Use scale factor 1.0
             key_widget.setParent(self.keyboard_container)
             
-            if key_def.code not in self.keys:
-                self.keys[key_def.code] = []
-            self.keys[key_def.code].append(key_widget)
+            self.keys.setdefault(intern_code(key_def.code), []).append(key_widget)
             
             key_widget.show()
     
-    def handle_key_press(self, code: str):
-        if code in self.keys:
-            for key_widget in self.keys[code]:
+    def handle_key_press(self, code_id: int):
+        if code_id in self.keys:
+            for key_widget in self.keys[code_id]:
                 if key_widget not in self.pressed_keys:
                     self.pressed_keys.add(key_widget)
                     key_widget.set_pressed(True)
+            if LATENCY.enabled:
+                LATENCY.mark(STAGE_UPDATE, code_id)
     
-    def handle_key_release(self, code: str):
-        if code in self.keys:
-            for key_widget in self.keys[code]:
+    def handle_key_release(self, code_id: int):
+        if code_id in self.keys:
+            for key_widget in self.keys[code_id]:
                 if key_widget in self.pressed_keys:
                     self.pressed_keys.remove(key_widget)
                     key_widget.set_pressed(False)
     
     def update_analytics(self):
+        if not self.isVisible():
+            return
         self.kps_label.setText(f"{self.analytics.get_kps():.2f}")
+        self.wpm_label.setText(f"{self.analytics.get_wpm():.0f}")
         self.total_label.setText(str(self.analytics.total_keystrokes))
         
     def mousePressEvent(self, event):
@@ -651,115 +766,191 @@ class MiniOverlay(QWidget):
         if hasattr(self, 'drag_position'):
             self.move(event.globalPosition().toPoint() - self.drag_position)
 
-class KeyboardAnalytics:
-    """Analytics data tracking system"""
+class RefreshScheduler(QObject):
+    """Coalesces analytics changes into at most one UI refresh per frame
     
-    def __init__(self):
-        self.reset()
-        self.filename = "key_analytics.json"
-        self.load_from_json()  # Load existing data on startup
-        
-    def reset(self):
-        self.total_keystrokes = 0
-        self.key_frequency = defaultdict(int)
-        self.dwell_times = deque(maxlen=100)
-        self.key_down_times = {}
-        self.rhythm_data = deque(maxlen=50)
-        self.hand_balance = {'left': 0, 'right': 0}
-        self.keystroke_timestamps = deque(maxlen=100)  # Store timestamps for KPS calculation
-        
-        
-        # Left hand keys (QWERTY layout)
-        self.left_hand_keys = {
-            'KeyQ', 'KeyW', 'KeyE', 'KeyR', 'KeyT',
-            'KeyA', 'KeyS', 'KeyD', 'KeyF', 'KeyG', 
-            'KeyZ', 'KeyX', 'KeyC', 'KeyV', 'KeyB',
-            'Digit1', 'Digit2', 'Digit3', 'Digit4', 'Digit5',
-            'Tab', 'CapsLock', 'ShiftLeft', 'ControlLeft', 'AltLeft', 'MetaLeft',
-            'Backquote', 'Escape'
-        }
+    Nothing runs while the analytics are unchanged. After the last change a
+    few slower refreshes keep running for settle_ms so sliding-window rates
+    can decay to zero, then the scheduler goes quiet again.
+    """
     
-    def load_from_json(self):
-        """Load analytics data from JSON file"""
-        try:
-            if os.path.exists(self.filename):
-                with open(self.filename, 'r') as f:
-                    data = json.load(f)
-                    # Convert loaded data to our format
-                    for entry in data:
-                        key = entry['key']
-                        count = entry['count']
-                        self.key_frequency[key] = count
-                        self.total_keystrokes += count
-        except Exception as e:
-            print(f"Error loading analytics: {e}")
+    refresh = pyqtSignal()
     
-    def record_key_press(self, code: str, timestamp: float):
-        self.total_keystrokes += 1
-        self.key_frequency[code] += 1
-        self.keystroke_timestamps.append(timestamp)
-        
-        # Record keystroke timing for rhythm
-        if len(self.keystroke_timestamps) > 1:
-            interval = timestamp - self.keystroke_timestamps[-2]
-            self.rhythm_data.append(interval)
-        
-        self.key_down_times[code] = timestamp
-        
-        # Track hand balance
-        if code in self.left_hand_keys:
-            self.hand_balance['left'] += 1
+    def __init__(self, analytics: KeyboardAnalytics, frame_ms: int = 16,
+                 settle_ms: int = 10000, settle_interval_ms: int = 250):
+        super().__init__()
+        self.frame_ms = frame_ms
+        self.settle_ms = settle_ms
+        self.settle_interval_ms = settle_interval_ms
+        self.last_change = 0.0
+        self.refresh_count = 0
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.fire)
+        analytics.add_change_listener(self.notify)
+    
+    def notify(self):
+        """Request a refresh on the next frame"""
+        self.last_change = time.monotonic()
+        if not self.timer.isActive() or self.timer.remainingTime() > self.frame_ms:
+            self.timer.start(self.frame_ms)
+    
+    def fire(self):
+        self.refresh_count += 1
+        self.refresh.emit()
+        if (time.monotonic() - self.last_change) * 1000 < self.settle_ms:
+            self.timer.start(self.settle_interval_ms)
+
+
+def paint_keycap(painter: QPainter, rect: QRect, key_def: KeyDef, pressed: bool, scale_factor: float,
+                 heat: Optional[QColor] = None):
+    """Draw one keycap (background, outline and label) into rect
+    
+    heat replaces the unpressed background with a heatmap colour.
+    """
+    # Key background
+    if heat is not None and not pressed:
+        gradient = QLinearGradient(0, rect.top(), 0, rect.top() + rect.height())
+        gradient.setColorAt(0, heat.lighter(122))
+        gradient.setColorAt(1, heat)
+        brush = QBrush(gradient)
+    elif pressed:
+        if key_def.is_special:
+            gradient = QLinearGradient(0, rect.top(), 0, rect.top() + rect.height())
+            gradient.setColorAt(0, QColor(255, 126, 95))
+            gradient.setColorAt(1, QColor(229, 106, 74))
+            brush = QBrush(gradient)
         else:
-            self.hand_balance['right'] += 1
+            brush = QBrush(QColor(255, 126, 95))
+    else:
+        if key_def.is_special:
+            gradient = QLinearGradient(0, rect.top(), 0, rect.top() + rect.height())
+            gradient.setColorAt(0, QColor(255, 126, 95))
+            gradient.setColorAt(1, QColor(229, 106, 74))
+            brush = QBrush(gradient)
+        else:
+            gradient = QLinearGradient(0, rect.top(), 0, rect.top() + rect.height())
+            gradient.setColorAt(0, QColor(90, 90, 90))
+            gradient.setColorAt(1, QColor(74, 74, 74))
+            brush = QBrush(gradient)
     
-    def record_key_release(self, code: str, timestamp: float):
-        if code in self.key_down_times:
-            dwell_time = timestamp - self.key_down_times[code]
-            self.dwell_times.append(dwell_time)
-            del self.key_down_times[code]
+    painter.setBrush(brush)
+    if heat is not None and pressed:
+        # Hot keys are already orange, so outline the pressed ones
+        painter.setPen(QPen(QColor(255, 255, 255), 2))
+    else:
+        painter.setPen(QPen(QColor(58, 58, 58), 1))
     
-    def get_average_dwell(self) -> float:
-        return sum(self.dwell_times) / len(self.dwell_times) if self.dwell_times else 0
+    # Draw key shape
+    if key_def.is_knob:
+        painter.drawEllipse(rect)
+    else:
+        painter.drawRoundedRect(rect, 6, 6)
     
-    def get_kps(self) -> float:
-        """Calculate keys per second using a 1-second rolling window"""
-        if len(self.keystroke_timestamps) < 2:
-            return 0.0
-            
-        current_time = time.time() * 1000
-        window_start = current_time - 1000  # 1 second window
-        
-        # Count keys pressed in the last second
-        count = 0
-        for ts in reversed(self.keystroke_timestamps):
-            if ts >= window_start:
-                count += 1
-            else:
-                break
-        
-        return count
+    # Draw label, dark on the brightest heatmap colours
+    if heat is not None and not pressed and heat.lightness() > 160:
+        painter.setPen(QPen(QColor(40, 40, 40)))
+    else:
+        painter.setPen(QPen(QColor(255, 255, 255)))
+    font = QFont("Arial", max(8, int(12 * scale_factor)))
+    painter.setFont(font)
     
-    def get_top_keys(self, n: int = 5) -> List[Tuple[str, int]]:
-        return sorted(self.key_frequency.items(), key=lambda x: x[1], reverse=True)[:n]
+    # Handle multi-line labels
+    label_parts = key_def.label.split('\n')
+    if len(label_parts) > 1:
+        # Two-line label
+        fm = QFontMetrics(font)
+        total_height = fm.height() * 2
+        y_start = rect.center().y() - total_height // 2
+        
+        for i, part in enumerate(label_parts):
+            y = y_start + fm.height() * (i + 1)
+            text_rect = QRect(rect.x(), y - fm.height(), rect.width(), fm.height())
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, part)
+    else:
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, key_def.label)
+
+
+def keycap_bounds(rect: QRect, rotation: float) -> QRect:
+    """Area painted by a keycap occupying rect once rotated about its centre"""
+    if not rotation:
+        return QRect(rect)
+    cos = abs(math.cos(rotation))
+    sin = abs(math.sin(rotation))
+    # Pad by a pixel so antialiased edges stay inside the bounds
+    width = math.ceil(rect.width() * cos + rect.height() * sin) + 2
+    height = math.ceil(rect.width() * sin + rect.height() * cos) + 2
+    center_x = rect.x() + rect.width() / 2
+    center_y = rect.y() + rect.height() / 2
+    return QRect(math.floor(center_x - width / 2), math.floor(center_y - height / 2), width, height)
+
+
+class KeycapCache:
+    """Size-bounded LRU of prerendered keycap pixmaps shared by every keyboard
     
-    def save_to_json(self):
-        try:
-            # Convert defaultdict to regular dict
-            key_frequency = dict(self.key_frequency)
-            sorted_keys = sorted(key_frequency.items(), key=lambda x: x[1], reverse=True)
-            
-            # Format data for JSON output
-            analytics_data = [
-                {"key": key, "count": count} 
-                for key, count in sorted_keys
-            ]
-            
-            # Write to JSON file
-            with open(self.filename, 'w') as f:
-                json.dump(analytics_data, f, indent=4)
-                
-        except Exception as e:
-            print(f"Error saving analytics: {e}")
+    Entries are keyed by everything that affects how a keycap looks, so keys
+    with the same shape, label and state share one pixmap. hits/misses show
+    whether a typing session is being served from the cache.
+    
+    heat is a heatmap colour bucket (index into HEAT_COLORS), or -1 for the
+    normal look.
+    """
+    
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.pixmaps: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def pixmap(self, key_def: KeyDef, pressed: bool, scale_factor: float, ratio: float, heat: int = -1) -> QPixmap:
+        """Keycap pixmap sized to keycap_bounds(), rendering it on a miss"""
+        w = int(key_def.width * scale_factor)
+        h = int(key_def.height * scale_factor)
+        cache_key = (w, h, key_def.rotation, key_def.is_special, key_def.is_knob,
+                     pressed, key_def.label, scale_factor, ratio, heat)
+        pixmap = self.pixmaps.get(cache_key)
+        if pixmap is not None:
+            self.hits += 1
+            self.pixmaps.move_to_end(cache_key)
+            return pixmap
+        
+        self.misses += 1
+        pixmap = self.render(key_def, w, h, pressed, scale_factor, ratio, heat)
+        self.pixmaps[cache_key] = pixmap
+        if len(self.pixmaps) > self.max_entries:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+    
+    @staticmethod
+    def render(key_def: KeyDef, w: int, h: int, pressed: bool, scale_factor: float, ratio: float,
+               heat: int = -1) -> QPixmap:
+        rect = QRect(0, 0, w, h)
+        bounds = keycap_bounds(rect, key_def.rotation)
+        pixmap = QPixmap(math.ceil(bounds.width() * ratio), math.ceil(bounds.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Centre the keycap in the pixmap and rotate it about its centre
+        painter.translate(bounds.width() / 2, bounds.height() / 2)
+        if key_def.rotation:
+            painter.rotate(math.degrees(key_def.rotation))
+        painter.translate(-w / 2, -h / 2)
+        paint_keycap(painter, rect, key_def, pressed, scale_factor, HEAT_COLORS[heat] if heat >= 0 else None)
+        painter.end()
+        return pixmap
+    
+    def invalidate(self):
+        self.pixmaps.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.pixmaps)}
+
+
+KEYCAP_CACHE = KeycapCache()
+HEAT_COLORS = [QColor(int(r), int(g), int(b)) for r, g, b in HEAT_LUT]
 
 
 class KeyWidget(QWidget):
@@ -768,8 +959,10 @@ class KeyWidget(QWidget):
     def __init__(self, key_def: KeyDef, scale_factor: float = 1.0):
         super().__init__()
         self.key_def = key_def
+        self.code_id = intern_code(key_def.code)
         self.scale_factor = scale_factor
         self.is_pressed = False
+        self.heat = -1
         self.update_geometry()
         
     def update_scale(self, scale_factor: float):
@@ -787,322 +980,136 @@ class KeyWidget(QWidget):
         if self.is_pressed != pressed:
             self.is_pressed = pressed
             self.update()
+    
+    def set_heat(self, heat: int):
+        if self.heat != heat:
+            self.heat = heat
+            self.update()
             
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        rect = self.rect()
-        
-        # Apply rotation if needed
-        if self.key_def.rotation != 0:
-            painter.translate(rect.center())
-            painter.rotate(math.degrees(self.key_def.rotation))
-            painter.translate(-rect.center())
-        
-        # Key background
-        if self.is_pressed:
-            if self.key_def.is_special:
-                gradient = QLinearGradient(0, 0, 0, rect.height())
-                gradient.setColorAt(0, QColor(255, 126, 95))
-                gradient.setColorAt(1, QColor(229, 106, 74))
-                brush = QBrush(gradient)
-            else:
-                brush = QBrush(QColor(255, 126, 95))
-        else:
-            if self.key_def.is_special:
-                gradient = QLinearGradient(0, 0, 0, rect.height())
-                gradient.setColorAt(0, QColor(255, 126, 95))
-                gradient.setColorAt(1, QColor(229, 106, 74))
-                brush = QBrush(gradient)
-            else:
-                gradient = QLinearGradient(0, 0, 0, rect.height())
-                gradient.setColorAt(0, QColor(90, 90, 90))
-                gradient.setColorAt(1, QColor(74, 74, 74))
-                brush = QBrush(gradient)
-        
-        painter.setBrush(brush)
-        painter.setPen(QPen(QColor(58, 58, 58), 1))
-        
-        # Draw key shape
-        if self.key_def.is_knob:
-            painter.drawEllipse(rect)
-        else:
-            painter.drawRoundedRect(rect, 6, 6)
+        if self.is_pressed and LATENCY.enabled:
+            LATENCY.mark(STAGE_KEYBOARD_PAINT, self.code_id)
         
-        # Draw label
-        painter.setPen(QPen(QColor(255, 255, 255)))
-        font = QFont("Arial", max(8, int(12 * self.scale_factor)))
-        painter.setFont(font)
-        
-        # Handle multi-line labels
-        label_parts = self.key_def.label.split('\n')
-        if len(label_parts) > 1:
-            # Two-line label
-            fm = QFontMetrics(font)
-            total_height = fm.height() * 2
-            y_start = rect.center().y() - total_height // 2
-            
-            for i, part in enumerate(label_parts):
-                y = y_start + fm.height() * (i + 1)
-                text_rect = QRect(rect.x(), y - fm.height(), rect.width(), fm.height())
-                painter.drawText(text_rect, Qt.AlignmentFlag.AlignCenter, part)
-        else:
-            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, self.key_def.label)
+        painter = QPainter(self)
+        pixmap = KEYCAP_CACHE.pixmap(self.key_def, self.is_pressed, self.scale_factor,
+                                     self.devicePixelRatioF(), self.heat)
+        painter.drawPixmap(keycap_bounds(self.rect(), self.key_def.rotation).topLeft(), pixmap)
 
 
 class KeyboardWidget(QWidget):
-    """Main keyboard visualization widget"""
+    """Main keyboard visualization widget
     
-    key_pressed = pyqtSignal(str)  # code
-    key_released = pyqtSignal(str)  # code
+    render_mode 'canvas' paints every key from this one widget, blitting a
+    pixmap from KEYCAP_CACHE per key and state and repainting only the rectangle of a
+    key that changed. 'widgets' builds one KeyWidget child per key instead.
     
-    def __init__(self):
+    With a heat scale set, unpressed keys are coloured by lifetime frequency;
+    update_heatmap() repaints only the keys whose colour bucket changed.
+    """
+    
+    key_pressed = pyqtSignal(int)  # code id
+    key_released = pyqtSignal(int)  # code id
+    
+    def __init__(self, render_mode: str = 'canvas'):
         super().__init__()
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
-        self.keys: Dict[str, List[KeyWidget]] = {}
+        self.render_mode = render_mode
+        self.keys: Dict[int, list] = {}  # Code id -> KeyWidgets, or key indexes in canvas mode
         self.current_layout = 'keychron'
         self.scale_factor = 0.8
-        self.pressed_keys: Set[KeyWidget] = set()
-        
-        # Initialize keyboard layouts (exact copy from HTML)
-        self.key_layouts = {
-            'keychron': [
-                # Row 0 (Knob and function keys)
-                KeyDef(0, 0, 26.5, 2.89852, 52, 54, 'OSL(1)', 'KC_ACL0', 'OSL(1)', 0.0, False, True),
-                KeyDef(0, 1, 106, 2.89852, 52, 54, 'Esc', 'Escape', 'Escape', 0.0, True),
-                KeyDef(0, 2, 172.25, 2.89852, 52, 54, 'Scr -', 'F1', 'F1'),
-                KeyDef(0, 3, 225.25, 2.89852, 52, 54, 'Scr +', 'F2', 'F2'),
-                KeyDef(0, 4, 284.829, 5.30011, 52, 54, 'MCtl', 'F3', 'F3', 0.10472),
-                KeyDef(0, 5, 337.539, 10.8401, 52, 54, 'LPad', 'F4', 'F4', 0.10472),
-                KeyDef(0, 6, 403.426, 17.7651, 52, 54, 'BL -', 'F5', 'F5', 0.10472),
-                KeyDef(0, 7, 456.136, 23.3051, 52, 54, 'BL +', 'F6', 'F6', 0.10472),
-                KeyDef(0, 8, 540.748, 23.6689, 52, 54, 'Prvs', 'F7', 'F7', -0.10472),
-                KeyDef(0, 9, 593.458, 18.1289, 52, 54, 'Play', 'F8', 'F8', -0.10472),
-                KeyDef(0, 10, 659.345, 11.2039, 52, 54, 'Next', 'F9', 'F9', -0.10472),
-                KeyDef(0, 11, 712.054, 5.66387, 52, 54, 'Mute', 'F10', 'F10', -0.10472),
-                KeyDef(0, 12, 773.8, 2.89852, 52, 54, 'Vol -', 'F11', 'F11'),
-                KeyDef(0, 13, 826.8, 2.89852, 52, 54, 'Vol +', 'F12', 'F12'),
-                KeyDef(0, 14, 893.05, 2.89852, 52, 54, 'Ins', 'Insert', 'Insert'),
-                KeyDef(0, 15, 959.3, 2.89852, 52, 54, 'Del', 'Delete', 'Delete'),
-
-                # Row 1 (Number row)
-                KeyDef(1, 0, 39.75, 71.6485, 52, 54, 'M1', 'N/A', 'M1'),
-                KeyDef(1, 1, 119.25, 71.6485, 52, 54, '~\n`', 'Backquote', '`'),
-                KeyDef(1, 2, 172.25, 71.6485, 52, 54, '!\n1', 'Digit1', '1'),
-                KeyDef(1, 3, 225.25, 71.6485, 52, 54, '@\n2', 'Digit2', '2'),
-                KeyDef(1, 4, 285.55, 74.5045, 52, 54, '#\n3', 'Digit3', '3', 0.10472),
-                KeyDef(1, 5, 338.259, 80.0445, 52, 54, '$\n4', 'Digit4', '4', 0.10472),
-                KeyDef(1, 6, 390.969, 85.5845, 52, 54, '%\n5', 'Digit5', '5', 0.10472),
-                KeyDef(1, 7, 443.679, 91.1245, 52, 54, '^\n6', 'Digit6', '6', 0.10472),
-                KeyDef(1, 8, 513.673, 95.6433, 52, 54, '&\n7', 'Digit7', '7', -0.10472),
-                KeyDef(1, 9, 566.383, 90.1033, 52, 54, '*\n8', 'Digit8', '8', -0.10472),
-                KeyDef(1, 10, 619.092, 84.5633, 52, 54, '(\n9', 'Digit9', '9', -0.10472),
-                KeyDef(1, 11, 671.802, 79.0233, 52, 54, ')\n0', 'Digit0', '0', -0.10472),
-                KeyDef(1, 12, 736.7, 71.6485, 52, 54, '_\n-', 'Minus', '-'),
-                KeyDef(1, 13, 789.7, 71.6485, 52, 54, '+\n=', 'Equal', '='),
-                KeyDef(1, 14, 842.7, 71.6485, 105, 54, 'Backspace', 'Backspace', 'Backspace'),
-                KeyDef(1, 15, 980.5, 71.6485, 52, 54, 'PgUp', 'PageUp', 'PageUp'),
-
-                # Row 2 (QWERTY row)
-                KeyDef(2, 0, 26.5, 126.649, 52, 54, 'M2', 'N/A', 'M2'),
-                KeyDef(2, 1, 106, 126.649, 78.5, 54, 'Tab', 'Tab', 'Tab'),
-                KeyDef(2, 2, 185.5, 126.649, 52, 54, 'Q', 'KeyQ', 'q'),
-                KeyDef(2, 3, 245.539, 125.602, 52, 54, 'W', 'KeyW', 'w', 0.10472),
-                KeyDef(2, 4, 298.249, 131.142, 52, 54, 'E', 'KeyE', 'e', 0.10472),
-                KeyDef(2, 5, 350.959, 136.682, 52, 54, 'R', 'KeyR', 'r', 0.10472),
-                KeyDef(2, 6, 403.668, 142.222, 52, 54, 'T', 'KeyT', 't', 0.10472),
-                KeyDef(2, 7, 493.067, 153.112, 52, 54, 'Y', 'KeyY', 'y', -0.10472),
-                KeyDef(2, 8, 545.777, 147.572, 52, 54, 'U', 'KeyU', 'u', -0.10472),
-                KeyDef(2, 9, 598.487, 142.032, 52, 54, 'I', 'KeyI', 'i', -0.10472),
-                KeyDef(2, 10, 651.196, 136.492, 52, 54, 'O', 'KeyO', 'o', -0.10472),
-                KeyDef(2, 11, 703.906, 130.952, 52, 54, 'P', 'KeyP', 'p', -0.10472),
-                KeyDef(2, 12, 763.2, 126.649, 52, 54, '{\n[', 'BracketLeft', '['),
-                KeyDef(2, 13, 816.2, 126.649, 52, 54, '}\n]', 'BracketRight', ']'),
-                KeyDef(2, 14, 869.2, 126.649, 91.75, 54, '|\n\\', 'Backslash', '\\'),
-                KeyDef(2, 15, 988.45, 126.649, 52, 54, 'PgDn', 'PageDown', 'PageDown'),
-
-                # Row 3 (ASDF row) 
-                KeyDef(3, 0, 13.25, 181.649, 52, 54, 'M3', 'N/A', 'M3'),
-                KeyDef(3, 1, 92.75, 181.649, 91.75, 54, 'Caps Lock', 'CapsLock', 'CapsLock'),
-                KeyDef(3, 2, 185.5, 181.649, 52, 54, 'A', 'KeyA', 'a'),
-                KeyDef(3, 3, 245.061, 180.855, 52, 54, 'S', 'KeyS', 's', 0.10472),
-                KeyDef(3, 4, 297.771, 186.395, 52, 54, 'D', 'KeyD', 'd', 0.10472),
-                KeyDef(3, 5, 350.48, 191.935, 52, 54, 'F', 'KeyF', 'f', 0.10472),
-                KeyDef(3, 6, 403.19, 197.475, 52, 54, 'G', 'KeyG', 'g', 0.10472),
-                KeyDef(3, 7, 525.171, 205.041, 52, 54, 'H', 'KeyH', 'h', -0.10472),
-                KeyDef(3, 8, 577.881, 199.501, 52, 54, 'J', 'KeyJ', 'j', -0.10472),
-                KeyDef(3, 9, 630.591, 193.961, 52, 54, 'K', 'KeyK', 'k', -0.10472),
-                KeyDef(3, 10, 683.3, 188.421, 52, 54, 'L', 'KeyL', 'l', -0.10472),
-                KeyDef(3, 11, 747.3, 181.649, 52, 54, ':\n;', 'Semicolon', ';'),
-                KeyDef(3, 12, 800.3, 181.649, 52, 54, '"\n\'', 'Quote', "'"),
-                KeyDef(3, 14, 853.3, 181.649, 118.25, 54, 'Enter', 'Enter', 'Enter', 0.0, True),
-                KeyDef(3, 15, 999.05, 181.649, 52, 54, 'Sleep', 'Home', 'Home'),
-
-                # Row 4 (ZXCV row)
-                KeyDef(4, 0, 0, 236.649, 52, 54, 'M4', 'N/A', 'M4'),
-                KeyDef(4, 1, 79.5, 236.649, 118.25, 54, 'Shift', 'ShiftLeft', 'Shift'),
-                KeyDef(4, 2, 198.75, 236.649, 52, 54, 'Z', 'KeyZ', 'z'),
-                KeyDef(4, 3, 257.76, 237.493, 52, 54, 'X', 'KeyX', 'x', 0.10472),
-                KeyDef(4, 4, 310.47, 243.033, 52, 54, 'C', 'KeyC', 'c', 0.10472),
-                KeyDef(4, 5, 363.18, 248.573, 52, 54, 'V', 'KeyV', 'v', 0.10472),
-                KeyDef(4, 6, 415.889, 254.113, 52, 54, 'B', 'KeyB', 'b', 0.10472),
-                KeyDef(4, 7, 501.93, 262.786, 52, 54, 'B', 'KeyB', 'b', -0.10472),
-                KeyDef(4, 8, 554.64, 257.246, 52, 54, 'N', 'KeyN', 'n', -0.10472),
-                KeyDef(4, 9, 607.349, 251.706, 52, 54, 'M', 'KeyM', 'm', -0.10472),
-                KeyDef(4, 10, 660.059, 246.166, 52, 54, '<\n,', 'Comma', ',', -0.10472),
-                KeyDef(4, 11, 712.769, 240.626, 52, 54, '>\n.', 'Period', '.', -0.10472),
-                KeyDef(4, 12, 779.1, 236.649, 52, 54, '?\n/', 'Slash', '/'),
-                KeyDef(4, 13, 832.1, 236.649, 91.75, 54, 'Shift', 'ShiftRight', 'Shift'),
-                KeyDef(4, 14, 938.1, 250.399, 52, 54, '↑', 'ArrowUp', 'ArrowUp'),
-
-                # Row 5 (Bottom row)
-                KeyDef(5, 0, 0, 291.649, 52, 54, 'M5', 'N/A', 'M5'),
-                KeyDef(5, 1, 79.5, 291.649, 65.25, 54, 'Ctrl', 'ControlLeft', 'Control'),
-                KeyDef(5, 2, 145.75, 291.649, 65.25, 54, 'LOpt', 'AltLeft', 'Alt'),
-                KeyDef(5, 3, 251.975, 292.884, 65.25, 54, 'LCmd', 'MetaLeft', 'Meta', 0.10472),
-                KeyDef(5, 5, 317.717, 302.579, 118.25, 54, 'Space', 'Space', ' ', 0.10472, False, False, 'left'),
-                KeyDef(5, 6, 436.495, 311.581, 52, 54, 'MO(1)', 'N/A', 'MO(1)', 0.10472),
-                KeyDef(5, 7, 507.454, 313.192, 134.15, 54, 'Space', 'Space', ' ', -0.10472, False, False, 'right'),
-                KeyDef(5, 9, 642.089, 303.358, 52, 54, 'RCmd', 'MetaRight', 'Meta', -0.10472),
-                KeyDef(5, 10, 694.798, 297.818, 52, 54, 'Ctrl', 'ControlRight', 'Control', -0.10472),
-                KeyDef(5, 12, 885.1, 305.399, 52, 54, '←', 'ArrowLeft', 'ArrowLeft'),
-                KeyDef(5, 13, 938.1, 305.399, 52, 54, '↓', 'ArrowDown', 'ArrowDown'),
-                KeyDef(5, 14, 991.1, 305.399, 52, 54, '→', 'ArrowRight', 'ArrowRight')
-            ],
-            
-            'marvo': [
-                # Function row
-                KeyDef(0, 0, 10, 10, 52, 54, 'Esc', 'Escape', 'Escape', is_special=True),
-                KeyDef(0, 1, 100, 10, 52, 54, 'F1', 'F1', 'F1'),
-                KeyDef(0, 2, 160, 10, 52, 54, 'F2', 'F2', 'F2'),
-                KeyDef(0, 3, 220, 10, 52, 54, 'F3', 'F3', 'F3'),
-                KeyDef(0, 4, 280, 10, 52, 54, 'F4', 'F4', 'F4'),
-                KeyDef(0, 5, 384, 10, 52, 54, 'F5', 'F5', 'F5'),
-                KeyDef(0, 6, 444, 10, 52, 54, 'F6', 'F6', 'F6'),
-                KeyDef(0, 7, 504, 10, 52, 54, 'F7', 'F7', 'F7'),
-                KeyDef(0, 8, 564, 10, 52, 54, 'F8', 'F8', 'F8'),
-                KeyDef(0, 9, 668, 10, 52, 54, 'F9', 'F9', 'F9'),
-                KeyDef(0, 10, 728, 10, 52, 54, 'F10', 'F10', 'F10'),
-                KeyDef(0, 11, 788, 10, 52, 54, 'F11', 'F11', 'F11'),
-                KeyDef(0, 12, 848, 10, 52, 54, 'F12', 'F12', 'F12'),
-                KeyDef(0, 13, 910, 10, 52, 54, 'PrtSc', 'PrintScreen', 'PrintScreen'),
-                KeyDef(0, 14, 970, 10, 52, 54, 'ScrLk', 'ScrollLock', 'ScrollLock'),
-                KeyDef(0, 15, 1030, 10, 52, 54, 'Pause', 'Pause', 'Pause'),
-
-                # Number row
-                KeyDef(1, 0, 10, 70, 52, 54, '~\n`', 'Backquote', '`'),
-                KeyDef(1, 1, 70, 70, 52, 54, '!\n1', 'Digit1', '1'),
-                KeyDef(1, 2, 130, 70, 52, 54, '@\n2', 'Digit2', '2'),
-                KeyDef(1, 3, 190, 70, 52, 54, '#\n3', 'Digit3', '3'),
-                KeyDef(1, 4, 250, 70, 52, 54, '$\n4', 'Digit4', '4'),
-                KeyDef(1, 5, 310, 70, 52, 54, '%\n5', 'Digit5', '5'),
-                KeyDef(1, 6, 370, 70, 52, 54, '^\n6', 'Digit6', '6'),
-                KeyDef(1, 7, 430, 70, 52, 54, '&\n7', 'Digit7', '7'),
-                KeyDef(1, 8, 490, 70, 52, 54, '*\n8', 'Digit8', '8'),
-                KeyDef(1, 9, 550, 70, 52, 54, '(\n9', 'Digit9', '9'),
-                KeyDef(1, 10, 610, 70, 52, 54, ')\n0', 'Digit0', '0'),
-                KeyDef(1, 11, 670, 70, 52, 54, '_\n-', 'Minus', '-'),
-                KeyDef(1, 12, 730, 70, 52, 54, '+\n=', 'Equal', '='),
-                KeyDef(1, 13, 790, 70, 110, 54, 'Backspace', 'Backspace', 'Backspace'),
-                KeyDef(1, 14, 910, 70, 52, 54, 'Ins', 'Insert', 'Insert'),
-                KeyDef(1, 15, 970, 70, 52, 54, 'Home', 'Home', 'Home'),
-                KeyDef(1, 16, 1030, 70, 52, 54, 'PgUp', 'PageUp', 'PageUp'),
-
-                # QWERTY row
-                KeyDef(2, 0, 10, 130, 78, 54, 'Tab', 'Tab', 'Tab'),
-                KeyDef(2, 1, 100, 130, 52, 54, 'Q', 'KeyQ', 'q'),
-                KeyDef(2, 2, 160, 130, 52, 54, 'W', 'KeyW', 'w'),
-                KeyDef(2, 3, 220, 130, 52, 54, 'E', 'KeyE', 'e'),
-                KeyDef(2, 4, 280, 130, 52, 54, 'R', 'KeyR', 'r'),
-                KeyDef(2, 5, 340, 130, 52, 54, 'T', 'KeyT', 't'),
-                KeyDef(2, 6, 400, 130, 52, 54, 'Y', 'KeyY', 'y'),
-                KeyDef(2, 7, 460, 130, 52, 54, 'U', 'KeyU', 'u'),
-                KeyDef(2, 8, 520, 130, 52, 54, 'I', 'KeyI', 'i'),
-                KeyDef(2, 9, 580, 130, 52, 54, 'O', 'KeyO', 'o'),
-                KeyDef(2, 10, 640, 130, 52, 54, 'P', 'KeyP', 'p'),
-                KeyDef(2, 11, 700, 130, 52, 54, '{\n[', 'BracketLeft', '['),
-                KeyDef(2, 12, 760, 130, 52, 54, '}\n]', 'BracketRight', ']'),
-                KeyDef(2, 13, 820, 130, 80, 54, '|\n\\', 'Backslash', '\\'),
-                KeyDef(2, 14, 910, 130, 52, 54, 'Del', 'Delete', 'Delete'),
-                KeyDef(2, 15, 970, 130, 52, 54, 'End', 'End', 'End'),
-                KeyDef(2, 16, 1030, 130, 52, 54, 'PgDn', 'PageDown', 'PageDown'),
-
-                # ASDF row
-                KeyDef(3, 0, 10, 190, 88, 54, 'Caps Lock', 'CapsLock', 'CapsLock'),
-                KeyDef(3, 1, 110, 190, 52, 54, 'A', 'KeyA', 'a'),
-                KeyDef(3, 2, 170, 190, 52, 54, 'S', 'KeyS', 's'),
-                KeyDef(3, 3, 230, 190, 52, 54, 'D', 'KeyD', 'd'),
-                KeyDef(3, 4, 290, 190, 52, 54, 'F', 'KeyF', 'f'),
-                KeyDef(3, 5, 350, 190, 52, 54, 'G', 'KeyG', 'g'),
-                KeyDef(3, 6, 410, 190, 52, 54, 'H', 'KeyH', 'h'),
-                KeyDef(3, 7, 470, 190, 52, 54, 'J', 'KeyJ', 'j'),
-                KeyDef(3, 8, 530, 190, 52, 54, 'K', 'KeyK', 'k'),
-                KeyDef(3, 9, 590, 190, 52, 54, 'L', 'KeyL', 'l'),
-                KeyDef(3, 10, 650, 190, 52, 54, ':\n;', 'Semicolon', ';'),
-                KeyDef(3, 11, 710, 190, 52, 54, '"\n\'', 'Quote', "'"),
-                KeyDef(3, 12, 770, 190, 130, 54, 'Enter', 'Enter', 'Enter', is_special=True),
-                KeyDef(3, 13, 970, 250, 52, 54, '↑', 'ArrowUp', 'ArrowUp'),
-
-                # ZXCV row
-                KeyDef(4, 0, 10, 250, 118, 54, 'Shift', 'ShiftLeft', 'Shift'),
-                KeyDef(4, 1, 140.5, 250, 52, 54, 'Z', 'KeyZ', 'z'),
-                KeyDef(4, 2, 200, 250, 52, 54, 'X', 'KeyX', 'x'),
-                KeyDef(4, 3, 260, 250, 52, 54, 'C', 'KeyC', 'c'),
-                KeyDef(4, 4, 320, 250, 52, 54, 'V', 'KeyV', 'v'),
-                KeyDef(4, 5, 380, 250, 52, 54, 'B', 'KeyB', 'b'),
-                KeyDef(4, 6, 440, 250, 52, 54, 'N', 'KeyN', 'n'),
-                KeyDef(4, 7, 500, 250, 52, 54, 'M', 'KeyM', 'm'),
-                KeyDef(4, 8, 560, 250, 52, 54, '<\n,', 'Comma', ','),
-                KeyDef(4, 9, 620, 250, 52, 54, '>\n.', 'Period', '.'),
-                KeyDef(4, 10, 680, 250, 52, 54, '?\n/', 'Slash', '/'),
-                KeyDef(4, 11, 741, 250, 160, 54, 'Shift', 'ShiftRight', 'Shift'),
-                KeyDef(4, 12, 910, 310, 52, 54, '←', 'ArrowLeft', 'ArrowLeft'),
-                KeyDef(4, 13, 970, 310, 52, 54, '↓', 'ArrowDown', 'ArrowDown'),
-                KeyDef(4, 14, 1030, 310, 52, 54, '→', 'ArrowRight', 'ArrowRight'),
-
-                # Bottom row
-                KeyDef(5, 0, 10, 310, 72, 54, 'Ctrl', 'ControlLeft', 'Control'),
-                KeyDef(5, 1, 94, 310, 52, 54, 'Win', 'MetaLeft', 'Meta'),
-                KeyDef(5, 2, 154, 310, 52, 54, 'Alt', 'AltLeft', 'Alt'),
-                KeyDef(5, 3, 218, 310, 418, 54, 'Space', 'Space', ' '),
-                KeyDef(5, 4, 648.5, 310, 52, 54, 'Alt', 'AltRight', 'Alt'),
-                KeyDef(5, 5, 708.5, 310, 52, 54, 'Win', 'MetaRight', 'Meta'),
-                KeyDef(5, 6, 768, 310, 52, 54, 'Menu', 'ContextMenu', 'ContextMenu'),
-                KeyDef(5, 7, 829.5, 310, 72, 54, 'Ctrl', 'ControlRight', 'Control')
-            ]
-        }
+        self.pressed_keys: set = set()
+        self.layout_keys: Tuple[KeyDef, ...] = ()  # Shared with any other view of the layout
+        
+        # Canvas mode key areas, indexed like the current layout's KeyDef list
+        self.key_bounds: List[QRect] = []
+        # KeyWidgets in widgets mode, indexed the same way
+        self.key_widgets: List[KeyWidget] = []
+        
+        # Heatmap: scale name (None when off) and colour bucket per key index
+        self.heat_scale: Optional[str] = None
+        self.key_heat: List[int] = []
+        self.key_ids = None  # Code id per key index, as a NumPy array
         
         self.setup_keyboard()
         
     def setup_keyboard(self):
+        with startup_phase(f"keyboard layout build ({self.current_layout})"):
+            self.build_keyboard()
+    
+    def build_keyboard(self):
         self.keys.clear()
+        self.pressed_keys.clear()
+        self.key_widgets = []
         
         # Clear existing widgets
         for child in self.findChildren(KeyWidget):
             child.deleteLater()
         
         # Create key widgets
-        layout_keys = self.key_layouts[self.current_layout]
+        layout_keys = self.layout_keys = load_layout(self.current_layout)
         
         # Calculate bounds for proper scaling
         max_x = max(k.x + k.width for k in layout_keys)
         max_y = max(k.y + k.height for k in layout_keys)
         
         self.original_size = QSize(int(max_x), int(max_y))
-        
-        for key_def in layout_keys:
-            key_widget = KeyWidget(key_def, self.scale_factor)
-            key_widget.setParent(self)
-            
-            # Group keys by code for handling duplicate keys (like Space, B)
-            if key_def.code not in self.keys:
-                self.keys[key_def.code] = []
-            self.keys[key_def.code].append(key_widget)
-            
-            key_widget.show()
+        self.key_heat = [-1] * len(layout_keys)
+        if np is not None:
+            self.key_ids = np.array([intern_code(key_def.code) for key_def in layout_keys], dtype=np.intp)
+        
+        if self.render_mode == 'canvas':
+            # Group key indexes by code id for handling duplicate keys (like Space, B)
+            for index, key_def in enumerate(layout_keys):
+                self.keys.setdefault(intern_code(key_def.code), []).append(index)
+            self.update_key_bounds()
+        else:
+            for key_def in layout_keys:
+                key_widget = KeyWidget(key_def, self.scale_factor)
+                key_widget.setParent(self)
+                
+                # Group keys by code id for handling duplicate keys (like Space, B)
+                self.keys.setdefault(intern_code(key_def.code), []).append(key_widget)
+                self.key_widgets.append(key_widget)
+                
+                key_widget.show()
         
         self.update_size()
+        self.update()
+    
+    def key_geometry(self, key_def: KeyDef) -> QRect:
+        """Unrotated keycap rectangle at the current scale (same as KeyWidget)"""
+        return QRect(
+            int(key_def.x * self.scale_factor),
+            int(key_def.y * self.scale_factor),
+            int(key_def.width * self.scale_factor),
+            int(key_def.height * self.scale_factor)
+        )
+    
+    def update_key_bounds(self):
+        """Recompute the area each key paints, including its rotation"""
+        self.key_bounds = [
+            keycap_bounds(self.key_geometry(key_def), key_def.rotation)
+            for key_def in self.layout_keys
+        ]
+    
+    def paintEvent(self, event):
+        if _startup_profile is not None:
+            finish_startup_profile()
+        if self.render_mode != 'canvas':
+            return
+        
+        damaged = event.rect()
+        layout_keys = self.layout_keys
+        key_heat = self.key_heat
+        ratio = self.devicePixelRatioF()
+        painter = QPainter(self)
+        for index, bounds in enumerate(self.key_bounds):
+            if bounds.intersects(damaged):
+                pressed = index in self.pressed_keys
+                pixmap = KEYCAP_CACHE.pixmap(layout_keys[index], pressed, self.scale_factor, ratio, key_heat[index])
+                painter.drawPixmap(bounds.topLeft(), pixmap)
+                if pressed and LATENCY.enabled:
+                    LATENCY.mark(STAGE_KEYBOARD_PAINT, intern_code(layout_keys[index].code))
     
     def update_size(self):
         if hasattr(self, 'original_size'):
@@ -1113,114 +1120,95 @@ class KeyboardWidget(QWidget):
             self.setFixedSize(new_size)
     
     def set_layout(self, layout_name: str):
-        if layout_name in self.key_layouts:
+        if layout_exists(layout_name):
             self.current_layout = layout_name
             self.setup_keyboard()
     
     def set_scale_factor(self, factor: float):
         self.scale_factor = factor
-        for key_list in self.keys.values():
-            for key_widget in key_list:
-                key_widget.update_scale(factor)
+        KEYCAP_CACHE.invalidate()
+        if self.render_mode == 'canvas':
+            self.update_key_bounds()
+            self.update()
+        else:
+            for key_list in self.keys.values():
+                for key_widget in key_list:
+                    key_widget.update_scale(factor)
         self.update_size()
     
-    def handle_key_press(self, code: str):
-        self.key_pressed.emit(code)
-        
-        if code in self.keys:
-            for key_widget in self.keys[code]:
-                if key_widget not in self.pressed_keys:
-                    self.pressed_keys.add(key_widget)
-                    key_widget.set_pressed(True)
+    def set_heat_scale(self, scale: Optional[str]):
+        """Colour keys by frequency on scale ('linear', 'log', 'percentile'), or None to turn off
+        
+        Colours are filled in by the next update_heatmap() call.
+        """
+        self.heat_scale = scale
+        if scale is None:
+            self.set_key_heat(range(len(self.key_heat)), [-1] * len(self.key_heat))
     
-    def handle_key_release(self, code: str):
-        self.key_released.emit(code)
-        
-        if code in self.keys:
-            for key_widget in self.keys[code]:
-                if key_widget in self.pressed_keys:
-                    self.pressed_keys.remove(key_widget)
-                    key_widget.set_pressed(False)
+    def update_heatmap(self, counts: List[int]):
+        """Recolour keys from lifetime counts indexed by code id, repainting only changed buckets"""
+        if self.heat_scale is None or self.key_ids is None or not len(self.key_ids):
+            return
+        buckets = heat_buckets(counts, self.key_ids, self.heat_scale)
+        changed = np.flatnonzero(buckets != np.asarray(self.key_heat))
+        if len(changed):
+            self.set_key_heat(changed.tolist(), buckets[changed].tolist())
+    
+    def set_key_heat(self, indexes, buckets):
+        for index, bucket in zip(indexes, buckets):
+            self.key_heat[index] = bucket
+            if self.render_mode == 'canvas':
+                self.update(self.key_bounds[index])
+            else:
+                self.key_widgets[index].set_heat(bucket)
+    
+    def set_key_pressed(self, key, pressed: bool):
+        if self.render_mode == 'canvas':
+            # Only the key's own rectangle is repainted
+            self.update(self.key_bounds[key])
+        else:
+            key.set_pressed(pressed)
+    
+    def handle_key_press(self, code_id: int):
+        self.key_pressed.emit(code_id)
+        
+        if code_id in self.keys:
+            for key in self.keys[code_id]:
+                if key not in self.pressed_keys:
+                    self.pressed_keys.add(key)
+                    self.set_key_pressed(key, True)
+            if LATENCY.enabled:
+                LATENCY.mark(STAGE_UPDATE, code_id)
+    
+    def handle_key_release(self, code_id: int):
+        self.key_released.emit(code_id)
+        
+        if code_id in self.keys:
+            for key in self.keys[code_id]:
+                if key in self.pressed_keys:
+                    self.pressed_keys.remove(key)
+                    self.set_key_pressed(key, False)
     
     def keyPressEvent(self, event: QKeyEvent):
         if not event.isAutoRepeat():
-            # Convert Qt key to web key code
-            code = self.qt_key_to_web_code(event.key(), event.text())
-            if code:
-                self.handle_key_press(code)
+            # Convert Qt key to web key code id
+            code_id = qt_key_to_id(event.key())
+            if code_id:
+                if LATENCY.enabled:
+                    LATENCY.begin(code_id)
+                self.handle_key_press(code_id)
         super().keyPressEvent(event)
     
     def keyReleaseEvent(self, event: QKeyEvent):
         if not event.isAutoRepeat():
-            code = self.qt_key_to_web_code(event.key(), event.text())
-            if code:
-                self.handle_key_release(code)
+            code_id = qt_key_to_id(event.key())
+            if code_id:
+                self.handle_key_release(code_id)
         super().keyReleaseEvent(event)
     
     def qt_key_to_web_code(self, qt_key: int, text: str) -> Optional[str]:
         """Convert Qt key codes to web KeyboardEvent.code format"""
-        key_map = {
-            # Letters
-            Qt.Key.Key_A: 'KeyA', Qt.Key.Key_B: 'KeyB', Qt.Key.Key_C: 'KeyC', Qt.Key.Key_D: 'KeyD',
-            Qt.Key.Key_E: 'KeyE', Qt.Key.Key_F: 'KeyF', Qt.Key.Key_G: 'KeyG', Qt.Key.Key_H: 'KeyH',
-            Qt.Key.Key_I: 'KeyI', Qt.Key.Key_J: 'KeyJ', Qt.Key.Key_K: 'KeyK', Qt.Key.Key_L: 'KeyL',
-            Qt.Key.Key_M: 'KeyM', Qt.Key.Key_N: 'KeyN', Qt.Key.Key_O: 'KeyO', Qt.Key.Key_P: 'KeyP',
-            Qt.Key.Key_Q: 'KeyQ', Qt.Key.Key_R: 'KeyR', Qt.Key.Key_S: 'KeyS', Qt.Key.Key_T: 'KeyT',
-            Qt.Key.Key_U: 'KeyU', Qt.Key.Key_V: 'KeyV', Qt.Key.Key_W: 'KeyW', Qt.Key.Key_X: 'KeyX',
-            Qt.Key.Key_Y: 'KeyY', Qt.Key.Key_Z: 'KeyZ',
-            
-            # Numbers
-            Qt.Key.Key_1: 'Digit1', Qt.Key.Key_2: 'Digit2', Qt.Key.Key_3: 'Digit3', Qt.Key.Key_4: 'Digit4',
-            Qt.Key.Key_5: 'Digit5', Qt.Key.Key_6: 'Digit6', Qt.Key.Key_7: 'Digit7', Qt.Key.Key_8: 'Digit8',
-            Qt.Key.Key_9: 'Digit9', Qt.Key.Key_0: 'Digit0',
-            
-            # Function keys
-            Qt.Key.Key_F1: 'F1', Qt.Key.Key_F2: 'F2', Qt.Key.Key_F3: 'F3', Qt.Key.Key_F4: 'F4',
-            Qt.Key.Key_F5: 'F5', Qt.Key.Key_F6: 'F6', Qt.Key.Key_F7: 'F7', Qt.Key.Key_F8: 'F8',
-            Qt.Key.Key_F9: 'F9', Qt.Key.Key_F10: 'F10', Qt.Key.Key_F11: 'F11', Qt.Key.Key_F12: 'F12',
-            
-            # Special keys
-            Qt.Key.Key_Space: 'Space',
-            Qt.Key.Key_Return: 'Enter',
-            Qt.Key.Key_Enter: 'Enter',
-            Qt.Key.Key_Backspace: 'Backspace',
-            Qt.Key.Key_Delete: 'Delete',
-            Qt.Key.Key_Tab: 'Tab',
-            Qt.Key.Key_Shift: 'ShiftLeft',
-            Qt.Key.Key_Control: 'ControlLeft',
-            Qt.Key.Key_Alt: 'AltLeft',
-            Qt.Key.Key_Meta: 'MetaLeft',
-            Qt.Key.Key_CapsLock: 'CapsLock',
-            Qt.Key.Key_Escape: 'Escape',
-            
-            # Punctuation
-            Qt.Key.Key_Semicolon: 'Semicolon',
-            Qt.Key.Key_Apostrophe: 'Quote',
-            Qt.Key.Key_Comma: 'Comma',
-            Qt.Key.Key_Period: 'Period',
-            Qt.Key.Key_Slash: 'Slash',
-            Qt.Key.Key_Backslash: 'Backslash',
-            Qt.Key.Key_BracketLeft: 'BracketLeft',
-            Qt.Key.Key_BracketRight: 'BracketRight',
-            Qt.Key.Key_Minus: 'Minus',
-            Qt.Key.Key_Equal: 'Equal',
-            Qt.Key.Key_QuoteLeft: 'Backquote',
-            
-            # Arrows
-            Qt.Key.Key_Left: 'ArrowLeft',
-            Qt.Key.Key_Right: 'ArrowRight',
-            Qt.Key.Key_Up: 'ArrowUp',
-            Qt.Key.Key_Down: 'ArrowDown',
-            
-            # Navigation
-            Qt.Key.Key_Home: 'Home',
-            Qt.Key.Key_End: 'End',
-            Qt.Key.Key_PageUp: 'PageUp',
-            Qt.Key.Key_PageDown: 'PageDown',
-            Qt.Key.Key_Insert: 'Insert',
-        }
-        
-        return key_map.get(qt_key)
+        return qt_key_to_code(qt_key)
 
 
 class RhythmChart(QWidget):
@@ -1232,8 +1220,10 @@ class RhythmChart(QWidget):
         self.setMinimumHeight(80)  # Reduced height
         
     def update_data(self, rhythm_data: deque):
-        self.data = list(rhythm_data)
-        self.update()
+        data = list(rhythm_data)
+        if data != self.data:
+            self.data = data
+            self.update()
         
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -1315,6 +1305,8 @@ class BalanceBarContainer(QWidget):
         # Calculate bar widths
         left_width = int(self.width() * left_percent / 100)
         right_width = self.width() - left_width
+        if getattr(self, 'left_bar_rect', None) is not None and self.left_bar_rect.width() == left_width:
+            return
         
         # Set left bar rectangle
         self.left_bar_rect = QRect(0, 0, left_width, self.height())
@@ -1325,18 +1317,124 @@ class BalanceBarContainer(QWidget):
         self.update()
 
 
+class TopKeysView(QWidget):
+    """Custom-painted Top Keys list that repaints only the rows that changed"""
+    
+    ROW_HEIGHT = 27
+    NAME_WIDTH = 60
+    BAR_STEPS = 200  # Fill resolution; finer changes are not repainted
+    
+    def __init__(self, rows: int = 5, parent=None):
+        super().__init__(parent)
+        self.rows: List[Optional[Tuple[str, str, int]]] = [None] * rows  # (name, count text, fill steps)
+        self.setMinimumHeight(rows * self.ROW_HEIGHT)
+        
+        self.name_font = QFont()
+        self.name_font.setPixelSize(13)
+        self.name_font.setWeight(QFont.Weight.DemiBold)
+        self.count_font = QFont()
+        self.count_font.setPixelSize(13)
+        self.count_font.setWeight(QFont.Weight.Bold)
+        self.count_metrics = QFontMetrics(self.count_font)
+        
+        # Paint cost counters
+        self.paint_count = 0
+        self.rows_painted = 0
+        self.last_paint_ms = 0.0
+        self.max_paint_ms = 0.0
+    
+    def set_items(self, items: List[Tuple[str, int]]):
+        """Show (name, count) rows; only rows whose content changed are repainted"""
+        max_count = items[0][1] if items and items[0][1] else 1
+        for i in range(len(self.rows)):
+            row = None
+            if i < len(items):
+                name, count = items[i]
+                row = (name, str(count), self.BAR_STEPS * count // max_count)
+            if row != self.rows[i]:
+                self.rows[i] = row
+                self.update(self.row_rect(i))
+    
+    def row_rect(self, index: int) -> QRect:
+        return QRect(0, index * self.ROW_HEIGHT, self.width(), self.ROW_HEIGHT)
+    
+    def paint_stats(self) -> Dict[str, float]:
+        return {
+            'paints': self.paint_count,
+            'rows_painted': self.rows_painted,
+            'last_paint_ms': self.last_paint_ms,
+            'max_paint_ms': self.max_paint_ms,
+        }
+    
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        
+        # Paint only the rows intersecting the damaged area
+        dirty = event.rect()
+        first = max(0, dirty.top() // self.ROW_HEIGHT)
+        last = min(len(self.rows) - 1, dirty.bottom() // self.ROW_HEIGHT)
+        painted = 0
+        for i in range(first, last + 1):
+            if self.rows[i] is not None:
+                self.paint_row(painter, i)
+                painted += 1
+        painter.end()
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        self.paint_count += 1
+        self.rows_painted += painted
+        self.last_paint_ms = elapsed
+        self.max_paint_ms = max(self.max_paint_ms, elapsed)
+    
+    def paint_row(self, painter: QPainter, index: int):
+        name, count_text, fill_steps = self.rows[index]
+        rect = self.row_rect(index).adjusted(5, 3, -5, -3)
+        
+        # Key name
+        painter.setFont(self.name_font)
+        painter.setPen(QColor(255, 255, 255))
+        name_rect = QRect(rect.x(), rect.y(), self.NAME_WIDTH, rect.height())
+        painter.drawText(name_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, f"{name}:")
+        
+        # Count, sized by digit count
+        count_width = max(15 + len(count_text) * 7, self.count_metrics.horizontalAdvance(count_text))
+        count_rect = QRect(rect.right() - count_width, rect.y(), count_width, rect.height())
+        painter.setFont(self.count_font)
+        painter.setPen(QColor(255, 126, 95))
+        painter.drawText(count_rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, count_text)
+        
+        # Progress bar
+        bar_left = name_rect.right() + 6
+        bar_width = max(0, count_rect.left() - 6 - bar_left)
+        bar_rect = QRect(bar_left, rect.center().y() - 3, bar_width, 6)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(255, 255, 255, 26))
+        painter.drawRoundedRect(bar_rect, 3, 3)
+        fill_width = bar_width * fill_steps // self.BAR_STEPS
+        if fill_width > 0:
+            painter.setBrush(QColor(255, 126, 95))
+            painter.drawRoundedRect(QRect(bar_left, bar_rect.y(), fill_width, 6), 3, 3)
+
+
 class AnalyticsPanel(QWidget):
     """Compact Analytics dashboard panel"""
     
-    def __init__(self, analytics: KeyboardAnalytics):
+    def __init__(self, analytics: KeyboardAnalytics, scheduler: RefreshScheduler):
         super().__init__()
         self.analytics = analytics
         self.setup_ui()
         
-         # Update timer - same as overlay
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_display)
-        self.update_timer.start(250)  # Update every 250ms
+        # Only rebuild the top keys list when the ranking reports a change
+        self.top_keys_dirty = True
+        self.analytics.key_frequency.subscribe(self.mark_top_keys_dirty)
+        
+        # Refresh when the analytics change, coalesced per frame
+        scheduler.refresh.connect(self.update_display)
+        scheduler.refresh.connect(self.update_rhythm)
+        self.update_display()
+        self.update_rhythm()
 
     def setup_ui(self):
         layout = QGridLayout(self)
@@ -1349,7 +1447,11 @@ class AnalyticsPanel(QWidget):
         
         self.total_keystrokes_label = self.create_mini_stat("Keystrokes", "0")
         self.avg_dwell_label = self.create_mini_stat("Avg Dwell", "0ms")
+        # Lifetime distributions from the analytics' timing sketches
+        self.dwell_percentiles_label = self.create_mini_stat("Dwell p50/p90/p99", "-")
+        self.interval_percentiles_label = self.create_mini_stat("Interval p50/p90/p99", "-")
         self.kps_label = self.create_mini_stat("KPS", "0.0")
+        self.wpm_label = self.create_mini_stat("WPM", "0")
         
         # Create hand balance widget with text and visualization
         hand_balance_container = QWidget()
@@ -1402,7 +1504,10 @@ class AnalyticsPanel(QWidget):
         
         stats_layout.addWidget(self.total_keystrokes_label)
         stats_layout.addWidget(self.avg_dwell_label)
+        stats_layout.addWidget(self.dwell_percentiles_label)
+        stats_layout.addWidget(self.interval_percentiles_label)
         stats_layout.addWidget(self.kps_label)
+        stats_layout.addWidget(self.wpm_label)
         stats_layout.addWidget(hand_balance_wrapper)
         stats_layout.addStretch()
         
@@ -1410,9 +1515,9 @@ class AnalyticsPanel(QWidget):
         
         # Top Keys Card
         top_keys_card = self.create_card("Top Keys")
-        self.top_keys_layout = QVBoxLayout()
-        self.top_keys_layout.setSpacing(3)
-        top_keys_card.setLayout(self.top_keys_layout)
+        self.top_keys_view = TopKeysView(5)
+        top_keys_card_layout = QVBoxLayout(top_keys_card)
+        top_keys_card_layout.addWidget(self.top_keys_view)
         layout.addWidget(top_keys_card, 1, 0)
         
         # Rhythm Chart Card
@@ -1479,7 +1584,10 @@ class AnalyticsPanel(QWidget):
         # Update live stats
         self.total_keystrokes_label.value_label.setText(str(self.analytics.total_keystrokes))
         self.avg_dwell_label.value_label.setText(f"{int(self.analytics.get_average_dwell())}ms")
+        self.set_percentiles(self.dwell_percentiles_label, self.analytics.get_dwell_percentiles())
+        self.set_percentiles(self.interval_percentiles_label, self.analytics.get_interval_percentiles())
         self.kps_label.value_label.setText(f"{self.analytics.get_kps():.1f}")
+        self.wpm_label.value_label.setText(f"{self.analytics.get_wpm():.0f}")
         
         # Update hand balance
         total = self.analytics.hand_balance['left'] + self.analytics.hand_balance['right']
@@ -1496,59 +1604,26 @@ class AnalyticsPanel(QWidget):
         # Update hand balance visualization
         self.balance_bar.set_balance(left_percent, right_percent)
         
-        # Update rhythm chart
-        self.rhythm_chart.update_data(self.analytics.rhythm_data)
-        
         # Update top keys
-        self.update_top_keys()
+        if self.top_keys_dirty:
+            self.top_keys_dirty = False
+            self.update_top_keys()
+    
+    def set_percentiles(self, stat: QWidget, summary: Tuple[int, List[float]]):
+        count, values = summary
+        stat.value_label.setText("/".join(f"{value:.0f}" for value in values) + "ms" if count else "-")
+    
+    def mark_top_keys_dirty(self):
+        self.top_keys_dirty = True
+    
+    def update_rhythm(self):
+        self.rhythm_chart.update_data(self.analytics.rhythm_data)
         
     def update_top_keys(self):
-        # Clear existing items
-        for i in reversed(range(self.top_keys_layout.count())):
-            self.top_keys_layout.itemAt(i).widget().deleteLater()
-        
-        top_keys = self.analytics.get_top_keys(5)
-        max_count = top_keys[0][1] if top_keys else 1
-        
-        for code, count in top_keys:
-            item = self.create_top_key_item(self.get_key_display_name(code), count, max_count)
-            self.top_keys_layout.addWidget(item)
-            
-    def create_top_key_item(self, key_name: str, count: int, max_count: int) -> QWidget:
-        widget = QWidget()
-        layout = QHBoxLayout(widget)
-        layout.setContentsMargins(5, 3, 5, 3)
-        
-        name_label = QLabel(f"{key_name}:")
-        name_label.setStyleSheet("color: white; font-weight: 600; font-size: 13px;")
-        name_label.setFixedWidth(60)  # Fixed width for key name
-        
-        # Progress bar
-        progress_widget = QWidget()
-        progress_widget.setFixedHeight(6)
-        progress_widget.setStyleSheet("background-color: rgba(255, 255, 255, 0.1); border-radius: 3px;")
-        
-        # Progress fill - dynamically sized based on count
-        progress_fill = QWidget(progress_widget)
-        progress_fill.setStyleSheet("background-color: #ff7e5f; border-radius: 3px;")
-        fill_width = int(120 * count / max_count)
-        progress_fill.setGeometry(0, 0, fill_width, 6)
-        
-        # Count label - dynamically sized based on digit count
-        count_label = QLabel(str(count))
-        count_label.setStyleSheet("color: #ff7e5f; font-weight: 700; font-size: 13px;")
-        
-        # Calculate required width based on digit count
-        digit_count = len(str(count))
-        min_width = 15 + (digit_count * 7)  # 7px per digit + padding
-        count_label.setMinimumWidth(min_width)
-        count_label.setAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-        
-        layout.addWidget(name_label)
-        layout.addWidget(progress_widget, 1)  # Allow progress bar to expand
-        layout.addWidget(count_label)
-        
-        return widget
+        self.top_keys_view.set_items([
+            (self.get_key_display_name(code), count)
+            for code, count in self.analytics.get_top_keys(len(self.top_keys_view.rows))
+        ])
     
     def reset(self):
         """Reset all analytics data and clear JSON file"""
@@ -1587,112 +1662,133 @@ class AnalyticsPanel(QWidget):
             print(f"Error saving analytics: {e}")
         
     def get_key_display_name(self, code: str) -> str:
-        key_map = {
-            'Space': 'Space',
-            'Enter': 'Enter',
-            'Backspace': 'Backsp',
-            'ShiftLeft': 'LShift',
-            'ShiftRight': 'RShift',
-            'ControlLeft': 'LCtrl',
-            'ControlRight': 'RCtrl',
-            'AltLeft': 'LAlt',
-            'AltRight': 'RAlt',
-            'MetaLeft': 'LCmd',
-            'MetaRight': 'RCmd',
-            'Tab': 'Tab',
-            'CapsLock': 'Caps',
-            'Escape': 'Esc'
-        }
-        
-        if code in key_map:
-            return key_map[code]
-        elif code.startswith('Key'):
-            return code[3:]
-        elif code.startswith('Digit'):
-            return code[5:]
-        elif code.startswith('Arrow'):
-            return code[5:]
+        return display_name(code)
+
+class LatencyPanel(QWidget):
+    """Debug window with per-stage key press latency (--latency)"""
+    
+    FRAME_MS = 1000 / 60
+    
+    def __init__(self, scheduler: 'RefreshScheduler', parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Key Latency")
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #2a2a2a;
+                color: #f0f0f0;
+                font-size: 12px;
+            }
+            QPushButton {
+                background-color: #3a3a3a;
+                border: 1px solid rgba(255, 126, 95, 0.4);
+                border-radius: 4px;
+                padding: 4px 10px;
+            }
+        """)
         
-        return code
+        layout = QVBoxLayout(self)
+        grid = QGridLayout()
+        for column, title in enumerate(("stage", "count", "p50 ms", "p99 ms", "max ms")):
+            header = QLabel(title)
+            header.setStyleSheet("color: #aaa; font-weight: bold;")
+            grid.addWidget(header, 0, column)
+        
+        # One row of labels per stage: count, p50, p99, max
+        self.rows: Dict[str, List[QLabel]] = {}
+        for row, (stage, *_) in enumerate(LATENCY.summary(), start=1):
+            grid.addWidget(QLabel(stage), row, 0)
+            labels = [QLabel("-") for _ in range(4)]
+            for column, label in enumerate(labels, start=1):
+                label.setAlignment(Qt.AlignmentFlag.AlignRight)
+                grid.addWidget(label, row, column)
+            self.rows[stage] = labels
+        layout.addLayout(grid)
+        
+        buttons = QHBoxLayout()
+        export_btn = QPushButton("Export")
+        export_btn.clicked.connect(self.export)
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        buttons.addWidget(export_btn)
+        buttons.addWidget(reset_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        
+        self.status_label = QLabel(f"p99 within one frame ({self.FRAME_MS:.1f} ms) is shown in green")
+        self.status_label.setStyleSheet("color: #aaa; font-size: 11px;")
+        layout.addWidget(self.status_label)
+        
+        scheduler.refresh.connect(self.update_display)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_display()
+    
+    def update_display(self):
+        if not self.isVisible():
+            return
+        for stage, count, p50, p99, max_us in LATENCY.summary():
+            count_label, p50_label, p99_label, max_label = self.rows[stage]
+            count_label.setText(str(count))
+            if not count:
+                continue
+            p50_label.setText(f"{p50 / 1000:.2f}")
+            p99_label.setText(f"{p99 / 1000:.2f}")
+            max_label.setText(f"{max_us / 1000:.2f}")
+            color = "#7ed67e" if p99 / 1000 <= self.FRAME_MS else "#ff7e5f"
+            p99_label.setStyleSheet(f"color: {color};")
+    
+    def export(self):
+        path = os.path.abspath(f"latency_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            LATENCY.export(path)
+            self.status_label.setText(f"Exported to {path}")
+        except OSError as e:
+            self.status_label.setText(f"Export failed: {e}")
+    
+    def reset(self):
+        LATENCY.reset()
+        for labels in self.rows.values():
+            for label in labels:
+                label.setText("-")
+                label.setStyleSheet("")
+        self.update_display()
+
 
 class MainWindow(QMainWindow):
     """Main application window"""
     
     def __init__(self):
         super().__init__()
-        self.analytics = KeyboardAnalytics()
+        with startup_phase("analytics load"):
+            self.analytics = KeyboardAnalytics()
+        self.refresh_scheduler = RefreshScheduler(self.analytics)
         
-        # Initialize these first to prevent crashes
+        # The overlay and the capture helper are only built when the overlay is first enabled
         self.overlay_enabled = False
         self.global_listener = None
         self.mini_overlay = None
         
         # Setup UI first
-        self.setup_ui()
+        with startup_phase("main window UI"):
+            self.setup_ui()
         self.setWindowTitle("Keyboard Analytics")
         self.resize(1400, 900)
         
-        # Add auto-save timer (saves every 5 seconds)
+        # Auto-save 5 seconds after the first unsaved change
         self.save_timer = QTimer()
+        self.save_timer.setSingleShot(True)
         self.save_timer.timeout.connect(self.save_analytics)
-        self.save_timer.start(5000)  # 5 seconds
+        self.analytics.add_change_listener(self.schedule_save)
         
         # Enable global key capturing
         self.installEventFilter(self)
         
-        # Delay global capture setup to prevent crashes
-        QTimer.singleShot(1000, self.setup_global_capture_delayed)
-
-    def setup_global_capture_delayed(self):
-        """Setup global capture with delay to prevent initialization crashes"""
-        try:
-            print("🔧 Setting up delayed global capture...")
-            self.setup_global_capture()
-        except Exception as e:
-            print(f"❌ Delayed global capture setup failed: {e}")
-            print("Global overlay will not be available")
-    
-    def setup_global_capture(self):
-        """Setup global capture using pynput - SAFE VERSION"""
-        try:
-            print("🔧 Setting up global capture...")
-            
-            # Create mini overlay first (this should always work)
-            try:
-                self.mini_overlay = MiniOverlay(self.analytics)
-                self.mini_overlay.hide()
-                print("✅ Mini overlay created")
-            except Exception as e:
-                print(f"❌ Mini overlay failed: {e}")
-                return
-            
-            # Try to create global listener (this might fail due to permissions)
-            try:
-                import pynput  # Test import first
-                self.global_listener = PynputGlobalKeyListener()
-                self.global_listener.key_pressed.connect(self.on_global_key_press)
-                self.global_listener.key_released.connect(self.on_global_key_release)
-                print("✅ Global listener created")
-            except ImportError:
-                print("❌ pynput not installed - run: pip install pynput")
-                self.global_listener = None
-            except Exception as e:
-                print(f"⚠️  Global listener creation failed: {e}")
-                print("This is normal if accessibility permissions aren't granted yet")
-                self.global_listener = None
-            
-            print("✅ Global capture setup complete")
-            
-        except Exception as e:
-            print(f"❌ Failed to setup global capture: {e}")
-            print("App will continue without global capture")
-            self.global_listener = None
-            if not hasattr(self, 'mini_overlay') or self.mini_overlay is None:
-                try:
-                    self.mini_overlay = MiniOverlay(self.analytics)
-                    self.mini_overlay.hide()
-                except:
-                    self.mini_overlay = None
+        # Latency debug window, only when started with --latency
+        self.latency_panel = None
+        if LATENCY.enabled:
+            self.latency_panel = LatencyPanel(self.refresh_scheduler)
+            self.latency_panel.show()
 
     def show_permission_dialog(self, python_path: str):
         """Show permission request dialog"""
@@ -1716,98 +1812,120 @@ class MainWindow(QMainWindow):
         msg.exec()
     
     def setup_global_capture(self):
-        """Setup global capture using pynput"""
-        try:
-            print("🔧 Setting up global capture...")
-            
-            # Create mini overlay first
-            self.mini_overlay = MiniOverlay(self.analytics)
-            self.mini_overlay.hide()
-            
-            # Create global listener using pynput
+        """Build the mini overlay and the global listener on first use"""
+        if self.mini_overlay is None:
             try:
-                self.global_listener = PynputGlobalKeyListener()
-                self.global_listener.key_pressed.connect(self.on_global_key_press)
-                self.global_listener.key_released.connect(self.on_global_key_release)
-                print("✅ Global capture setup complete")
+                self.mini_overlay = MiniOverlay(self.analytics, self.refresh_scheduler)
+                self.mini_overlay.hide()
+                LOG.info("✅ Mini overlay created")
             except Exception as e:
-                print(f"⚠️  Global listener setup failed: {e}")
+                LOG.error("❌ Mini overlay failed: %s", e)
+                return
+        
+        if self.global_listener is None and sys.platform.startswith("linux") and _capture_ring is None:
+            # Read the keyboards directly when this user may; pynput is the fallback
+            from evdevcapture import find_keyboards
+            if find_keyboards():
+                self.global_listener = EvdevKeyListener()
+                self.global_listener.key_events.connect(self.on_global_key_events)
+                LOG.info("✅ Evdev listener created")
+        
+        if self.global_listener is None:
+            # pynput is only imported by the capture helper process, so just check it is installed
+            if importlib.util.find_spec("pynput") is None:
+                LOG.error("❌ pynput not installed - run: pip install pynput")
+                return
+            try:
+                self.global_listener = PynputGlobalKeyListener(_capture_ring)
+                self.global_listener.key_events.connect(self.on_global_key_events)
+                LOG.info("✅ Global listener created")
+            except Exception as e:
+                LOG.warning("⚠️  Global listener creation failed: %s", e)
                 self.global_listener = None
-            
-        except Exception as e:
-            print(f"❌ Failed to setup global capture: {e}")
-            self.global_listener = None
-            self.mini_overlay = MiniOverlay(self.analytics) if not hasattr(self, 'mini_overlay') else self.mini_overlay
-            if self.mini_overlay:
-                self.mini_overlay.hide()
 
-    def on_global_key_press(self, code: str):
+    def on_global_key_events(self, events: list):
+        """Handle a batch of global key events drained from the capture helper"""
+        for event_type, code_id, timestamp in events:
+            if event_type == EVENT_PRESS:
+                if LATENCY.enabled:
+                    LATENCY.mark(STAGE_SIGNAL, code_id)
+                self.on_global_key_press(code_id, timestamp)
+            elif event_type == EVENT_RELEASE:
+                self.on_global_key_release(code_id, timestamp)
+
+    def on_global_key_press(self, code_id: int, timestamp: Optional[float] = None):
         """Handle global key press efficiently"""
-        timestamp = time.time() * 1000
-        self.analytics.record_key_press(code, timestamp)
+        if timestamp is None:
+            timestamp = time.time() * 1000
+        self.analytics.record_key_press(code_id, timestamp)
+        if LATENCY.enabled:
+            LATENCY.mark(STAGE_RECORD, code_id)
         
         # Handle overlay if enabled
         if self.overlay_enabled and self.mini_overlay:
             # Queue the key press instead of immediate handling
-            self.mini_overlay.handle_key_press(code)
+            self.mini_overlay.handle_key_press(code_id)
             
-    def on_global_key_release(self, code: str):
+    def on_global_key_release(self, code_id: int, timestamp: Optional[float] = None):
         """Handle global key release efficiently"""
-        timestamp = time.time() * 1000
-        self.analytics.record_key_release(code, timestamp)
+        if timestamp is None:
+            timestamp = time.time() * 1000
+        self.analytics.record_key_release(code_id, timestamp)
         
         # Handle overlay if enabled
         if self.overlay_enabled and self.mini_overlay:
             # Queue the key release instead of immediate handling
-            self.mini_overlay.handle_key_release(code)
+            self.mini_overlay.handle_key_release(code_id)
 
     def toggle_overlay(self, enabled: bool):
         """Toggle overlay functionality - CRASH-SAFE VERSION"""
-        print(f"🔄 Toggle overlay: {enabled}")
+        LOG.info("🔄 Toggle overlay: %s", enabled)
         self.overlay_enabled = enabled
         
         if enabled:
+            self.setup_global_capture()
+            
             # Show overlay first (this should always work)
             if self.mini_overlay:
                 try:
                     self.mini_overlay.show()
                     self.mini_overlay.raise_()
-                    print("✅ Overlay shown")
+                    LOG.info("✅ Overlay shown")
                 except Exception as e:
-                    print(f"❌ Failed to show overlay: {e}")
+                    LOG.error("❌ Failed to show overlay: %s", e)
                     return
             
             # Try to start global capture (this might fail)
             if self.global_listener:
                 try:
-                    print("🎯 Attempting to start global listener...")
+                    LOG.info("🎯 Attempting to start global listener...")
                     success = self.global_listener.start_listening()
                     if success:
-                        print("🚀 Global capture start initiated")
+                        LOG.info("🚀 Global capture start initiated")
                     else:
-                        print("❌ Global capture failed to start")
+                        LOG.error("❌ Global capture failed to start")
                 except Exception as e:
-                    print(f"❌ Exception starting global listener: {e}")
-                    print("❌ This usually means accessibility permissions are missing")
+                    LOG.error("❌ Exception starting global listener: %s", e)
+                    LOG.error("❌ This usually means accessibility permissions are missing")
                     self.show_permission_dialog()
             else:
-                print("⚠️  No global listener available")
+                LOG.warning("⚠️  No global listener available")
                 
         else:
             # Disable overlay
             if self.mini_overlay:
                 try:
                     self.mini_overlay.hide()
-                    print("✅ Overlay hidden")
+                    LOG.info("✅ Overlay hidden")
                 except Exception as e:
-                    print(f"❌ Error hiding overlay: {e}")
+                    LOG.error("❌ Error hiding overlay: %s", e)
                     
             if self.global_listener:
                 try:
                     self.global_listener.stop_listening()
-                    print("✅ Global capture stopped")
+                    LOG.info("✅ Global capture stopped")
                 except Exception as e:
-                    print(f"❌ Error stopping global listener: {e}")
+                    LOG.error("❌ Error stopping global listener: %s", e)
 
     def show_permission_dialog(self):
         """Show permission instructions"""
@@ -1834,25 +1952,32 @@ class MainWindow(QMainWindow):
                 self.mini_overlay.hide()
         super().changeEvent(event)
 
-    def save_analytics(self):
-        """Save analytics to JSON file"""
-        if self.analytics.total_keystrokes > 0:  # Only save if there's data
-            self.analytics.save_to_json()
+    def schedule_save(self):
+        if not self.save_timer.isActive():
+            self.save_timer.start(5000)  # 5 seconds
+
+    def save_analytics(self, compact: bool = False):
+        """Append new events to the log and periodically refresh the JSON file"""
+        self.analytics.save(compact)
 
     def closeEvent(self, event):
         """Save analytics when closing the application"""
-        self.save_analytics()
+        self.save_analytics(compact=True)
+        self.analytics.close()
         event.accept()
         # Clean up global listener
-        if hasattr(self, 'global_listener'):
+        if self.global_listener:
             self.global_listener.stop_listening()
-        if hasattr(self, 'mini_overlay'):
+        if self.mini_overlay:
             self.mini_overlay.close()
+        if self.latency_panel:
+            self.latency_panel.close()
         
 
     def reset_analytics(self):
         """Reset analytics and clear JSON file"""
         self.analytics.reset()
+        self.save_analytics(compact=True)
         self.clear_button_focus()
         
     def change_keyboard_layout(self, text: str):
@@ -1862,7 +1987,23 @@ class MainWindow(QMainWindow):
         }
         if text in layout_map:
             self.keyboard_widget.set_layout(layout_map[text])
+            self.heat_generation = -1
+            self.update_heatmap()
+        self.clear_button_focus()
+    
+    def change_heatmap(self, text: str):
+        scale = text.split(": ", 1)[-1].lower()
+        self.keyboard_widget.set_heat_scale(scale if scale in HEAT_SCALES else None)
+        self.heat_generation = -1
+        self.update_heatmap()
         self.clear_button_focus()
+    
+    def update_heatmap(self):
+        """Recolour the heatmap if the counts changed since it was last coloured"""
+        if self.keyboard_widget.heat_scale is None or self.heat_generation == self.analytics.generation:
+            return
+        self.heat_generation = self.analytics.generation
+        self.keyboard_widget.update_heatmap(self.analytics.key_frequency.counts)
         
     def adjust_scale(self, delta: float):
         current_scale = self.keyboard_widget.scale_factor
@@ -1986,7 +2127,16 @@ class MainWindow(QMainWindow):
             }
         """)
         
+        # Heatmap colouring of the keyboard by lifetime key frequency
+        heat_selector = QComboBox()
+        heat_selector.addItems(["Heatmap: Off"] + [f"Heatmap: {scale.title()}" for scale in HEAT_SCALES])
+        heat_selector.currentTextChanged.connect(self.change_heatmap)
+        heat_selector.setFocusPolicy(Qt.FocusPolicy.ClickFocus)
+        heat_selector.setStyleSheet(layout_selector.styleSheet())
+        heat_selector.setEnabled(bool(HEAT_SCALES))  # Needs numpy
+        
         keyboard_layout.addWidget(layout_selector)
+        keyboard_layout.addWidget(heat_selector)
         keyboard_layout.addStretch()
         
         main_layout.addLayout(keyboard_layout)
@@ -1998,6 +2148,9 @@ class MainWindow(QMainWindow):
         self.keyboard_widget = KeyboardWidget()
         self.keyboard_widget.key_pressed.connect(self.on_key_press)
         self.keyboard_widget.key_released.connect(self.on_key_release)
+        # The heatmap follows the counts at most once per frame
+        self.heat_generation = -1
+        self.refresh_scheduler.refresh.connect(self.update_heatmap)
         
         # Keyboard background
         keyboard_frame = QFrame()
@@ -2064,7 +2217,7 @@ class MainWindow(QMainWindow):
         main_layout.addLayout(scale_layout)
         
         # Analytics panel
-        self.analytics_panel = AnalyticsPanel(self.analytics)
+        self.analytics_panel = AnalyticsPanel(self.analytics, self.refresh_scheduler)
         
         # Create a container to add some spacing
         analytics_container = QWidget()
@@ -2120,59 +2273,113 @@ class MainWindow(QMainWindow):
         # Set initial focus to keyboard
         self.keyboard_widget.setFocus()
         
-    def on_key_press(self, code: str):
-        print(f"MainWindow.on_key_press called with code: {code}")
+    def on_key_press(self, code_id: int):
+        code = id_to_code(code_id)
+        LOG.debug("MainWindow.on_key_press called with code: %s", code)
         timestamp = time.time() * 1000
-        self.analytics.record_key_press(code, timestamp)
+        self.analytics.record_key_press(code_id, timestamp)
+        if LATENCY.enabled:
+            LATENCY.mark(STAGE_RECORD, code_id)
         
         # Clear focus from buttons when typing starts
         self.clear_button_focus()
         
         # ALWAYS trigger overlay when enabled (whether global capture works or not)
         if self.overlay_enabled and self.mini_overlay:
-            print(f"Overlay enabled, sending {code} to mini overlay")
-            self.mini_overlay.handle_key_press(code)
+            LOG.debug("Overlay enabled, sending %s to mini overlay", code)
+            self.mini_overlay.handle_key_press(code_id)
         else:
-            print(f"Overlay not enabled or mini_overlay is None. overlay_enabled={self.overlay_enabled}, mini_overlay={self.mini_overlay}")
+            LOG.debug("Overlay not enabled or mini_overlay is None. overlay_enabled=%s, mini_overlay=%s", self.overlay_enabled, self.mini_overlay)
             
-    def on_key_release(self, code: str):
-        print(f"MainWindow.on_key_release called with code: {code}")
+    def on_key_release(self, code_id: int):
+        code = id_to_code(code_id)
+        LOG.debug("MainWindow.on_key_release called with code: %s", code)
         timestamp = time.time() * 1000
-        self.analytics.record_key_release(code, timestamp)
+        self.analytics.record_key_release(code_id, timestamp)
         
         # ALWAYS trigger overlay when enabled (whether global capture works or not)
         if self.overlay_enabled and self.mini_overlay:
-            print(f"Overlay enabled, releasing {code} in mini overlay")
-            self.mini_overlay.handle_key_release(code)
+            LOG.debug("Overlay enabled, releasing %s in mini overlay", code)
+            self.mini_overlay.handle_key_release(code_id)
         
     def eventFilter(self, obj, event):
         if event.type() == event.Type.KeyPress and not event.isAutoRepeat():
-            code = self.keyboard_widget.qt_key_to_web_code(event.key(), event.text())
-            if code:
+            code_id = qt_key_to_id(event.key())
+            if code_id:
+                if LATENCY.enabled:
+                    LATENCY.begin(code_id)
                 self.clear_button_focus()  # Add this line
-                self.keyboard_widget.handle_key_press(code)
+                self.keyboard_widget.handle_key_press(code_id)
         elif event.type() == event.Type.KeyRelease and not event.isAutoRepeat():
-            code = self.keyboard_widget.qt_key_to_web_code(event.key(), event.text())
-            if code:
-                self.keyboard_widget.handle_key_release(code)
+            code_id = qt_key_to_id(event.key())
+            if code_id:
+                self.keyboard_widget.handle_key_release(code_id)
         
         return super().eventFilter(obj, event)
 
 
+def install_signal_wakeup(app: QApplication):
+    """Let Python signal handlers (e.g. the SIGUSR1 log dump) run while Qt's event loop blocks"""
+    import signal
+    import socket
+    read_sock, write_sock = socket.socketpair()
+    read_sock.setblocking(False)
+    write_sock.setblocking(False)
+    signal.set_wakeup_fd(write_sock.fileno())
+    notifier = QSocketNotifier(read_sock.fileno(), QSocketNotifier.Type.Read, app)
+    notifier.activated.connect(lambda: read_sock.recv(64))
+    app.signal_wakeup = (read_sock, write_sock, notifier)
+
+
 def main():
+    global _startup_profile, _capture_ring
     import sys
     print(f"Python executable: {sys.executable}")
     print(f"Python version: {sys.version}")
     
-    app = QApplication(sys.argv)
-    app.setApplicationName("Keyboard Analytics")
-    app.setOrganizationName("TypeChron")
+    # --log-level debug also records the per-keystroke messages (off by default)
+    for arg in list(sys.argv):
+        if arg.startswith("--log-level="):
+            sys.argv.remove(arg)
+            LOG.set_level(arg.split("=", 1)[1])
+    install_dump_handlers()
     
-    # Set application style
-    app.setStyle('Fusion')
+    if "--latency" in sys.argv:
+        sys.argv.remove("--latency")
+        LATENCY.enabled = True
     
-    window = MainWindow()
-    window.show()
+    # --ring[=NAME] captures through a shared-memory ring other processes can also follow
+    for arg in list(sys.argv):
+        if arg == "--ring" or arg.startswith("--ring="):
+            sys.argv.remove(arg)
+            from shmring import DEFAULT_RING_NAME
+            _capture_ring = arg.split("=", 1)[1] if "=" in arg else DEFAULT_RING_NAME
+    
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        _startup_profile = StartupProfile(_startup_time)
+        _startup_profile.add("imports", _import_seconds)
+    
+    with startup_phase("QApplication"):
+        app = QApplication(sys.argv)
+        app.setApplicationName("Keyboard Analytics")
+        app.setOrganizationName("TypeChron")
+        
+        # Set application style
+        app.setStyle('Fusion')
+        install_signal_wakeup(app)
+    
+    try:
+        with startup_phase("MainWindow"):
+            window = MainWindow()
+    except DirectoryLockedError as e:
+        # Another instance (or kvizd) is recording into the same log
+        LOG.error("❌ %s", e)
+        from PyQt6.QtWidgets import QMessageBox
+        QMessageBox.critical(None, "Keyboard Analytics", str(e))
+        sys.exit(1)
+    with startup_phase("show"):
+        window.show()
     
     sys.exit(app.exec())
 
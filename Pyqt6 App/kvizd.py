@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Headless keystroke analytics daemon.
+
+Records the same analytics and event log as the GUI without importing Qt.
+Key events come from the capture helper process, or from any stream of
+EVENT_RECORDs given with --source, and are fed to KeyboardAnalytics, which
+persists them in the usual files. Run kviz.py later from the same directory
+to view the results.
+
+With --ring NAME events are followed from a shared-memory ring (shmring.py)
+instead, such as the one the GUI's capture helper publishes with --ring.
+Following the GUI's ring needs a separate --log-dir and --file: only one
+process can record into a log directory, and a second one exits with an
+error rather than interleave its writes with the first. If no writer has created the ring yet, the
+capture helper is started to publish into it and to wake the daemon through
+a pipe; a ring written by another process is polled, slowly once typing
+stops, and followed again from its start when that process recreates it.
+
+Usage: kvizd.py [--source PATH | --ring NAME] [--file F] [--log-dir DIR] [--storage log|sqlite] [--save-interval S] [--stats-interval S]
+"""
+
+import os
+import sys
+import time
+import signal
+import select
+import argparse
+import subprocess
+from typing import Optional
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, EVENT_RECORD
+from analytics import STORAGE_BACKENDS, KeyboardAnalytics
+from persistence import DirectoryLockedError
+from applog import LOG, LEVELS_BY_NAME, install_dump_handlers
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class CaptureDaemon:
+    """Feeds captured key events into KeyboardAnalytics and saves periodically"""
+
+    def __init__(self, analytics: KeyboardAnalytics, source: Optional[str] = None,
+                 save_interval: float = 5.0, stats_interval: float = 0.0,
+                 ring: Optional[str] = None, poll_interval: float = 0.005,
+                 idle_poll_interval: float = 0.5, idle_after: float = 2.0):
+        self.analytics = analytics
+        self.source = source
+        self.ring = ring
+        # Polling another process's ring: fast while typing, slow after idle_after seconds without events
+        self.poll_interval = poll_interval
+        self.idle_poll_interval = idle_poll_interval
+        self.idle_after = idle_after
+        self.reader = None
+        self.save_interval = save_interval
+        self.stats_interval = stats_interval
+        self.process = None
+        self.events = 0
+        self._pending = b''
+
+    def open_source(self) -> int:
+        """Return a readable fd delivering EVENT_RECORDs"""
+        if self.source == '-':
+            return sys.stdin.fileno()
+        if self.source:
+            return os.open(self.source, os.O_RDONLY)
+
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture_helper.py")
+        self.process = subprocess.Popen([sys.executable, script_path], stdout=subprocess.PIPE, bufsize=0)
+        return self.process.stdout.fileno()
+
+    def open_ring(self, timeout: float = 5.0):
+        """Attach to the ring, starting the capture helper to create it if nobody has"""
+        from shmring import RingReader
+
+        try:
+            self.reader = RingReader(self.ring)
+            return
+        except FileNotFoundError:
+            pass
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture_helper.py")
+        self.process = subprocess.Popen([sys.executable, script_path, "--ring", self.ring, "--wake"],
+                                        stdout=subprocess.PIPE, bufsize=0)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.reader = RingReader(self.ring, from_start=True)
+                return
+            except FileNotFoundError:
+                if time.monotonic() >= deadline or self.process.poll() is not None:
+                    raise
+                time.sleep(0.05)
+
+    def feed(self, data: bytes):
+        """Record every complete event in data, keeping a torn tail for the next read"""
+        data = self._pending + data
+        usable = len(data) - len(data) % EVENT_RECORD.size
+        self._pending = data[usable:]
+        self.record(EVENT_RECORD.iter_unpack(memoryview(data)[:usable]))
+
+    def record(self, records):
+        """Record (event_type, code_id, timestamp) tuples"""
+        analytics = self.analytics
+        for event_type, code_id, timestamp in records:
+            if not code_id:
+                continue
+            if event_type == EVENT_PRESS:
+                analytics.record_key_press(code_id, timestamp)
+            elif event_type == EVENT_RELEASE:
+                analytics.record_key_release(code_id, timestamp)
+            self.events += 1
+
+    def print_stats(self):
+        print(f"events={self.events} total={self.analytics.total_keystrokes} "
+              f"kps={self.analytics.get_kps():.2f} max_rss={max_rss_mb():.1f}MB", file=sys.stderr)
+        if self.reader is not None:
+            stats = self.reader.stats()
+            print(f"ring lag={stats['lag']} overwritten={stats['overwritten']}", file=sys.stderr)
+
+    def run(self):
+        if self.ring:
+            self.run_ring()
+            return
+        fd = self.open_source()
+        now = time.monotonic()
+        next_save = now + self.save_interval
+        next_stats = now + self.stats_interval if self.stats_interval else float('inf')
+        try:
+            while True:
+                timeout = max(0.0, min(next_save, next_stats) - time.monotonic())
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if readable:
+                    data = os.read(fd, 65536)
+                    if not data:
+                        print("Event source closed", file=sys.stderr)
+                        break
+                    self.feed(data)
+
+                now = time.monotonic()
+                if now >= next_save:
+                    self.analytics.save()
+                    next_save = now + self.save_interval
+                if now >= next_stats:
+                    self.print_stats()
+                    next_stats = now + self.stats_interval
+        finally:
+            self.stop()
+
+    def run_ring(self):
+        """Follow the ring, sleeping on the helper's wakeup pipe when we started it and polling otherwise"""
+        self.open_ring()
+        wake_fd = self.process.stdout.fileno() if self.process else None
+        now = time.monotonic()
+        next_save = now + self.save_interval
+        next_stats = now + self.stats_interval if self.stats_interval else float('inf')
+        last_event = now
+        try:
+            while True:
+                records = self.reader.read()
+                if records:
+                    self.record(records)
+                    last_event = time.monotonic()
+
+                timeout = max(0.0, min(next_save, next_stats) - time.monotonic())
+                if wake_fd is not None:
+                    readable, _, _ = select.select([wake_fd], [], [], timeout)
+                    if readable and not os.read(wake_fd, 65536):
+                        print("Capture helper exited", file=sys.stderr)
+                        break
+                elif not records:
+                    idle = time.monotonic() - last_event >= self.idle_after
+                    if idle and self.reader.reattach():
+                        # The writer closed its ring and a new one was created under the name
+                        LOG.info("Ring %s was recreated by pid %d; following the new one", self.ring, self.reader.pid)
+                        continue
+                    time.sleep(min(timeout, self.idle_poll_interval if idle else self.poll_interval))
+
+                now = time.monotonic()
+                if now >= next_save:
+                    self.analytics.save()
+                    next_save = now + self.save_interval
+                if now >= next_stats:
+                    self.print_stats()
+                    next_stats = now + self.stats_interval
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+        self.analytics.save(compact=True)
+        self.analytics.close()
+        if self.stats_interval:
+            self.print_stats()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record keystroke analytics without the GUI")
+    sources = parser.add_mutually_exclusive_group()
+    sources.add_argument("--source", help="read EVENT_RECORDs from this file or pipe ('-' for stdin) "
+                                         "instead of starting the capture helper")
+    sources.add_argument("--ring", metavar="NAME", help="follow this shared-memory capture ring "
+                                                       "(starting the capture helper if nobody writes it)")
+    parser.add_argument("--file", default="key_analytics.json", help="aggregate snapshot (default: %(default)s)")
+    parser.add_argument("--log-dir", default="key_events", help="event log directory (default: %(default)s)")
+    parser.add_argument("--storage", choices=STORAGE_BACKENDS, default="log",
+                        help="keep events in segment files or in a SQLite database (default: %(default)s)")
+    parser.add_argument("--save-interval", type=float, default=5.0, help="seconds between log flushes")
+    parser.add_argument("--stats-interval", type=float, default=0.0,
+                        help="print event count, KPS and peak RSS every N seconds to stderr")
+    parser.add_argument("--log-level", choices=sorted(LEVELS_BY_NAME), default="info",
+                        help="lowest level kept in the in-memory log (SIGUSR1 dumps it)")
+    args = parser.parse_args()
+    LOG.set_level(args.log_level)
+    install_dump_handlers()
+
+    # Exit through run()'s finally block so pending events are saved
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        analytics = KeyboardAnalytics(args.file, args.log_dir, storage=args.storage)
+    except DirectoryLockedError as e:
+        print(f"kvizd: {e}", file=sys.stderr)
+        sys.exit(1)
+    daemon = CaptureDaemon(analytics, args.source, args.save_interval, args.stats_interval, args.ring)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+End-to-end keystroke latency instrumentation.
+
+A key press gets an origin timestamp where it enters the app (the capture
+helper's clock for global capture, Qt event delivery for in-window typing).
+Each later stage marks the press and records now - origin into that stage's
+histogram, once per press, so every stage reads as "time since the key went
+down". Instrumentation is off unless LATENCY.enabled is set; callers check
+the flag before calling in, so the disabled cost is one attribute lookup.
+
+Histograms are HDR-style: each power-of-two range of microseconds is split
+into equal sub-buckets, so percentiles are within 1/16 of the true value at
+any magnitude while memory stays a few hundred counters per stage.
+"""
+
+import json
+import math
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Stages in pipeline order
+STAGE_PIPE_READ = "pipe read"
+STAGE_SIGNAL = "signal delivery"
+STAGE_RECORD = "record_key_press"
+STAGE_UPDATE = "widget update()"
+STAGE_OVERLAY_PAINT = "overlay paint"
+STAGE_KEYBOARD_PAINT = "keyboard paint"
+STAGES = (STAGE_PIPE_READ, STAGE_SIGNAL, STAGE_RECORD, STAGE_UPDATE, STAGE_OVERLAY_PAINT, STAGE_KEYBOARD_PAINT)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in microseconds"""
+
+    __slots__ = ('sub_bucket_bits', 'half_count', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, sub_bucket_bits: int = 5):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.half_count = 1 << (sub_bucket_bits - 1)
+        self.counts: List[int] = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def bucket_index(self, value: int) -> int:
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value
+        return shift * self.half_count + (value >> shift)
+
+    def bucket_range(self, index: int) -> Tuple[int, int]:
+        """Lowest and highest value that land in a bucket"""
+        if index < 2 * self.half_count:
+            return index, index
+        shift = index // self.half_count - 1
+        mantissa = index - shift * self.half_count
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value_us: float):
+        value = max(0, int(value_us))
+        index = self.bucket_index(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> int:
+        """Highest value equivalent to the given percentile (0-1)"""
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self.bucket_range(index)[1], self.max)
+        return self.max
+
+    def percentiles(self, fractions: Sequence[float]) -> List[int]:
+        """percentile() for several ascending fractions in a single pass over the buckets"""
+        if not self.count:
+            return [0] * len(fractions)
+        targets = [max(1, math.ceil(fraction * self.count)) for fraction in fractions]
+        values = []
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            while len(values) < len(targets) and seen >= targets[len(values)]:
+                values.append(min(self.bucket_range(index)[1], self.max))
+            if len(values) == len(targets):
+                break
+        return values + [self.max] * (len(targets) - len(values))
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def merge(self, other: 'LatencyHistogram'):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, bucket_count in enumerate(other.counts):
+            self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def clear(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def to_state(self) -> Dict:
+        """Exact state for persistence: non-empty buckets as [index, count] pairs"""
+        return {
+            "bits": self.sub_bucket_bits,
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "buckets": [[index, count] for index, count in enumerate(self.counts) if count],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'LatencyHistogram':
+        histogram = cls(state.get("bits", 5))
+        buckets = state["buckets"]
+        if buckets:
+            histogram.counts = [0] * (buckets[-1][0] + 1)
+            for index, count in buckets:
+                histogram.counts[index] = count
+        histogram.count = state["count"]
+        histogram.total = state["total"]
+        histogram.max = state["max"]
+        return histogram
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "mean_us": round(self.mean(), 1),
+            "p50_us": self.percentile(0.5),
+            "p90_us": self.percentile(0.9),
+            "p99_us": self.percentile(0.99),
+            "p999_us": self.percentile(0.999),
+            "max_us": self.max,
+            # [highest value in bucket, count] for every non-empty bucket
+            "buckets": [[self.bucket_range(i)[1], c] for i, c in enumerate(self.counts) if c],
+        }
+
+
+class LatencyTracker:
+    """Per-stage latency histograms for key presses"""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self.origins: Dict[int, float] = {}     # Code id -> origin of its latest press (ms since epoch)
+        self.marked: Dict[int, set] = {}        # Code id -> stages already recorded for that press
+
+    def begin(self, code_id: int, origin_ms: Optional[float] = None):
+        """Start timing a press; origin_ms defaults to now"""
+        self.origins[code_id] = time.time() * 1000 if origin_ms is None else origin_ms
+        self.marked[code_id] = set()
+
+    def mark(self, stage: str, code_id: int):
+        """Record the time since the press began, once per stage and press"""
+        origin = self.origins.get(code_id)
+        if origin is None:
+            return
+        marked = self.marked[code_id]
+        if stage in marked:
+            return
+        marked.add(stage)
+        self.histograms[stage].record((time.time() * 1000 - origin) * 1000)
+
+    def summary(self) -> List[Tuple[str, int, int, int, int]]:
+        """(stage, count, p50, p99, max) in microseconds for each stage"""
+        return [(stage, h.count, h.percentile(0.5), h.percentile(0.99), h.max)
+                for stage, h in self.histograms.items()]
+
+    def export(self, path: str):
+        data = {"unit": "us", "stages": {stage: h.to_dict() for stage, h in self.histograms.items()}}
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=4)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.clear()
+        self.origins.clear()
+        self.marked.clear()
+
+
+LATENCY = LatencyTracker()
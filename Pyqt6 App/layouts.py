@@ -0,0 +1,109 @@
+"""
+Keyboard layout definitions loaded from data files.
+
+Each layout lives in layouts/<name>.json as a list of key objects using
+KLE-style property names (x, y, w, h, r) in absolute pixels. The first load
+of a layout compiles it to a marshal cache under layouts/__pycache__, keyed
+by the source file's mtime and size like a .pyc, so later runs skip JSON
+parsing. Within a process every layout is loaded at most once and the same
+tuple of KeyDefs is shared by every widget that shows it.
+"""
+
+import os
+import json
+import marshal
+from typing import Dict, List, Optional, Tuple
+
+from applog import LOG
+
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "layouts")
+CACHE_DIR = os.path.join(LAYOUT_DIR, "__pycache__")
+CACHE_MAGIC = b"KVZL1"
+
+
+class KeyDef:
+    """Key definition matching the HTML structure"""
+
+    __slots__ = ('row', 'col', 'x', 'y', 'width', 'height', 'label', 'code', 'key',
+                 'rotation', 'is_special', 'is_knob', 'space_side')
+
+    def __init__(self, row: int, col: int, x: float, y: float, width: float, height: float,
+                 label: str, code: str, key: str, rotation: float = 0.0,
+                 is_special: bool = False, is_knob: bool = False, space_side: Optional[str] = None):
+        self.row = row
+        self.col = col
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.label = label
+        self.code = code
+        self.key = key
+        self.rotation = rotation
+        self.is_special = is_special
+        self.is_knob = is_knob
+        self.space_side = space_side
+
+    def __repr__(self):
+        return f"KeyDef({self.code!r}, x={self.x}, y={self.y}, w={self.width}, h={self.height})"
+
+
+Layout = Tuple[KeyDef, ...]
+
+_loaded: Dict[str, Layout] = {}
+
+
+def layout_path(name: str) -> str:
+    return os.path.join(LAYOUT_DIR, f"{name}.json")
+
+
+def layout_exists(name: str) -> bool:
+    return name in _loaded or os.path.exists(layout_path(name))
+
+
+def load_layout(name: str) -> Layout:
+    """Return the keys of a layout, parsing it at most once per process"""
+    layout = _loaded.get(name)
+    if layout is None:
+        layout = _loaded[name] = tuple(KeyDef(*fields) for fields in _load_fields(name))
+    return layout
+
+
+def _load_fields(name: str) -> List[tuple]:
+    """KeyDef constructor arguments for every key, from the compiled cache when fresh"""
+    path = layout_path(name)
+    stat = os.stat(path)
+    cache_path = os.path.join(CACHE_DIR, f"{name}.layout")
+
+    try:
+        with open(cache_path, 'rb') as f:
+            magic, mtime_ns, size, fields = marshal.load(f)
+        if magic == CACHE_MAGIC and mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+            return fields
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    with open(path, 'r', encoding='utf-8') as f:
+        fields = [_key_fields(key) for key in json.load(f)["keys"]]
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump((CACHE_MAGIC, stat.st_mtime_ns, stat.st_size, fields), f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # A read-only install still works, it just parses the JSON every run
+        LOG.warning("Error writing layout cache for %s: %s", name, e)
+    return fields
+
+
+def _key_fields(key: dict) -> tuple:
+    return (
+        key.get("row", 0), key.get("col", 0),
+        key["x"], key["y"], key.get("w", 52), key.get("h", 54),
+        key["label"], key["code"], key.get("key", key["code"]),
+        key.get("r", 0.0), key.get("special", False), key.get("knob", False),
+        key.get("space_side"),
+    )
@@ -0,0 +1,111 @@
+"""
+Write-behind persistence helpers.
+
+The GUI thread only snapshots state and hands it to a BackgroundWriter; the
+writer thread serializes and writes it. Files are replaced atomically, so a
+crash mid-save leaves either the old or the new file, never a torn one.
+"""
+
+import os
+import queue
+import threading
+from typing import Optional
+
+from applog import LOG
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: directories are not locked
+
+LOCK_NAME = "lock"
+
+
+class DirectoryLockedError(RuntimeError):
+    """Another process is already writing to the directory"""
+
+
+def write_file_atomic(path: str, data: bytes):
+    """Write data to path via temp file + fsync + rename"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def lock_directory(directory: str) -> Optional[int]:
+    """Take an exclusive lock on directory, held until the returned fd is closed
+    
+    Positions saved next to a log are byte offsets this process tracks in
+    memory, so two processes appending to one log would corrupt each other's
+    side files. Raises DirectoryLockedError if another process holds the
+    lock. Returns None where flock is not available.
+    """
+    if fcntl is None:
+        return None
+    fd = os.open(os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        owner = os.read(fd, 32).decode(errors="replace").strip() or "unknown"
+        os.close(fd)
+        raise DirectoryLockedError(f"{directory} is in use by another process (pid {owner}); "
+                                   f"give each process its own log directory") from None
+    # Only informational: the lock is what counts
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    return fd
+
+
+class BackgroundWriter:
+    """Single worker thread that runs write jobs in submission order"""
+
+    def __init__(self, name: str = "analytics-writer", max_jobs: int = 0):
+        """max_jobs bounds the queue (0 = unbounded); check full() before submitting to never block"""
+        self._queue = queue.Queue(max_jobs)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) to run on the writer thread"""
+        self._queue.put((fn, args))
+
+    def full(self) -> bool:
+        """Whether submit() would have to wait for the writer to catch up"""
+        return self._queue.full()
+
+    def drain(self):
+        """Block until every queued job has run"""
+        self._queue.join()
+
+    def close(self):
+        """Run the remaining jobs and stop the thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                fn, args = job
+                fn(*args)
+            except Exception as e:
+                LOG.error("Error in background write: %s", e)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,113 @@
+"""
+Incrementally maintained key frequency ranking.
+
+Key ids are kept in an array ordered by count (highest first), with the start
+index of every run of equal counts. A unit increment swaps the key with the
+first key of its run and shifts the run boundary, so each keystroke costs
+O(1) and top-N queries or full sorted dumps never need a sort.
+"""
+
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from keycodes import REGISTRY, KeyCounter
+
+
+class KeyRanking(KeyCounter):
+    """KeyCounter that also keeps its keys ordered by count"""
+
+    __slots__ = ('order', 'position', 'block_start', 'watch', 'top_generation', 'listeners')
+
+    def __init__(self, watch: int = 5):
+        super().__init__()
+        self.order: List[int] = []             # Key ids, highest count first
+        self.position: Dict[int, int] = {}     # Key id -> index in order
+        self.block_start: Dict[int, int] = {}  # Count -> first index with that count
+        self.watch = watch                     # Size of the top-N that triggers notifications
+        self.top_generation = 0
+        self.listeners: List[Callable[[], None]] = []
+
+    def subscribe(self, callback: Callable[[], None]):
+        """Call callback whenever the counts or order of the top `watch` keys change"""
+        self.listeners.append(callback)
+
+    def _notify(self):
+        self.top_generation += 1
+        for callback in self.listeners:
+            callback()
+
+    def add(self, code_id: int, amount: int = 1) -> int:
+        if amount != 1:
+            # Bulk adjustments are rare (loading); re-sort instead of stepping
+            count = super().add(code_id, amount)
+            self._rebuild()
+            return count
+
+        counts = self.counts
+        if code_id >= len(counts):
+            counts.extend([0] * (code_id + 1 - len(counts)))
+        count = counts[code_id]
+        order = self.order
+        position = self.position
+        block_start = self.block_start
+
+        if count == 0:
+            # First press: enter at the tail as a run of zero
+            position[code_id] = len(order)
+            order.append(code_id)
+            block_start.setdefault(0, position[code_id])
+
+        # Swap to the front of the current run, then move the run boundary past it
+        index = position[code_id]
+        first = block_start[count]
+        if index != first:
+            other = order[first]
+            order[first] = code_id
+            order[index] = other
+            position[code_id] = first
+            position[other] = index
+        if first + 1 < len(order) and counts[order[first + 1]] == count:
+            block_start[count] = first + 1
+        else:
+            del block_start[count]
+        if count + 1 not in block_start:
+            block_start[count + 1] = first
+
+        counts[code_id] = count + 1
+        if first < self.watch:
+            self._notify()
+        return count + 1
+
+    def _rebuild(self):
+        """Re-sort from scratch after a bulk change"""
+        counts = self.counts
+        self.order = sorted((code_id for code_id, count in enumerate(counts) if count),
+                            key=lambda code_id: counts[code_id], reverse=True)
+        self.position = {code_id: index for index, code_id in enumerate(self.order)}
+        self.block_start = {}
+        for index, code_id in enumerate(self.order):
+            self.block_start.setdefault(counts[code_id], index)
+        self._notify()
+
+    def update_from_dict(self, counts: Dict[str, int]):
+        for code, count in counts.items():
+            KeyCounter.add(self, REGISTRY.intern(code), count)
+        self._rebuild()
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        """Return [(code_id, count)] for the n most pressed keys"""
+        counts = self.counts
+        return [(code_id, counts[code_id]) for code_id in self.order[:n]]
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        """Yield (code, count) for every pressed key, highest count first"""
+        counts = self.counts
+        codes = REGISTRY.codes
+        for code_id in self.order:
+            yield codes[code_id], counts[code_id]
+
+    def clear(self):
+        super().clear()
+        self.order = []
+        self.position = {}
+        self.block_start = {}
+        self._notify()
@@ -0,0 +1,109 @@
+"""
+Streaming keystroke rate engine.
+
+Each window keeps a ring of fixed-width time buckets plus a running total,
+so recording a keystroke and querying a window are both amortized O(1) and
+the answer does not depend on how many keys were pressed in the window.
+Counts are exact to within one bucket width (window / buckets).
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+CHARS_PER_WORD = 5  # Standard WPM definition
+
+
+class SlidingWindowCounter:
+    """Event count over the last window_ms milliseconds"""
+
+    __slots__ = ('window_ms', 'bucket_ms', 'counts', 'head', 'total')
+
+    def __init__(self, window_ms: float, buckets: int = 20):
+        self.window_ms = window_ms
+        self.bucket_ms = window_ms / buckets
+        self.counts: List[int] = [0] * buckets
+        self.head = 0  # Absolute index of the newest bucket
+        self.total = 0
+
+    def _advance(self, now: float):
+        """Expire every bucket that has slid out of the window"""
+        bucket = int(now // self.bucket_ms)
+        steps = bucket - self.head
+        if steps <= 0:
+            return
+        counts = self.counts
+        size = len(counts)
+        if steps >= size:
+            counts[:] = [0] * size
+            self.total = 0
+        else:
+            for i in range(self.head + 1, bucket + 1):
+                index = i % size
+                self.total -= counts[index]
+                counts[index] = 0
+        self.head = bucket
+
+    def add(self, timestamp: float, amount: int = 1):
+        self._advance(timestamp)
+        bucket = int(timestamp // self.bucket_ms)
+        # Late events still count as long as their bucket is in the window
+        if bucket > self.head - len(self.counts):
+            self.counts[bucket % len(self.counts)] += amount
+            self.total += amount
+
+    def count(self, now: float) -> int:
+        self._advance(now)
+        return self.total
+
+    def clear(self):
+        self.counts = [0] * len(self.counts)
+        self.total = 0
+
+
+class RateEngine:
+    """Keystroke counts and rates over several sliding windows and the session"""
+
+    def __init__(self, windows_ms: Iterable[float] = (1000, 10000, 60000), buckets: int = 20):
+        self.windows: Dict[float, SlidingWindowCounter] = {
+            window_ms: SlidingWindowCounter(window_ms, buckets) for window_ms in windows_ms
+        }
+        self.session_start: Optional[float] = None
+        self.session_count = 0
+
+    def record(self, timestamp: float):
+        """Record one keystroke at timestamp (ms)"""
+        if self.session_start is None:
+            self.session_start = timestamp
+        self.session_count += 1
+        for counter in self.windows.values():
+            counter.add(timestamp)
+
+    def count(self, window_ms: Optional[float] = None, now: Optional[float] = None) -> int:
+        """Keystrokes in a window, or in the whole session when window_ms is None"""
+        if window_ms is None:
+            return self.session_count
+        if now is None:
+            now = time.time() * 1000
+        return self.windows[window_ms].count(now)
+
+    def kps(self, window_ms: Optional[float] = 1000, now: Optional[float] = None) -> float:
+        """Keys per second over a window, or over the session when window_ms is None"""
+        if now is None:
+            now = time.time() * 1000
+        if window_ms is None:
+            if self.session_start is None:
+                return 0.0
+            elapsed = max(now - self.session_start, 1000)
+            return self.session_count / (elapsed / 1000)
+        return self.count(window_ms, now) / (window_ms / 1000)
+
+    def wpm(self, window_ms: Optional[float] = 10000, now: Optional[float] = None) -> float:
+        """Words per minute over a window, or over the session when window_ms is None"""
+        return self.kps(window_ms, now) * 60 / CHARS_PER_WORD
+
+    def reset(self):
+        for counter in self.windows.values():
+            counter.clear()
+        self.session_start = None
+        self.session_count = 0
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Offscreen replay harness.
+
+Drives a real MainWindow with a keystroke trace under QT_QPA_PLATFORM=offscreen
+and reports throughput, late and dropped events and the GUI-thread cost per
+event, so performance regressions can be caught on a headless Linux box.
+
+Events are delivered through one of two paths:
+- keyboard: KeyboardWidget.handle_key_press/release, which also feeds
+  MainWindow.on_key_press/release (the in-window typing path)
+- global:   MainWindow.on_global_key_press/release with the mini overlay
+  enabled (the global capture path)
+
+With --speed N the trace plays at N times real time and events delivered
+more than --late-ms after they were due count as late. --speed 0 floods
+the window as fast as it can take them, in batches of --batch events.
+
+--drop-releases N removes the last release of N letter keys from the trace,
+to check that the stuck key report catches them: the run then passes only
+if exactly N keys are left pressed.
+
+Usage: replay.py [--trace FILE | tracegen options] [--path keyboard|global] [--speed N]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from typing import List
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, id_to_code
+from latency import LATENCY
+from tracegen import Event, add_trace_arguments, read_trace, trace_from_arguments
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def drop_releases(events: List[Event], count: int) -> List[Event]:
+    """The trace without the final release of count different letter keys
+
+    Letters are on every layout, the mini overlay's included, so each
+    dropped release leaves a key shown as pressed on either path.
+    """
+    dropped = set()
+    keep = [True] * len(events)
+    for index in range(len(events) - 1, -1, -1):
+        if len(dropped) >= count:
+            break
+        event_type, code_id, _ = events[index]
+        code = id_to_code(code_id) or ''
+        # Walking backwards, the first release seen of a key is its last one
+        if event_type == EVENT_RELEASE and code.startswith('Key') and code_id not in dropped:
+            dropped.add(code_id)
+            keep[index] = False
+    return [event for event, kept in zip(events, keep) if kept]
+
+
+class Replay:
+    """Feeds a trace into a MainWindow and collects timing"""
+
+    def __init__(self, app: QApplication, window, path: str = "keyboard"):
+        self.app = app
+        self.window = window
+        self.path = path
+        self.dispatch_ns: List[int] = []
+        self.lateness_ms: List[float] = []
+        self.event_loop_seconds = 0.0
+        self.presses = 0
+        self.realtime = False
+
+        if path == "global":
+            window.overlay_enabled = True
+            window.setup_global_capture()
+            window.mini_overlay.show()
+            self.press = window.on_global_key_press
+            self.release = window.on_global_key_release
+        else:
+            self.press = window.keyboard_widget.handle_key_press
+            self.release = window.keyboard_widget.handle_key_release
+
+    def deliver(self, event: Event, timestamp: float):
+        event_type, code_id, _ = event
+        if event_type == EVENT_PRESS and LATENCY.enabled:
+            # In real time the trace schedule plays the role of the capture timestamp
+            LATENCY.begin(code_id, timestamp if self.realtime else None)
+        start = time.perf_counter_ns()
+        if event_type == EVENT_PRESS:
+            if self.path == "global":
+                self.press(code_id, timestamp)
+            else:
+                self.press(code_id)
+            self.presses += 1
+        elif event_type == EVENT_RELEASE:
+            if self.path == "global":
+                self.release(code_id, timestamp)
+            else:
+                self.release(code_id)
+        self.dispatch_ns.append(time.perf_counter_ns() - start)
+
+    def process_events(self):
+        start = time.perf_counter()
+        self.app.processEvents()
+        self.event_loop_seconds += time.perf_counter() - start
+
+    def run(self, events: List[Event], speed: float, batch: int) -> float:
+        """Deliver every event and return the wall time taken"""
+        epoch_ms = time.time() * 1000
+        trace_start = events[0][2] if events else 0.0
+        wall_start = time.perf_counter()
+        self.realtime = speed > 0
+
+        if speed <= 0:
+            for index, event in enumerate(events):
+                self.deliver(event, epoch_ms + (event[2] - trace_start))
+                if index % batch == batch - 1:
+                    self.process_events()
+        else:
+            index = 0
+            while index < len(events):
+                elapsed_ms = (time.perf_counter() - wall_start) * 1000
+                # Everything that has come due is delivered as one batch, like the capture helper
+                while index < len(events):
+                    due_ms = (events[index][2] - trace_start) / speed
+                    if due_ms > elapsed_ms:
+                        break
+                    self.lateness_ms.append((time.perf_counter() - wall_start) * 1000 - due_ms)
+                    self.deliver(events[index], epoch_ms + due_ms)
+                    index += 1
+                self.process_events()
+                if index < len(events):
+                    wait_ms = (events[index][2] - trace_start) / speed - (time.perf_counter() - wall_start) * 1000
+                    if wait_ms > 0:
+                        time.sleep(min(wait_ms, 1.0) / 1000)
+
+        wall = time.perf_counter() - wall_start
+        # Let pending refreshes and saves run before the state is inspected
+        self.process_events()
+        return wall
+
+    def stuck_keys(self) -> int:
+        if self.path == "global":
+            return len(self.window.mini_overlay.pressed_keys)
+        return len(self.window.keyboard_widget.pressed_keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a keystroke trace into the GUI offscreen")
+    parser.add_argument("--trace", help="EVENT_RECORD trace file (default: generate one)")
+    add_trace_arguments(parser)
+    parser.add_argument("--path", choices=("keyboard", "global"), default="keyboard",
+                        help="event delivery path (default: %(default)s)")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="playback speed, 1 = real time, 0 = as fast as possible (default: %(default)s)")
+    parser.add_argument("--batch", type=int, default=64, help="events per event-loop turn when flooding")
+    parser.add_argument("--late-ms", type=float, default=16.0, help="lateness that counts as late (default: one frame)")
+    parser.add_argument("--data-dir", help="directory for analytics files (default: a temporary directory)")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own output")
+    parser.add_argument("--drop-releases", type=int, default=0, metavar="N",
+                        help="drop the last release of N letter keys and expect N stuck keys")
+    parser.add_argument("--latency", action="store_true", help="report per-stage press latency")
+    parser.add_argument("--latency-export", help="write the latency histograms to this JSON file")
+    args = parser.parse_args()
+
+    events = read_trace(os.path.abspath(args.trace)) if args.trace else trace_from_arguments(args)
+    if args.drop_releases:
+        events = drop_releases(events, args.drop_releases)
+    latency_export = os.path.abspath(args.latency_export) if args.latency_export else None
+    LATENCY.enabled = args.latency or latency_export is not None
+
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix="kviz-replay-"))
+        os.chdir(data_dir)
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(open(os.devnull, 'w')))
+
+        app = QApplication(sys.argv[:1])
+        import kviz
+        window = kviz.MainWindow()
+        window.show()
+        app.processEvents()
+
+        replay = Replay(app, window, args.path)
+        recorded_before = window.analytics.total_keystrokes
+        wall = replay.run(events, args.speed, max(1, args.batch))
+        recorded = window.analytics.total_keystrokes - recorded_before
+        stuck = replay.stuck_keys()
+        refreshes = window.refresh_scheduler.refresh_count
+        cache = kviz.KEYCAP_CACHE.stats()
+
+        window.analytics.save(compact=True)
+        window.analytics.close()
+
+    dispatch_us = sorted(ns / 1000 for ns in replay.dispatch_ns)
+    lateness = sorted(replay.lateness_ms)
+    late = sum(1 for value in lateness if value > args.late_ms)
+    count = max(1, len(events))
+    mode = "flood" if args.speed <= 0 else f"x{args.speed:g}"
+
+    print(f"events:             {len(events)} ({replay.presses} presses), path={args.path}, mode={mode}")
+    print(f"wall time:          {wall:.3f}s, throughput {len(events) / wall if wall else 0:.0f} events/s")
+    print(f"dispatch us/event:  mean {sum(dispatch_us) / count:.1f}  p50 {percentile(dispatch_us, 0.5):.1f}  "
+          f"p99 {percentile(dispatch_us, 0.99):.1f}  max {percentile(dispatch_us, 1.0):.1f}")
+    print(f"event loop us/event: {replay.event_loop_seconds / count * 1e6:.1f} (paints, timers, refreshes)")
+    if lateness:
+        print(f"lateness ms:        p50 {percentile(lateness, 0.5):.2f}  p99 {percentile(lateness, 0.99):.2f}  "
+              f"max {lateness[-1]:.2f}  late(>{args.late_ms:g}ms) {late} ({late / count:.2%})")
+    print(f"dropped presses:    {replay.presses - recorded}")
+    print(f"stuck keys:         {stuck}" + (f" (expected {args.drop_releases})" if args.drop_releases else ""))
+    print(f"ui refreshes:       {refreshes}")
+    print(f"keycap cache:       {cache['hits']} hits, {cache['misses']} misses")
+    if LATENCY.enabled:
+        print(f"{'latency stage':<20}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for stage, stage_count, p50, p99, max_us in LATENCY.summary():
+            if stage_count:
+                print(f"{stage:<20}{stage_count:>8}{p50 / 1000:>10.2f}{p99 / 1000:>10.2f}{max_us / 1000:>10.2f}")
+        if latency_export:
+            LATENCY.export(latency_export)
+            print(f"latency histograms written to {latency_export}")
+
+    sys.exit(1 if replay.presses != recorded or stuck != args.drop_releases else 0)
+
+
+if __name__ == "__main__":
+    main()
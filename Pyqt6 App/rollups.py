@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Time-bucketed keystroke rollups with retention.
+
+Every press lands in a per-minute bucket holding the keystroke count and,
+per key, [presses, dwell ms sum, dwell samples]. Minute buckets of the day
+being typed are kept in memory and in current.json, together with the event
+log position they cover. When a day is over it is closed:
+- its minute buckets are written to minute/YYYY-MM-DD.json
+- they are rolled up into hour buckets in hour/YYYY-MM.json
+- and into one day bucket in day/YYYY.json
+Closing replaces that day's buckets in each file, so redoing it after a
+crash is harmless. Each resolution keeps its files for its own retention
+(minutes for a week, hours for a quarter and days forever by default), and
+a range query only opens the files of the periods it overlaps.
+
+Days, hours and file names follow local time, so "last Tuesday" means the
+user's Tuesday.
+
+Usage: rollups.py [--log-dir DIR] [--days N]
+"""
+
+import os
+import json
+import time
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from keycodes import id_to_code
+from persistence import write_file_atomic
+from applog import LOG
+
+
+MINUTE_MS = 60 * 1000
+MINUTE, HOUR, DAY = "minute", "hour", "day"
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+CURRENT_NAME = "current.json"
+
+# A bucket is {"t": start ms, "n": presses, "keys": {code: [presses, dwell ms sum, dwell samples]}}
+Bucket = Dict
+
+
+def new_bucket(start_ms: float) -> Bucket:
+    return {"t": start_ms, "n": 0, "keys": {}}
+
+
+def add_bucket(total: Bucket, bucket: Bucket):
+    """Add bucket's counts into total"""
+    total["n"] += bucket["n"]
+    keys = total["keys"]
+    for code, (presses, dwell_sum, dwell_count) in bucket["keys"].items():
+        stats = keys.get(code)
+        if stats is None:
+            keys[code] = [presses, dwell_sum, dwell_count]
+        else:
+            stats[0] += presses
+            stats[1] += dwell_sum
+            stats[2] += dwell_count
+
+
+def copy_bucket(bucket: Bucket) -> Bucket:
+    return {"t": bucket["t"], "n": bucket["n"], "keys": {code: list(stats) for code, stats in bucket["keys"].items()}}
+
+
+def local_day(timestamp_ms: float) -> date:
+    return datetime.fromtimestamp(timestamp_ms / 1000).date()
+
+
+def day_start_ms(day: date) -> float:
+    return datetime(day.year, day.month, day.day).timestamp() * 1000
+
+
+def hour_start_ms(timestamp_ms: float) -> float:
+    moment = datetime.fromtimestamp(timestamp_ms / 1000)
+    return moment.replace(minute=0, second=0, microsecond=0).timestamp() * 1000
+
+
+def partition_name(resolution: str, day: date) -> str:
+    """File holding resolution's buckets for day: one per day, month or year"""
+    if resolution == MINUTE:
+        return f"{day:%Y-%m-%d}.json"
+    if resolution == HOUR:
+        return f"{day:%Y-%m}.json"
+    return f"{day:%Y}.json"
+
+
+def partition_start(resolution: str, name: str) -> date:
+    stem = name[:-len(".json")]
+    if resolution == MINUTE:
+        return datetime.strptime(stem, "%Y-%m-%d").date()
+    if resolution == HOUR:
+        return datetime.strptime(stem, "%Y-%m").date()
+    return date(int(stem), 1, 1)
+
+
+def partition_end(resolution: str, start: date) -> date:
+    """First day after the partition starting at start"""
+    if resolution == MINUTE:
+        return start + timedelta(days=1)
+    if resolution == HOUR:
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+
+class RollupStore:
+    """Minute, hour and day keystroke buckets with retention and range queries"""
+
+    def __init__(self, directory: str, minute_retention_days: Optional[float] = 7,
+                 hour_retention_days: Optional[float] = 92, day_retention_days: Optional[float] = None):
+        self.directory = directory
+        # None keeps a resolution forever. Minutes are always kept for the open day.
+        self.retention_days = {MINUTE: minute_retention_days, HOUR: hour_retention_days, DAY: day_retention_days}
+        for resolution in RESOLUTIONS:
+            os.makedirs(os.path.join(directory, resolution), exist_ok=True)
+        self.clear()
+
+    def clear(self):
+        self.minutes: Dict[float, Bucket] = {}  # Minute start -> bucket, for days not yet closed
+        self.bucket: Optional[Bucket] = None      # Bucket of the latest press
+        self.bucket_end = 0.0
+        # Buckets starting before this are no longer written to and are shared with the writer as is
+        self.frozen_before = 0.0
+        self.down: Dict[int, Tuple[float, Bucket]] = {}  # Code id -> (press time, bucket) of keys held now
+        # Days before this are in the partition files (set by the writer thread)
+        self.closed_before = 0.0
+        self.wipe = False  # Delete every partition file on the next write
+
+    def reset(self):
+        """Forget all typing, including the saved rollups"""
+        self.clear()
+        self.wipe = True
+
+    def press(self, code_id: int, timestamp: float):
+        bucket = self.bucket
+        if bucket is None or not bucket["t"] <= timestamp < self.bucket_end:
+            if timestamp < self.closed_before:
+                return  # The clock went back into a day already closed
+            start = timestamp // MINUTE_MS * MINUTE_MS
+            bucket = self.minutes.get(start)
+            if bucket is None:
+                bucket = self.minutes[start] = new_bucket(start)
+            elif start < self.frozen_before:
+                # The writer may hold the frozen bucket; change a copy
+                bucket = self.minutes[start] = copy_bucket(bucket)
+            self.bucket = bucket
+            self.bucket_end = start + MINUTE_MS
+            # Older minutes only still change through late releases, which are dropped
+            self.frozen_before = max(self.frozen_before, start - MINUTE_MS)
+
+        bucket["n"] += 1
+        code = id_to_code(code_id)
+        stats = bucket["keys"].get(code)
+        if stats is None:
+            bucket["keys"][code] = [1, 0.0, 0]
+        else:
+            stats[0] += 1
+        self.down[code_id] = (timestamp, bucket)
+
+    def release(self, code_id: int, timestamp: float):
+        down = self.down.pop(code_id, None)
+        if down is None:
+            return
+        press_time, bucket = down
+        if bucket["t"] >= self.frozen_before and timestamp >= press_time:
+            # Dwell is filed with the press
+            stats = bucket["keys"][id_to_code(code_id)]
+            stats[1] += timestamp - press_time
+            stats[2] += 1
+
+    def snapshot(self) -> Dict:
+        """State for the writer thread: frozen buckets are shared, the rest copied"""
+        closed_before = self.closed_before
+        for start in [start for start in self.minutes if start < closed_before]:
+            del self.minutes[start]
+
+        frozen_before = self.frozen_before
+        buckets = [bucket if start < frozen_before else copy_bucket(bucket)
+                   for start, bucket in self.minutes.items()]
+        wipe, self.wipe = self.wipe, False
+        return {"buckets": buckets, "frozen_before": frozen_before, "wipe": wipe}
+
+    def load(self) -> Tuple[int, int]:
+        """Load the open days from current.json and return the log position they cover"""
+        path = os.path.join(self.directory, CURRENT_NAME)
+        if not os.path.exists(path):
+            return 0, 0
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            LOG.error("Error loading rollups: %s", e)
+            return 0, 0
+        self.minutes = {bucket["t"]: bucket for bucket in data["buckets"]}
+        self.frozen_before = data.get("frozen_before", 0.0)
+        self.closed_before = data.get("closed_before", 0.0)
+        return data["segment"], data["offset"]
+
+    def write(self, snapshot: Dict, position: Optional[Tuple[int, int]] = None):
+        """Close finished days, apply retention and save the open days (writer thread)
+
+        Without a position only finished days are written, which is how a
+        first-time backfill keeps memory bounded.
+        """
+        if snapshot["wipe"]:
+            self.wipe_partitions()
+
+        # A day is finished once every one of its minutes is frozen
+        days: Dict[date, List[Bucket]] = {}
+        for bucket in snapshot["buckets"]:
+            days.setdefault(local_day(bucket["t"]), []).append(bucket)
+        open_buckets = []
+        closed_before = self.closed_before
+        today = local_day(time.time() * 1000)
+        for day, buckets in sorted(days.items()):
+            end = day_start_ms(day + timedelta(days=1))
+            if end <= snapshot["frozen_before"]:
+                self.close_day(day, buckets, today)
+                closed_before = max(closed_before, end)
+            else:
+                open_buckets.extend(buckets)
+        self.closed_before = closed_before
+        self.apply_retention(today)
+
+        if position is not None:
+            segment, offset = position
+            data = {"segment": segment, "offset": offset, "frozen_before": snapshot["frozen_before"],
+                    "closed_before": closed_before, "buckets": open_buckets}
+            write_file_atomic(os.path.join(self.directory, CURRENT_NAME), json.dumps(data).encode())
+
+    def close_day(self, day: date, buckets: List[Bucket], today: date):
+        hours: Dict[float, Bucket] = {}
+        total = new_bucket(day_start_ms(day))
+        for bucket in buckets:
+            start = hour_start_ms(bucket["t"])
+            hour = hours.get(start)
+            if hour is None:
+                hour = hours[start] = new_bucket(start)
+            add_bucket(hour, bucket)
+            add_bucket(total, bucket)
+
+        if not self.expired(MINUTE, day + timedelta(days=1), today):
+            self.write_partition(MINUTE, day, buckets, day)
+        if not self.expired(HOUR, day + timedelta(days=1), today):
+            self.write_partition(HOUR, day, list(hours.values()), day)
+        if not self.expired(DAY, day + timedelta(days=1), today):
+            self.write_partition(DAY, day, [total], day)
+
+    def partition_path(self, resolution: str, name: str) -> str:
+        return os.path.join(self.directory, resolution, name)
+
+    def read_partition(self, resolution: str, name: str) -> List[Bucket]:
+        try:
+            with open(self.partition_path(resolution, name), 'r') as f:
+                return json.load(f)["buckets"]
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            LOG.error("Error reading rollup %s/%s: %s", resolution, name, e)
+            return []
+
+    def write_partition(self, resolution: str, day: date, buckets: List[Bucket], replace_day: date):
+        """Replace replace_day's buckets in the partition file holding day"""
+        name = partition_name(resolution, day)
+        start, end = day_start_ms(replace_day), day_start_ms(replace_day + timedelta(days=1))
+        kept = [bucket for bucket in self.read_partition(resolution, name) if not start <= bucket["t"] < end]
+        merged = sorted(kept + buckets, key=lambda bucket: bucket["t"])
+        write_file_atomic(self.partition_path(resolution, name), json.dumps({"buckets": merged}).encode())
+
+    def expired(self, resolution: str, end: date, today: date) -> bool:
+        """Whether a period ending before end is past resolution's retention"""
+        days = self.retention_days[resolution]
+        return days is not None and (today - end).days >= days
+
+    def apply_retention(self, today: date):
+        for resolution in RESOLUTIONS:
+            if self.retention_days[resolution] is None:
+                continue
+            for name in os.listdir(os.path.join(self.directory, resolution)):
+                if not name.endswith(".json"):
+                    continue
+                end = partition_end(resolution, partition_start(resolution, name))
+                if self.expired(resolution, end, today):
+                    os.remove(self.partition_path(resolution, name))
+
+    def wipe_partitions(self):
+        for resolution in RESOLUTIONS:
+            for name in os.listdir(os.path.join(self.directory, resolution)):
+                os.remove(self.partition_path(resolution, name))
+        self.closed_before = 0.0
+
+    def buckets(self, start_ms: float, end_ms: float, resolution: str = HOUR) -> List[Bucket]:
+        """Buckets of a resolution starting in [start_ms, end_ms), oldest first
+
+        Only the partition files overlapping the range are read; days still
+        open are rolled up from the in-memory minutes.
+        """
+        closed_before = self.closed_before
+        result: Dict[float, Bucket] = {}
+
+        first, last = local_day(start_ms), local_day(max(start_ms, end_ms - 1))
+        names = []
+        day = first
+        while day <= last and day_start_ms(day) < closed_before:
+            name = partition_name(resolution, day)
+            if name not in names:
+                names.append(name)
+            day += timedelta(days=1)
+        for name in names:
+            for bucket in self.read_partition(resolution, name):
+                if start_ms <= bucket["t"] < end_ms and bucket["t"] < closed_before:
+                    result[bucket["t"]] = bucket
+
+        for minute_start, minute in list(self.minutes.items()):
+            if minute_start < closed_before:
+                continue
+            if resolution == MINUTE:
+                start = minute_start
+            elif resolution == HOUR:
+                start = hour_start_ms(minute_start)
+            else:
+                start = day_start_ms(local_day(minute_start))
+            if not start_ms <= start < end_ms:
+                continue
+            total = result.get(start)
+            if total is None:
+                total = result[start] = new_bucket(start)
+            add_bucket(total, minute)
+        return [result[start] for start in sorted(result)]
+
+    def summary(self, start_ms: float, end_ms: float) -> Bucket:
+        """All typing in [start_ms, end_ms) as one bucket
+
+        Uses the finest resolution still kept for start_ms, so the range
+        edges are as exact as retention allows.
+        """
+        today = local_day(time.time() * 1000)
+        resolution = DAY
+        for candidate in (MINUTE, HOUR):
+            if not self.expired(candidate, local_day(start_ms) + timedelta(days=1), today):
+                resolution = candidate
+                break
+        total = new_bucket(start_ms)
+        for bucket in self.buckets(start_ms, end_ms, resolution):
+            add_bucket(total, bucket)
+        return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print daily typing totals from the rollups as of the last save")
+    parser.add_argument("--log-dir", default="key_events", help="event log directory (default: %(default)s)")
+    parser.add_argument("--days", type=int, default=7, help="days to list (default: %(default)s)")
+    args = parser.parse_args()
+
+    store = RollupStore(os.path.join(args.log_dir, "rollups"))
+    store.load()
+    today = date.today()
+    print(f"{'day':<14}{'presses':>10}{'dwell ms':>10}  top keys")
+    for offset in range(args.days - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        total = store.summary(day_start_ms(day), day_start_ms(day + timedelta(days=1)))
+        dwell_sum = sum(stats[1] for stats in total["keys"].values())
+        dwell_count = sum(stats[2] for stats in total["keys"].values())
+        top = sorted(total["keys"].items(), key=lambda item: item[1][0], reverse=True)[:3]
+        print(f"{day:%a %Y-%m-%d}{total['n']:>10}{dwell_sum / dwell_count if dwell_count else 0:>10.0f}  "
+              + ", ".join(f"{code} {stats[0]}" for code, stats in top))
+
+
+if __name__ == "__main__":
+    main()
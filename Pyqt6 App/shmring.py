@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Shared-memory ring buffer of key event records.
+
+The capture helper publishes every event into a ring of fixed-size
+EVENT_RECORD slots in a multiprocessing.shared_memory segment, and any
+number of readers in other processes (the GUI, kvizd, the tail tool below)
+attach to it by name and follow the stream on their own.
+
+There is one writer and no locks. The header holds the writer's pid, a
+random nonce drawn when the ring is created and a single sequence counter:
+the number of records ever published. The writer fills slot
+sequence % capacity and then advances the counter, and never waits, so a
+slow or stuck reader cannot hold up capture. Each reader keeps its own
+cursor:
+- lag is the counter minus the cursor
+- when a reader falls more than a ring behind, the oldest records are
+  gone; it skips ahead and counts them as overwritten
+
+Readers need not poll. The process that starts the writer can give it a
+wake fd, typically the write end of a pipe. The writer then posts one byte
+there after each publish, skipping it when the pipe is full because a
+wakeup is already pending, so the reader can sleep in select() or on a
+QSocketNotifier until there is something to read. Readers that attach to
+someone else's ring have no such pipe and poll.
+
+Slots are unpacked straight out of the shared buffer. The counter is read
+again after the copy, and any record the writer may have reached in the
+meantime is discarded and counted as overwritten rather than returned
+torn. This relies on the writer's stores becoming visible in program order,
+which holds on x86 and in practice for CPython on ARM. Aligned 8 byte
+stores of the counter are not torn on either.
+
+A segment that already exists under the ring's name is only replaced when
+the pid in its header is no longer running, i.e. it was left behind by a
+writer that was killed. A second writer for a live ring is refused, since
+taking the name over would cut the first one's readers off.
+
+A writer that closes unlinks its ring, and one started later under the
+same name (the GUI's helper is restarted whenever capture is toggled)
+creates a new segment that readers still mapping the old one never see.
+Polling readers call reattach() while idle: once their writer is gone and
+the name holds a ring with a different nonce, they follow that one from
+its start.
+
+Usage: shmring.py [NAME] [--from-start]   (print events from a running ring)
+"""
+
+import os
+import sys
+import time
+import struct
+import argparse
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, List, Optional, Tuple
+
+from keycodes import EVENT_PRESS, EVENT_RECORD, id_to_code
+
+
+DEFAULT_RING_NAME = "kviz-capture"
+RING_MAGIC = b"KVRB"
+
+# <magic: 4s><record size: u32><capacity: u32><writer pid: u32><nonce: u64><published sequence: u64>
+RING_HEADER = struct.Struct('<4sIIIQQ')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = RING_HEADER.size - SEQUENCE.size
+
+_created = set()  # Names of the rings this process writes
+
+
+class EventRing:
+    """Writer side: creates the segment and publishes records without ever blocking"""
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, capacity: int = 1 << 16, wake_fd: Optional[int] = None):
+        """wake_fd: post a byte here after every publish (made non-blocking)"""
+        size = RING_HEADER.size + capacity * EVENT_RECORD.size
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            pid = _writer_pid(name)
+            if _running(pid):
+                raise FileExistsError(f"Ring {name} is in use by its writer (pid {pid})") from None
+            # Left behind by a writer that was killed
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        _created.add(name)
+        self.name = name
+        self.capacity = capacity
+        self.sequence = 0
+        self.wake_fd = wake_fd
+        if wake_fd is not None:
+            os.set_blocking(wake_fd, False)
+        self._buf = self.shm.buf
+        RING_HEADER.pack_into(self._buf, 0, RING_MAGIC, EVENT_RECORD.size, capacity, os.getpid(),
+                              int.from_bytes(os.urandom(8), 'little'), 0)
+
+    def publish(self, event_type: int, code_id: int, timestamp: float):
+        """Write one record and make it visible to readers"""
+        sequence = self.sequence
+        EVENT_RECORD.pack_into(self._buf, RING_HEADER.size + (sequence % self.capacity) * EVENT_RECORD.size,
+                               event_type, code_id, timestamp)
+        self.sequence = sequence + 1
+        SEQUENCE.pack_into(self._buf, SEQUENCE_OFFSET, sequence + 1)
+        if self.wake_fd is not None:
+            try:
+                os.write(self.wake_fd, b'\x01')
+            except BlockingIOError:
+                pass  # Pipe full: the reader has wakeups pending already
+            except OSError:
+                self.wake_fd = None  # Reader gone; others may still follow the ring
+
+    def close(self):
+        """Release and remove the segment; attached readers keep their mapping until they close"""
+        self._buf = None
+        self.shm.close()
+        self.shm.unlink()
+        _created.discard(self.name)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without taking ownership of it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    shm = shared_memory.SharedMemory(name)
+    if name in _created:
+        return shm
+    # Before 3.13 every attach is tracked and the segment is unlinked when this process exits
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+def _is_ring(shm: shared_memory.SharedMemory) -> bool:
+    if shm.size < RING_HEADER.size:
+        return False
+    magic, record_size, _, _, _, _ = RING_HEADER.unpack_from(shm.buf, 0)
+    return magic == RING_MAGIC and record_size == EVENT_RECORD.size
+
+
+def _writer_pid(name: str) -> int:
+    """Pid in the header of an existing segment, or 0 if it is not a ring"""
+    shm = _attach(name)
+    try:
+        return RING_HEADER.unpack_from(shm.buf, 0)[3] if _is_ring(shm) else 0
+    finally:
+        shm.close()
+
+
+def _running(pid: int) -> bool:
+    if not pid:
+        return False
+    if os.name == "nt":
+        # Segments disappear with their last handle there, so one that exists is in use
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Alive, owned by another user
+    return True
+
+
+class RingReader:
+    """Reader side: follows one ring with a private cursor"""
+
+    def __init__(self, name: str = DEFAULT_RING_NAME, from_start: bool = False):
+        """from_start: begin with the oldest record still in the ring rather than the next new one
+
+        Raises FileNotFoundError while no writer has created the ring.
+        """
+        self.name = name
+        self.overwritten = 0
+        shm = _attach(name)
+        if not _is_ring(shm):
+            shm.close()
+            raise ValueError(f"{name} is not a key event ring")
+        self._follow(shm, from_start)
+
+    def _follow(self, shm: shared_memory.SharedMemory, from_start: bool):
+        self.shm = shm
+        self._buf = shm.buf
+        _, _, capacity, self.pid, self.nonce, _ = RING_HEADER.unpack_from(self._buf, 0)
+        self.capacity = capacity
+        # The slot the writer fills next may be mid-write, so one slot is never readable
+        self.window = capacity - 1
+        head = self.published()
+        self.cursor = max(0, head - self.window) if from_start else head
+
+    def reattach(self) -> bool:
+        """Move to a new ring created under this name once the writer of this one is gone
+
+        The new ring is read from its start. Returns True if the reader moved.
+        """
+        if self.pid != os.getpid() and _running(self.pid):
+            return False  # A live writer elsewhere keeps the name until it closes
+        try:
+            shm = _attach(self.name)
+        except FileNotFoundError:
+            return False
+        if not _is_ring(shm) or RING_HEADER.unpack_from(shm.buf, 0)[4] == self.nonce:
+            shm.close()
+            return False
+        self.close()
+        self._follow(shm, from_start=True)
+        return True
+
+    def published(self) -> int:
+        """Records the writer has published since it created the ring"""
+        return SEQUENCE.unpack_from(self._buf, SEQUENCE_OFFSET)[0]
+
+    @property
+    def lag(self) -> int:
+        """Published records this reader has not read yet"""
+        return self.published() - self.cursor
+
+    def read(self, max_records: int = 1 << 16) -> List[Tuple[int, int, float]]:
+        """Return the next (event_type, code_id, timestamp) records, oldest first"""
+        head = self.published()
+        start = self.cursor
+        if head - start > self.window:
+            self.overwritten += head - start - self.window
+            start = head - self.window
+        end = min(head, start + max_records)
+        if end <= start:
+            return []
+
+        records: List[Tuple[int, int, float]] = []
+        sequence = start
+        while sequence < end:
+            # Copy contiguous slots in one pass, wrapping at most once
+            slot = sequence % self.capacity
+            count = min(end - sequence, self.capacity - slot)
+            offset = RING_HEADER.size + slot * EVENT_RECORD.size
+            records.extend(EVENT_RECORD.iter_unpack(self._buf[offset:offset + count * EVENT_RECORD.size]))
+            sequence += count
+
+        # Anything the writer reached while we copied may be torn
+        stale = self.published() - self.window - start
+        if stale > 0:
+            stale = min(stale, len(records))
+            self.overwritten += stale
+            records = records[stale:]
+        self.cursor = end
+        return records
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published(), "read": self.cursor, "lag": self.lag, "overwritten": self.overwritten}
+
+    def close(self):
+        self._buf = None
+        self.shm.close()
+
+
+def _benchmark(events: int = 1_000_000, capacity: int = 1 << 16):
+    """Publish cost per event, and read cost for a reader catching up on a full ring"""
+    ring = EventRing("kviz-ring-benchmark", capacity)
+    reader = RingReader(ring.name)
+    try:
+        publish = ring.publish
+        start = time.perf_counter()
+        for index in range(events):
+            publish(EVENT_PRESS, index % 96 + 1, float(index))
+        publish_ns = (time.perf_counter() - start) / events * 1e9
+        overwritten = events - reader.window
+
+        reader.cursor = 0
+        start = time.perf_counter()
+        received = len(reader.read(events))
+        read_ns = (time.perf_counter() - start) / max(1, received) * 1e9
+        print(f"publish:  {publish_ns:8.0f} ns/event")
+        print(f"read:     {read_ns:8.0f} ns/event ({received} records, "
+              f"{reader.overwritten} overwritten, expected {overwritten})")
+    finally:
+        reader.close()
+        ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print key events from a capture ring as they arrive")
+    parser.add_argument("name", nargs="?", default=DEFAULT_RING_NAME, help="ring name (default: %(default)s)")
+    parser.add_argument("--from-start", action="store_true", help="start with the oldest record still in the ring")
+    parser.add_argument("--poll", type=float, default=0.01, help="seconds between polls (default: %(default)s)")
+    parser.add_argument("--benchmark", type=int, metavar="EVENTS", help="time publish and read instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    reader = RingReader(args.name, args.from_start)
+    try:
+        while True:
+            records = reader.read()
+            for event_type, code_id, timestamp in records:
+                print(f"{timestamp:.1f} {'down' if event_type == EVENT_PRESS else 'up':<4} {id_to_code(code_id)}")
+            if records:
+                stats = reader.stats()
+                print(f"  lag={stats['lag']} overwritten={stats['overwritten']}", file=sys.stderr)
+            elif reader.reattach():
+                print(f"  {args.name} was recreated by pid {reader.pid}", file=sys.stderr)
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+SQLite storage for the key event log.
+
+SQLiteEventLog is a drop-in for EventLog: KeyboardAnalytics appends records
+to the same in-memory buffer and hands them to its background writer, which
+inserts each batch with one executemany in one transaction. The checkpoint
+(lifetime counts per key and the last event id they cover) lives in the same
+database, so one file replaces both the segment log and the JSON snapshot.
+
+The database runs in WAL mode, so readers (the report below, a second app
+instance, any sqlite3 shell) read a consistent snapshot without ever
+blocking the writer, and the capture thread never touches the database at
+all. Events are indexed on (timestamp, code) for time range queries.
+
+Log positions are (0, last event id); they are only meaningful for the
+database they came from, so KeyboardAnalytics keeps the database and the
+files saved with its positions in a "sqlite" subdirectory of the log
+directory, apart from the segment log.
+
+Usage: sqlitelog.py [--db-dir DIR] [--days N] [--benchmark EVENTS]
+"""
+
+import os
+import time
+import sqlite3
+import argparse
+from contextlib import closing
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from keycodes import EVENT_PRESS, EVENT_RECORD, id_to_code
+from persistence import lock_directory
+
+
+DATABASE_NAME = "events.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    type INTEGER NOT NULL,
+    code INTEGER NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_timestamp_code ON events (timestamp, code);
+CREATE TABLE IF NOT EXISTS key_counts (
+    code TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_event INTEGER NOT NULL
+);
+"""
+
+
+def connect(path: str, read_only: bool = False, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open the database with the pragmas every connection needs"""
+    if read_only:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=check_same_thread)
+    else:
+        db = sqlite3.connect(path, check_same_thread=check_same_thread)
+    # Wait out another writer's commit instead of failing; readers never wait in WAL mode
+    db.execute("PRAGMA busy_timeout = 5000")
+    return db
+
+
+class SQLiteEventLog:
+    """Key event records in a SQLite database, with the same interface as EventLog"""
+
+    def __init__(self, directory: str, max_buffered: int = 4096, name: str = DATABASE_NAME):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self.max_buffered = max_buffered
+        self._buffer = bytearray()
+
+        os.makedirs(directory, exist_ok=True)
+        # Other processes may read the database, but only one records into it
+        self._lock_fd = lock_directory(directory)
+        # Created here, used only by the background writer after startup
+        self._db = connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        # Commits survive an app crash; only a power loss can drop the last few, as with the segment log
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+        self.last_event = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def position(self) -> Tuple[int, int]:
+        """Log position just past the last written record"""
+        return 0, self.last_event
+
+    @property
+    def pending(self) -> int:
+        """Number of appended records not yet handed off for writing"""
+        return len(self._buffer) // EVENT_RECORD.size
+
+    def append(self, event_type: int, code_id: int, timestamp: float):
+        """Buffer one record"""
+        self._buffer += EVENT_RECORD.pack(event_type, code_id, timestamp)
+
+    def take_pending(self) -> bytes:
+        """Detach the buffered records so they can be written elsewhere"""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def write(self, data: bytes):
+        """Insert whole records in one transaction"""
+        if not data:
+            return
+        db = self._db
+        with db:
+            db.executemany("INSERT INTO events (type, code, timestamp) VALUES (?, ?, ?)",
+                           EVENT_RECORD.iter_unpack(data))
+            self.last_event = db.execute("SELECT MAX(id) FROM events").fetchone()[0]
+
+    def flush(self):
+        """Write buffered records in the calling thread"""
+        self.write(self.take_pending())
+
+    def sync(self):
+        """Flush and force the database to stable storage"""
+        self.flush()
+        self._db.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        self.flush()
+        self._db.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def read_from(self, position: Tuple[int, int] = (0, 0), chunk_records: int = 8192,
+                  end: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, int, float]]:
+        """Yield written (event_type, code_id, timestamp) records after a log position, up to end if given"""
+        last = end[1] if end is not None else (1 << 63) - 1
+        with closing(connect(self.path, read_only=True)) as db:
+            cursor = db.execute("SELECT type, code, timestamp FROM events WHERE id > ? AND id <= ? ORDER BY id",
+                                (position[1], last))
+            while True:
+                rows = cursor.fetchmany(chunk_records)
+                if not rows:
+                    break
+                yield from rows
+
+    def load_checkpoint(self) -> Tuple[Optional[Dict[str, int]], Tuple[int, int]]:
+        """Return (counts, position) of the last checkpoint, or (None, start of log)"""
+        row = self._db.execute("SELECT last_event FROM checkpoint WHERE id = 1").fetchone()
+        if row is None:
+            return None, (0, 0)
+        counts = dict(self._db.execute("SELECT code, count FROM key_counts"))
+        return counts, (0, row[0])
+
+    def write_checkpoint(self, counts: Dict[str, int]):
+        """Record aggregate counts covering every record written so far"""
+        db = self._db
+        with db:
+            db.execute("DELETE FROM key_counts")
+            db.executemany("INSERT INTO key_counts (code, count) VALUES (?, ?)", counts.items())
+            db.execute("INSERT OR REPLACE INTO checkpoint (id, last_event) VALUES (1, ?)", (self.last_event,))
+
+
+def presses_between(path: str, start_ms: float, end_ms: float) -> List[Tuple[str, int]]:
+    """(code, presses) for every key pressed in [start_ms, end_ms), most pressed first
+
+    Reads through its own read-only connection, so it can run while the app
+    or kvizd is recording into the same database.
+    """
+    with closing(connect(path, read_only=True)) as db:
+        rows = db.execute("SELECT code, COUNT(*) AS presses FROM events "
+                          "WHERE timestamp >= ? AND timestamp < ? AND type = ? "
+                          "GROUP BY code ORDER BY presses DESC", (start_ms, end_ms, EVENT_PRESS)).fetchall()
+    return [(id_to_code(code_id), presses) for code_id, presses in rows]
+
+
+def _benchmark(events: int = 1_000_000, batch: int = 4096):
+    """Time batched ingest while another connection keeps querying the same database"""
+    import tempfile
+    import threading
+    from tracegen import generate_trace
+
+    trace = generate_trace(events, seed=1)
+    with tempfile.TemporaryDirectory(prefix="kviz-sqlite-") as directory:
+        log = SQLiteEventLog(directory)
+        stop = threading.Event()
+        reads = []
+
+        def reader():
+            # A report running next to capture: the same range query, again and again
+            while not stop.is_set():
+                start = time.perf_counter()
+                presses_between(log.path, trace[0][2], trace[0][2] + 60_000)
+                reads.append(time.perf_counter() - start)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        start = time.perf_counter()
+        for index, (event_type, code_id, timestamp) in enumerate(trace, 1):
+            log.append(event_type, code_id, timestamp)
+            if index % batch == 0:
+                log.write(log.take_pending())
+        log.close()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        thread.join()
+
+        reads.sort()
+        print(f"{len(trace)} events in batches of {batch}: {elapsed:.2f}s, {len(trace) / elapsed:,.0f} events/s")
+        if reads:
+            print(f"concurrent range queries: {len(reads)}, median {reads[len(reads) // 2] * 1000:.1f}ms")
+        print(f"database: {os.path.getsize(log.path) / 1e6:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report on a keystroke database, or time ingest into one")
+    parser.add_argument("--db-dir", default=os.path.join("key_events", "sqlite"),
+                        help="directory holding the database (default: %(default)s)")
+    parser.add_argument("--days", type=float, default=1.0, help="report on the last N days (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="keys to list (default: %(default)s)")
+    parser.add_argument("--benchmark", type=int, metavar="EVENTS", help="time ingest of EVENTS synthetic events instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    end_ms = time.time() * 1000
+    presses = presses_between(os.path.join(args.db_dir, DATABASE_NAME), end_ms - args.days * 86400000, end_ms)
+    print(f"{sum(count for _, count in presses)} presses in the last {args.days:g} days")
+    for code, count in presses[:args.top]:
+        print(f"{code:<20}{count:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Translation of recorded evdev byte streams into key events"""
+
+from evdevcapture import (INPUT_EVENT, EV_SYN, EV_KEY, SYN_REPORT, SYN_DROPPED, KEY_RELEASE, KEY_PRESS,
+                          KEY_REPEAT, EvdevReader, follow, translate, _write_recording)
+from keycodes import EVENT_PRESS, EVENT_RELEASE, code_to_id
+
+EV_MSC, MSC_SCAN = 0x04, 0x04
+KEY_A, KEY_S, KEY_D = 30, 31, 32
+KEY_UNKNOWN = 0x2ff  # Past the end of the key code table
+
+A, S, D = code_to_id("KeyA"), code_to_id("KeyS"), code_to_id("KeyD")
+
+
+def record(seconds, ev_type, code, value=0, microseconds=0):
+    return INPUT_EVENT.pack(seconds, microseconds, ev_type, code, value)
+
+
+def key(seconds, code, value, microseconds=0):
+    """One key event as a device reports it: scan code, key, report"""
+    return (record(seconds, EV_MSC, MSC_SCAN, code, microseconds) + record(seconds, EV_KEY, code, value, microseconds)
+            + record(seconds, EV_SYN, SYN_REPORT, 0, microseconds))
+
+
+def test_press_and_release_with_timestamps():
+    data = key(1, KEY_A, KEY_PRESS, 250) + key(2, KEY_A, KEY_RELEASE)
+    assert translate(data) == [(EVENT_PRESS, A, 1000.25), (EVENT_RELEASE, A, 2000.0)]
+
+
+def test_autorepeats_are_dropped():
+    data = key(1, KEY_A, KEY_PRESS) + key(2, KEY_A, KEY_REPEAT) + key(3, KEY_A, KEY_REPEAT) + key(4, KEY_A, KEY_RELEASE)
+    assert [event_type for event_type, _, _ in translate(data)] == [EVENT_PRESS, EVENT_RELEASE]
+
+
+def test_unknown_codes_and_other_event_types_are_skipped():
+    data = (key(1, KEY_UNKNOWN, KEY_PRESS) + key(1, 0, KEY_PRESS) + record(1, EV_MSC, MSC_SCAN, KEY_A)
+            + record(1, EV_SYN, SYN_REPORT))
+    assert translate(data) == []
+
+
+def test_partial_trailing_record_is_ignored_by_the_reader(tmp_path):
+    path = tmp_path / "keys.bin"
+    path.write_bytes(key(1, KEY_A, KEY_PRESS) + key(2, KEY_A, KEY_RELEASE)[:INPUT_EVENT.size + 5])
+    reader = EvdevReader([str(path)])
+    try:
+        events = [event for batch in follow(reader) for event in batch]
+    finally:
+        reader.close()
+    assert events == [(EVENT_PRESS, A, 1000.0)]
+
+
+def test_syn_dropped_releases_held_keys_and_skips_the_partial_report():
+    data = (key(1, KEY_A, KEY_PRESS) + key(2, KEY_S, KEY_PRESS) + key(3, KEY_S, KEY_RELEASE)
+            + record(4, EV_SYN, SYN_DROPPED)
+            + record(4, EV_KEY, KEY_D, KEY_PRESS, 10) + record(4, EV_SYN, SYN_REPORT, 0, 10)
+            + key(5, KEY_D, KEY_PRESS))
+    assert translate(data) == [
+        (EVENT_PRESS, A, 1000.0), (EVENT_PRESS, S, 2000.0), (EVENT_RELEASE, S, 3000.0),
+        (EVENT_RELEASE, A, 4000.0),
+        (EVENT_PRESS, D, 5000.0),
+    ]
+
+
+def test_reader_returns_none_at_end_of_file(tmp_path):
+    path = tmp_path / "keys.bin"
+    path.write_bytes(key(1, KEY_A, KEY_PRESS))
+    reader = EvdevReader([str(path)])
+    try:
+        fd, = reader.fds()
+        assert reader.read(fd) == [(EVENT_PRESS, A, 1000.0)]
+        assert reader.read(fd) is None
+    finally:
+        reader.close()
+
+
+def test_reader_reads_a_recording_in_blocks(tmp_path):
+    path = tmp_path / "keys.bin"
+    _write_recording(str(path), 500)
+    reader = EvdevReader([str(path)], block_events=64)
+    try:
+        batches = list(follow(reader))
+    finally:
+        reader.close()
+    events = [event for batch in batches for event in batch]
+    assert len(batches) > 1
+    assert sum(1 for event_type, _, _ in events if event_type == EVENT_PRESS) == 500
+    assert sum(1 for event_type, _, _ in events if event_type == EVENT_RELEASE) == 500
+    assert all(earlier[2] <= later[2] for earlier, later in zip(events, events[1:]))
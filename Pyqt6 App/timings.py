@@ -0,0 +1,125 @@
+"""
+Lifetime dwell and inter-key interval distributions.
+
+Each distribution is a LatencyHistogram (see latency.py): a log-linear
+histogram with bounded memory, O(1) updates and percentiles within a few
+percent at any magnitude. Two histograms with the same bucket layout merge
+exactly by adding counts, so sketches from separate sessions or machines
+combine into the same result as one long recording.
+
+TimingSketches keeps one histogram per metric overall and one per key, and
+pairs presses with releases itself, so the same object can be fed live or
+by replaying the event log.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from keycodes import id_to_code, intern_code
+from latency import LatencyHistogram
+
+
+DWELL = "dwell"
+INTERVAL = "interval"
+METRICS = (DWELL, INTERVAL)
+
+SUMMARY_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class TimingSketches:
+    """Dwell and interval histograms, overall and per key, in microseconds"""
+
+    def __init__(self, max_interval_ms: float = 2000.0):
+        # Longer gaps between presses are pauses, not typing rhythm
+        self.max_interval_ms = max_interval_ms
+        self.overall: Dict[str, LatencyHistogram] = {metric: LatencyHistogram() for metric in METRICS}
+        self.per_key: Dict[str, Dict[int, LatencyHistogram]] = {metric: {} for metric in METRICS}
+        self.down: Dict[int, float] = {}  # Code id -> press timestamp of keys held now
+        self.last_press: Optional[float] = None
+        self._summaries: Dict[Tuple[str, int], Tuple[int, List[float]]] = {}
+
+    def _record(self, metric: str, code_id: int, value_ms: float):
+        value_us = value_ms * 1000
+        self.overall[metric].record(value_us)
+        histogram = self.per_key[metric].get(code_id)
+        if histogram is None:
+            histogram = self.per_key[metric][code_id] = LatencyHistogram()
+        histogram.record(value_us)
+
+    def press(self, code_id: int, timestamp: float):
+        last_press = self.last_press
+        if last_press is not None and 0 <= timestamp - last_press <= self.max_interval_ms:
+            # Filed under the key that ends the interval
+            self._record(INTERVAL, code_id, timestamp - last_press)
+        self.last_press = timestamp
+        self.down[code_id] = timestamp
+
+    def release(self, code_id: int, timestamp: float):
+        down_time = self.down.pop(code_id, None)
+        if down_time is not None and timestamp >= down_time:
+            self._record(DWELL, code_id, timestamp - down_time)
+
+    def histogram(self, metric: str, code_id: Optional[int] = None) -> Optional[LatencyHistogram]:
+        if code_id is None:
+            return self.overall[metric]
+        return self.per_key[metric].get(code_id)
+
+    def summary(self, metric: str, code_id: Optional[int] = None,
+                fractions: Sequence[float] = SUMMARY_PERCENTILES) -> Tuple[int, List[float]]:
+        """(sample count, percentiles in ms) for a metric, overall or for one key
+
+        The default percentiles are cached until the histogram gets a new
+        sample, so a panel can ask every frame for free.
+        """
+        histogram = self.histogram(metric, code_id)
+        if histogram is None:
+            return 0, [0.0] * len(fractions)
+        cacheable = fractions is SUMMARY_PERCENTILES
+        cache_key = (metric, -1 if code_id is None else code_id)
+        cached = self._summaries.get(cache_key) if cacheable else None
+        if cached is not None and cached[0] == histogram.count:
+            return cached
+        result = (histogram.count, [value / 1000 for value in histogram.percentiles(fractions)])
+        if cacheable:
+            self._summaries[cache_key] = result
+        return result
+
+    def merge(self, other: 'TimingSketches'):
+        """Add another recording's distributions to these"""
+        for metric in METRICS:
+            self.overall[metric].merge(other.overall[metric])
+            for code_id, histogram in other.per_key[metric].items():
+                mine = self.per_key[metric].get(code_id)
+                if mine is None:
+                    mine = self.per_key[metric][code_id] = LatencyHistogram()
+                mine.merge(histogram)
+        self._summaries.clear()
+
+    def clear(self):
+        for metric in METRICS:
+            self.overall[metric].clear()
+            self.per_key[metric].clear()
+        self.down.clear()
+        self.last_press = None
+        self._summaries.clear()
+
+    def to_dict(self) -> Dict:
+        """JSON-ready state, keys by web code so the file does not depend on id assignment"""
+        return {
+            "overall": {metric: histogram.to_state() for metric, histogram in self.overall.items()},
+            "keys": {
+                metric: {id_to_code(code_id): histogram.to_state() for code_id, histogram in histograms.items()}
+                for metric, histograms in self.per_key.items()
+            },
+            # Press/release pairing in progress, so transitions straddling a save are not lost
+            "down": {id_to_code(code_id): timestamp for code_id, timestamp in self.down.items()},
+            "last_press": self.last_press,
+        }
+
+    def load_dict(self, data: Dict):
+        self.clear()
+        for metric in METRICS:
+            self.overall[metric] = LatencyHistogram.from_state(data["overall"][metric])
+            for code, state in data["keys"][metric].items():
+                self.per_key[metric][intern_code(code)] = LatencyHistogram.from_state(state)
+        self.down = {intern_code(code): timestamp for code, timestamp in data.get("down", {}).items()}
+        self.last_press = data.get("last_press")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Synthetic keystroke trace generator.
+
+Produces press/release events with realistic timing for load testing:
+exponential inter-key gaps around a base rate, occasional fast bursts,
+rollover (the next key goes down before the previous one is released) and
+long-held keys. Key choice follows approximate English frequencies. The
+same seed always yields the same trace.
+
+Traces are (event_type, code_id, timestamp_ms) tuples sorted by time, and
+are stored as a plain EVENT_RECORD stream, so a trace file can be replayed
+by replay.py or fed to kvizd.py --source.
+
+Usage: tracegen.py OUTPUT [--count N] [--rate KPS] [--seed S] ...
+"""
+
+import time
+import random
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from keycodes import EVENT_PRESS, EVENT_RELEASE, EVENT_RECORD, code_to_id
+
+
+Event = Tuple[int, int, float]  # (event_type, code_id, timestamp_ms)
+
+# Relative key frequencies for English prose
+KEY_WEIGHTS: Dict[str, float] = {
+    'KeyE': 12.7, 'KeyT': 9.1, 'KeyA': 8.2, 'KeyO': 7.5, 'KeyI': 7.0, 'KeyN': 6.7,
+    'KeyS': 6.3, 'KeyH': 6.1, 'KeyR': 6.0, 'KeyD': 4.3, 'KeyL': 4.0, 'KeyC': 2.8,
+    'KeyU': 2.8, 'KeyM': 2.4, 'KeyW': 2.4, 'KeyF': 2.2, 'KeyG': 2.0, 'KeyY': 2.0,
+    'KeyP': 1.9, 'KeyB': 1.5, 'KeyV': 1.0, 'KeyK': 0.8, 'KeyJ': 0.2, 'KeyX': 0.2,
+    'KeyQ': 0.1, 'KeyZ': 0.1,
+    'Space': 18.0, 'Backspace': 3.0, 'Enter': 1.0, 'ShiftLeft': 2.0, 'ShiftRight': 0.5,
+    'Comma': 1.0, 'Period': 1.0, 'Digit1': 0.3, 'Digit2': 0.3, 'Digit0': 0.3,
+}
+
+
+def generate_trace(count: int, rate: float = 8.0, seed: Optional[int] = 0,
+                   burst_prob: float = 0.02, burst_length: Tuple[int, int] = (5, 30),
+                   burst_speedup: float = 4.0, rollover_prob: float = 0.15,
+                   hold_prob: float = 0.005, hold_ms: Tuple[float, float] = (400, 2000),
+                   dwell_ms: Tuple[float, float] = (90, 30), start_ms: float = 0.0,
+                   weights: Optional[Dict[str, float]] = None) -> List[Event]:
+    """Return up to count key presses (plus their releases) sorted by timestamp
+
+    rate is the mean keys per second outside bursts; a burst types
+    burst_length keys at rate * burst_speedup. dwell_ms is the (mean, stdev)
+    of how long a key stays down.
+    """
+    rng = random.Random(seed)
+    weights = weights or KEY_WEIGHTS
+    codes = [code_to_id(code) for code in weights]
+    cumulative = []
+    total = 0.0
+    for weight in weights.values():
+        total += weight
+        cumulative.append(total)
+
+    events: List[Event] = []
+    down_until: Dict[int, float] = {}  # Code id -> release time of its current press
+    now = start_ms
+    burst_left = 0
+
+    for _ in range(count):
+        if burst_left == 0 and rng.random() < burst_prob:
+            burst_left = rng.randint(*burst_length)
+        current_rate = rate * burst_speedup if burst_left else rate
+        if burst_left:
+            burst_left -= 1
+        gap = rng.expovariate(current_rate) * 1000
+        now += gap
+
+        # A key cannot go down again while it is still held
+        for _ in range(8):
+            code_id = rng.choices(codes, cum_weights=cumulative)[0]
+            if down_until.get(code_id, 0.0) <= now:
+                break
+        else:
+            continue
+
+        roll = rng.random()
+        if roll < hold_prob:
+            dwell = rng.uniform(*hold_ms)
+        elif roll < hold_prob + rollover_prob:
+            # Stay down past the expected next press
+            dwell = 1000 / current_rate + abs(rng.gauss(*dwell_ms))
+        else:
+            dwell = max(10.0, rng.gauss(*dwell_ms))
+
+        events.append((EVENT_PRESS, code_id, now))
+        events.append((EVENT_RELEASE, code_id, now + dwell))
+        down_until[code_id] = now + dwell
+
+    events.sort(key=lambda event: event[2])
+    return events
+
+
+def write_trace(path: str, events: List[Event]):
+    with open(path, 'wb') as f:
+        f.write(b''.join(EVENT_RECORD.pack(*event) for event in events))
+
+
+def read_trace(path: str) -> List[Event]:
+    with open(path, 'rb') as f:
+        data = f.read()
+    usable = len(data) - len(data) % EVENT_RECORD.size
+    return list(EVENT_RECORD.iter_unpack(memoryview(data)[:usable]))
+
+
+def add_trace_arguments(parser: argparse.ArgumentParser):
+    """Generator options shared by tracegen.py and replay.py"""
+    parser.add_argument("--count", type=int, default=10000, help="key presses to generate (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=8.0, help="mean keys per second (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+    parser.add_argument("--burst-prob", type=float, default=0.02, help="chance a key starts a burst")
+    parser.add_argument("--burst-speedup", type=float, default=4.0, help="rate multiplier inside bursts")
+    parser.add_argument("--rollover-prob", type=float, default=0.15, help="chance a key overlaps the next one")
+    parser.add_argument("--hold-prob", type=float, default=0.005, help="chance a key is held down")
+
+
+def trace_from_arguments(args: argparse.Namespace, start_ms: float = 0.0) -> List[Event]:
+    return generate_trace(args.count, rate=args.rate, seed=args.seed, burst_prob=args.burst_prob,
+                          burst_speedup=args.burst_speedup, rollover_prob=args.rollover_prob,
+                          hold_prob=args.hold_prob, start_ms=start_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic keystroke trace")
+    parser.add_argument("output", help="EVENT_RECORD file to write")
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+
+    events = trace_from_arguments(args, start_ms=time.time() * 1000)
+    write_trace(args.output, events)
+    presses = sum(1 for event_type, _, _ in events if event_type == EVENT_PRESS)
+    duration = (events[-1][2] - events[0][2]) / 1000 if events else 0.0
+    print(f"Wrote {len(events)} events ({presses} presses) spanning {duration:.1f}s to {args.output}")
+
+
+if __name__ == "__main__":
+    main()